@@ -0,0 +1,76 @@
+"""CPU cost and bandwidth saved by response compression.
+
+Generates recipes in a throwaway test database, renders recipe list
+responses of several page sizes as the API does, and times each
+available encoding on them. Reports the compressed size, the time per
+response and the CPU spent per kilobyte saved.
+
+    python benchmarks/compression.py --sizes 10 50 100 500 --repeat 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recipe_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from benchmarks.datagen import generate  # noqa: E402
+from core import compression, sharding  # noqa: E402
+from core.models import Recipe  # noqa: E402
+from receipe.serializers import RecipeSerializer  # noqa: E402
+
+
+def body(size):
+    """Return the rendered JSON of a list of size recipes"""
+    recipes = sharding.Merged(
+        Recipe.objects.order_by('id'), key=lambda recipe: recipe.pk
+    )[:size]
+    return JSONRenderer().render(RecipeSerializer(recipes, many=True).data)
+
+
+def timed(encoding, data, repeat):
+    """Return (median microseconds, compressed size) of an encoding"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        compressed = compression.compress(encoding, data)
+        timings.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(timings), len(compressed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10, 50, 100, 500])
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--links', type=int, default=4)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+    generate(1, max(args.sizes), 40, 200, args.links)
+
+    print(f'{"recipes":>7} {"encoding":>8} {"bytes":>8} {"sent":>8} '
+          f'{"ratio":>6} {"us":>8} {"us/KB saved":>12}')
+    for size in args.sizes:
+        data = body(size)
+        for encoding in compression.CODECS:
+            elapsed, sent = timed(encoding, data, args.repeat)
+            saved = (len(data) - sent) / 1024
+            print(f'{size:>7} {encoding:>8} {len(data):>8} {sent:>8} '
+                  f'{len(data) / sent:>6.1f} {elapsed:>8.1f} '
+                  f'{elapsed / saved if saved > 0 else 0:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""Generate a synthetic data set for the load tests.
+
+Creates users x recipes x tags x ingredients in the configured databases,
+each user's data on the database the hash ring places it, and writes a
+manifest with the tokens and ids the scenarios need.
+
+    python benchmarks/datagen.py --users 20 --recipes 500 --tags 30 \\
+        --ingredients 80 --manifest benchmarks/results/manifest.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recipe_project.settings')
+
+PASSWORD = 'benchpass'
+# sqlite allows at most 500 rows in one multi-row INSERT
+BATCH_SIZE = 500
+
+
+def generate(users, recipes, tags, ingredients, links=4, seed=0):
+    """Create the data set, sizes are per user, and return the manifest"""
+    import django
+    django.setup()
+
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from django.utils import timezone
+    from core import deletion, linked_ids, sharding
+    from core.models import AuthToken, Ingredient, Recipe, Tag
+
+    def new_id(model):
+        # bulk_create skips the receiver giving ids unique across shards
+        return sharding.next_id(model) if sharding.enabled() else None
+
+    rng = random.Random(seed)
+    User = get_user_model()
+    # hash once, the scenarios measure the API and not the data set up
+    password = make_password(PASSWORD)
+    prefix = f'bench-{seed}-'
+    previous = User.objects.filter(email__startswith=prefix)
+    previous.update(deleted_at=timezone.now())
+    for user_id in previous.values_list('pk', flat=True):
+        deletion.purge_user(user_id)
+    User.objects.bulk_create(
+        User(email=f'{prefix}{index}@example.com', name=f'Bench {index}',
+             password=password)
+        for index in range(users)
+    )
+
+    manifest = {'password': PASSWORD, 'users': []}
+    for user in User.objects.filter(email__startswith=prefix):
+        _, key = AuthToken.objects.issue(user)
+        if sharding.enabled():
+            sharding.place(user.pk)
+        with sharding.using_user(user.pk) as alias:
+            Tag.objects.bulk_create(
+                (Tag(pk=new_id(Tag), user=user, name=f'tag {index}')
+                 for index in range(tags)),
+                batch_size=BATCH_SIZE
+            )
+            Ingredient.objects.bulk_create(
+                (Ingredient(pk=new_id(Ingredient), user=user,
+                            name=f'ingredient {index}')
+                 for index in range(ingredients)),
+                batch_size=BATCH_SIZE
+            )
+            Recipe.objects.bulk_create(
+                (Recipe(pk=new_id(Recipe), user=user,
+                        title=f'recipe {index}',
+                        time_minutes=rng.randint(5, 120),
+                        price=rng.randint(100, 9999) / 100)
+                 for index in range(recipes)),
+                batch_size=BATCH_SIZE
+            )
+            tag_ids = list(
+                Tag.objects.filter(user=user).values_list('id', flat=True)
+            )
+            ingredient_ids = list(
+                Ingredient.objects.filter(user=user).values_list(
+                    'id', flat=True
+                )
+            )
+            recipe_ids = list(
+                Recipe.objects.filter(user=user).values_list('id', flat=True)
+            )
+
+            recipe_tags = []
+            recipe_ingredients = []
+            for recipe_id in recipe_ids:
+                for tag_id in rng.sample(tag_ids, min(links, len(tag_ids))):
+                    recipe_tags.append(Recipe.tags.through(
+                        recipe_id=recipe_id, tag_id=tag_id
+                    ))
+                for ingredient_id in rng.sample(
+                        ingredient_ids, min(links, len(ingredient_ids))):
+                    recipe_ingredients.append(Recipe.ingredients.through(
+                        recipe_id=recipe_id, ingredient_id=ingredient_id
+                    ))
+            Recipe.tags.through.objects.bulk_create(
+                recipe_tags, batch_size=BATCH_SIZE
+            )
+            Recipe.ingredients.through.objects.bulk_create(
+                recipe_ingredients, batch_size=BATCH_SIZE
+            )
+            # bulk inserted links send no signals
+            for through in linked_ids.LINKS:
+                linked_ids.refresh(through, recipe_ids, alias)
+
+        manifest['users'].append({
+            'email': user.email,
+            'token': key,
+            'recipes': recipe_ids,
+            'tags': tag_ids,
+            'ingredients': ingredient_ids,
+        })
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--recipes', type=int, default=100)
+    parser.add_argument('--tags', type=int, default=20)
+    parser.add_argument('--ingredients', type=int, default=50)
+    parser.add_argument('--links', type=int, default=4,
+                        help='tags and ingredients per recipe')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--manifest',
+                        default='benchmarks/results/manifest.json')
+    args = parser.parse_args()
+
+    manifest = generate(args.users, args.recipes, args.tags,
+                        args.ingredients, args.links, args.seed)
+    os.makedirs(os.path.dirname(args.manifest) or '.', exist_ok=True)
+    with open(args.manifest, 'w') as handle:
+        json.dump(manifest, handle)
+    print(f"{len(manifest['users'])} users written to {args.manifest}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Compare connection setup overhead per request.
+
+Runs a trivial query inside a simulated request cycle, once with
+CONN_MAX_AGE=0 (a new connection for every request) and once with
+persistent connections, against whatever database DB_ENGINE selects.
+
+    python benchmarks/db_connections.py --requests 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recipe_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core import signals  # noqa: E402
+from django.db import connection  # noqa: E402
+
+
+def run(requests, max_age):
+    """Return seconds spent serving `requests` simulated requests"""
+    connection.close()
+    connection.settings_dict['CONN_MAX_AGE'] = max_age
+    start = time.perf_counter()
+    for _ in range(requests):
+        signals.request_started.send(sender=None)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        signals.request_finished.send(sender=None)
+    elapsed = time.perf_counter() - start
+    connection.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"engine: {connection.settings_dict['ENGINE']}")
+    results = {
+        'per-request connections': run(args.requests, 0),
+        'persistent connections': run(args.requests, None),
+    }
+    for name, elapsed in results.items():
+        per_request = elapsed / args.requests * 1e6
+        print(f'{name:<26} {elapsed:8.3f}s  {per_request:9.1f} us/request')
+    ratio = results['per-request connections'] / \
+        results['persistent connections']
+    print(f'persistent connections are {ratio:.1f}x faster')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""Scripted load test scenarios against a running recipe API server.
+
+Start the server with every request profiled so queries per request can be
+read from the Server-Timing header, generate a data set, then run:
+
+    REQUEST_PROFILE_SAMPLE_RATE=1 python manage.py runserver --noreload
+    python benchmarks/datagen.py --manifest benchmarks/results/manifest.json
+    python benchmarks/load_test.py --save benchmarks/results/baseline.json
+    python benchmarks/load_test.py --compare benchmarks/results/baseline.json
+
+Compare mode exits with status 1 when a scenario got slower than the
+baseline by more than --threshold.
+"""
+import argparse
+import io
+import json
+import random
+import re
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib import error, request
+
+QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+
+def _image():
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), (200, 120, 40)).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def _multipart(field, filename, content):
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="{field}"; '
+        f'filename="{filename}"\r\n'
+        'Content-Type: image/jpeg\r\n\r\n'
+    ).encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def scenario_list(rng, user, manifest):
+    return 'GET', '/api/recipe/recipes/', None, None
+
+
+def scenario_filter(rng, user, manifest):
+    tags = ','.join(map(str, rng.sample(user['tags'], 2)))
+    ingredients = str(rng.choice(user['ingredients']))
+    path = f'/api/recipe/recipes/?tags={tags}&ingredients={ingredients}'
+    return 'GET', path, None, None
+
+
+def scenario_detail(rng, user, manifest):
+    return 'GET', f"/api/recipe/recipes/{rng.choice(user['recipes'])}/", \
+        None, None
+
+
+def scenario_create(rng, user, manifest):
+    body = json.dumps({
+        'title': 'load test recipe',
+        'time_minutes': rng.randint(5, 120),
+        'price': '9.99',
+        'tags': rng.sample(user['tags'], 2),
+        'ingredients': rng.sample(user['ingredients'], 3),
+    }).encode()
+    return 'POST', '/api/recipe/recipes/', body, 'application/json'
+
+
+def scenario_upload(rng, user, manifest):
+    body, content_type = _multipart('image', 'bench.jpg', manifest['image'])
+    path = f"/api/recipe/recipes/{rng.choice(user['recipes'])}/upload-image/"
+    return 'POST', path, body, content_type
+
+
+def scenario_token(rng, user, manifest):
+    body = json.dumps({
+        'email': user['email'],
+        'password': manifest['password'],
+    }).encode()
+    return 'POST', '/api/user/token/', body, 'application/json'
+
+
+SCENARIOS = {
+    'list': scenario_list,
+    'filter': scenario_filter,
+    'detail': scenario_detail,
+    'create': scenario_create,
+    'upload': scenario_upload,
+    'token': scenario_token,
+}
+
+
+def percentile(values, percent):
+    """Nearest rank percentile of an already sorted list"""
+    if not values:
+        return None
+    rank = max(int(round(percent / 100 * len(values))) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def send(base_url, user, method, path, body, content_type):
+    """Send one request, return (seconds, status, queries)"""
+    headers = {'Authorization': f"Token {user['token']}"}
+    if content_type:
+        headers['Content-Type'] = content_type
+    req = request.Request(base_url + path, data=body, headers=headers,
+                          method=method)
+    start = time.perf_counter()
+    try:
+        with request.urlopen(req) as response:
+            response.read()
+            status, timing = response.status, response.headers
+    except error.HTTPError as exc:
+        status, timing = exc.code, exc.headers
+    elapsed = time.perf_counter() - start
+    match = QUERIES_RE.search(timing.get('Server-Timing', ''))
+    return elapsed, status, int(match.group(1)) if match else None
+
+
+def run_scenario(name, manifest, args):
+    """Run one scenario and return its summary"""
+    rng = random.Random(args.seed)
+    requests = []
+    for _ in range(args.requests):
+        user = rng.choice(manifest['users'])
+        requests.append((user,) + SCENARIOS[name](rng, user, manifest))
+
+    def call(item):
+        return send(args.url, *item)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        results = list(executor.map(call, requests))
+    wall = time.perf_counter() - start
+
+    latencies = sorted(elapsed for elapsed, _, _ in results)
+    queries = [count for _, _, count in results if count is not None]
+    return {
+        'requests': len(results),
+        'errors': sum(1 for _, status, _ in results if status >= 400),
+        'rps': round(len(results) / wall, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'queries_per_request': round(sum(queries) / len(queries), 1)
+        if queries else None,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Return the regressions of `results` against `baseline`"""
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline['scenarios'].get(name)
+        if not previous:
+            continue
+        for key in ('p50_ms', 'p95_ms'):
+            if current[key] > previous[key] * threshold:
+                regressions.append(
+                    f'{name} {key}: {previous[key]} -> {current[key]}'
+                )
+        queries = previous['queries_per_request']
+        if queries and current['queries_per_request'] and \
+                current['queries_per_request'] > queries * threshold:
+            regressions.append(
+                f"{name} queries/request: {queries}"
+                f" -> {current['queries_per_request']}"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--manifest',
+                        default='benchmarks/results/manifest.json')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--requests', type=int, default=200,
+                        help='requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', help='write the results to this file')
+    parser.add_argument('--compare', help='baseline results to compare to')
+    parser.add_argument('--threshold', type=float, default=1.5,
+                        help='allowed slowdown factor in compare mode')
+    args = parser.parse_args()
+
+    with open(args.manifest) as handle:
+        manifest = json.load(handle)
+    manifest['image'] = _image()
+
+    results = {'url': args.url, 'concurrency': args.concurrency,
+               'scenarios': {}}
+    print(f"{'scenario':<8} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} "
+          f"{'queries':>8} {'errors':>6}")
+    for name in args.scenarios.split(','):
+        summary = run_scenario(name, manifest, args)
+        results['scenarios'][name] = summary
+        print(f"{name:<8} {summary['rps']:>8} {summary['p50_ms']:>8} "
+              f"{summary['p95_ms']:>8} {summary['p99_ms']:>8} "
+              f"{str(summary['queries_per_request']):>8} "
+              f"{summary['errors']:>6}")
+
+    if args.save:
+        with open(args.save, 'w') as handle:
+            json.dump(results, handle, indent=2)
+    if args.compare:
+        with open(args.compare) as handle:
+            baseline = json.load(handle)
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+        print('no regressions')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Startup, memory and per-request cost of the full and API-only settings.
+
+Starts one fresh process per settings module, times loading the WSGI
+application and its URLs, reads the resident memory of the ready worker,
+then times requests through the whole middleware stack against a
+throwaway test database.
+
+    python benchmarks/profiles.py --requests 2000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILES = ('recipe_project.settings', 'recipe_project.settings_api')
+
+
+def rss_mb():
+    """Return the resident memory of this process in megabytes"""
+    with open('/proc/self/statm') as statm:
+        pages = int(statm.read().split()[1])
+    return pages * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+
+
+def per_request(client, path, requests, **headers):
+    """Return microseconds per request of path"""
+    client.get(path, **headers)
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get(path, **headers)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def child(requests):
+    """Measure the settings of this process, print them as JSON"""
+    start = time.perf_counter()
+    from django.core.wsgi import get_wsgi_application
+    from django.urls import get_resolver
+
+    get_wsgi_application()
+    get_resolver().url_patterns
+    startup = time.perf_counter() - start
+    ready_rss = rss_mb()
+
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    from core.models import AuthToken, User
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+    user = User.objects.create_user('bench@example.com', 'benchpass')
+    _, key = AuthToken.objects.issue(user)
+    client = Client()
+    print(json.dumps({
+        'startup_ms': startup * 1000,
+        'rss_mb': ready_rss,
+        'health_us': per_request(client, '/health/', requests),
+        'tags_us': per_request(
+            client, '/api/recipe/tags/', requests,
+            HTTP_AUTHORIZATION=f'Token {key}'
+        ),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--child', action='store_true',
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.path.insert(0, ROOT)
+        child(args.requests)
+        return
+
+    print(f'{"settings":<30} {"startup":>9} {"rss":>8} '
+          f'{"/health/":>10} {"/tags/":>10}')
+    for settings in PROFILES:
+        env = dict(
+            os.environ, DJANGO_SETTINGS_MODULE=settings,
+            THROTTLE_DISABLED='1', REQUEST_PROFILE_SAMPLE_RATE='0'
+        )
+        output = subprocess.run(
+            [sys.executable, __file__, '--child',
+             '--requests', str(args.requests)],
+            env=env, check=True, stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE, universal_newlines=True
+        ).stdout
+        result = json.loads(output.splitlines()[-1])
+        print(f'{settings:<30} {result["startup_ms"]:>6.0f} ms '
+              f'{result["rss_mb"]:>5.1f} MB '
+              f'{result["health_us"]:>7.0f} us {result["tags_us"]:>7.0f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Similar recipe queries against the MinHash-LSH index and a full scan.
+
+Generates users x recipes in a throwaway test database, times the batch
+index rebuild, then times similar recipe queries through the index and
+by scoring every recipe of the owner, and reports how many of the exact
+top scores the index matches.
+
+    python benchmarks/similarity.py --users 2 --recipes 50000 --queries 50
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recipe_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+from benchmarks.datagen import generate  # noqa: E402
+from core import sharding, similarity  # noqa: E402
+from core.models import Recipe  # noqa: E402
+
+
+def scan(recipe, limit):
+    """Return the exact top scores by scoring all the owner's recipes"""
+    with sharding.using_user(recipe.user_id):
+        recipe_ids = list(
+            Recipe.objects.filter(user_id=recipe.user_id).values_list(
+                'id', flat=True
+            )
+        )
+        found = similarity.features(recipe_ids)
+    target = found.pop(recipe.pk)
+    ranked = sorted(
+        ((similarity.jaccard(target, other), recipe_id)
+         for recipe_id, other in found.items()),
+        key=lambda item: (-item[0], item[1]),
+    )
+    return [value for value, _ in ranked[:limit] if value]
+
+
+def timed(function, *args):
+    """Return (milliseconds, result) of a call"""
+    start = time.perf_counter()
+    result = function(*args)
+    return (time.perf_counter() - start) * 1000, result
+
+
+def report(name, timings):
+    """Print the median and 95th percentile of timings"""
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * .95) - 1] if len(timings) > 1 else (
+        timings[0]
+    )
+    print(f'{name:<10} p50 {statistics.median(timings):8.1f} ms  '
+          f'p95 {p95:8.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=2)
+    parser.add_argument('--recipes', type=int, default=50000,
+                        help='recipes per user')
+    parser.add_argument('--tags', type=int, default=40)
+    parser.add_argument('--ingredients', type=int, default=200)
+    parser.add_argument('--links', type=int, default=4)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+    generate(args.users, args.recipes, args.tags, args.ingredients,
+             args.links)
+
+    elapsed, indexed = timed(similarity.rebuild_all)
+    print(f'rebuild    {indexed} recipes in {elapsed / 1000:.1f} s')
+
+    recipes = sharding.Merged(
+        Recipe.objects.only('id', 'user_id').order_by('id'),
+        key=lambda recipe: recipe.pk
+    )
+    samples = random.Random(0).sample(recipes[:None], args.queries)
+    index_timings, scan_timings, recalls = [], [], []
+    for recipe in samples:
+        with sharding.using_user(recipe.user_id):
+            elapsed, ranked = timed(similarity.similar, recipe, args.limit)
+        index_timings.append(elapsed)
+        elapsed, exact = timed(scan, recipe, args.limit)
+        scan_timings.append(elapsed)
+        if exact:
+            # ties make the ids ambiguous, count results scoring as well
+            # as the exact last place
+            hits = [value for _, value in ranked if value >= exact[-1]]
+            recalls.append(min(len(hits), len(exact)) / len(exact))
+
+    report('index', index_timings)
+    report('scan', scan_timings)
+    if recalls:
+        print(f'recall@{args.limit}  {statistics.mean(recalls):.0%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Slow client capacity of the WSGI and the ASGI deployment.
+
+Every simulated client trickles a request body in --chunks pieces with
+--delay seconds in between. Under WSGI a worker thread is blocked while the
+body arrives; under the ASGI entry point the body is received on the event
+loop and a thread is only taken to run Django. Both get --workers threads.
+
+    python benchmarks/slow_clients.py --clients 64 --workers 8
+"""
+import argparse
+import logging
+import asyncio
+import io
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recipe_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+from core.asgi import WsgiToAsgi  # noqa: E402
+
+# an upload rejected by authentication, so the run needs no database
+PATH = '/api/recipe/recipes/'
+CHUNK = b'x' * 1024
+
+
+def wsgi_client(application, chunks, delay):
+    """One client on a blocking worker thread, returns its latency"""
+    start = time.perf_counter()
+    body = io.BytesIO()
+    for _ in range(chunks):
+        time.sleep(delay)  # the worker waits on the socket
+        body.write(CHUNK)
+    body.seek(0)
+    environ = {
+        'REQUEST_METHOD': 'POST', 'PATH_INFO': PATH, 'SCRIPT_NAME': '',
+        'QUERY_STRING': '', 'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'CONTENT_LENGTH': str(len(CHUNK) * chunks),
+        'wsgi.input': body, 'wsgi.errors': sys.stderr,
+        'wsgi.url_scheme': 'http',
+    }
+    result = application(environ, lambda status, headers: None)
+    b''.join(result)
+    result.close()
+    return time.perf_counter() - start
+
+
+def run_wsgi(clients, workers, chunks, delay):
+    application = get_wsgi_application()
+    with ThreadPoolExecutor(workers) as executor:
+        start = time.perf_counter()
+        latencies = list(executor.map(
+            lambda _: wsgi_client(application, chunks, delay), range(clients)
+        ))
+    return time.perf_counter() - start, latencies
+
+
+async def asgi_client(application, chunks, delay):
+    start = time.perf_counter()
+    remaining = [chunks]
+
+    async def receive():
+        await asyncio.sleep(delay)
+        remaining[0] -= 1
+        return {'type': 'http.request', 'body': CHUNK,
+                'more_body': remaining[0] > 0}
+
+    async def send(message):
+        pass
+
+    scope = {'type': 'http', 'method': 'POST', 'path': PATH,
+             'server': ('testserver', 80),
+             'query_string': b'', 'headers': [
+                 (b'content-length', str(len(CHUNK) * chunks).encode())
+             ]}
+    await application(scope, receive, send)
+    return time.perf_counter() - start
+
+
+def run_asgi(clients, workers, chunks, delay):
+    application = WsgiToAsgi(get_wsgi_application(), max_workers=workers)
+
+    async def main():
+        return await asyncio.gather(*(
+            asgi_client(application, chunks, delay) for _ in range(clients)
+        ))
+
+    loop = asyncio.new_event_loop()
+    start = time.perf_counter()
+    try:
+        latencies = loop.run_until_complete(main())
+    finally:
+        loop.close()
+    return time.perf_counter() - start, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--chunks', type=int, default=10)
+    parser.add_argument('--delay', type=float, default=0.02)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    setup_test_environment()
+
+    print(f'{args.clients} clients, {args.workers} threads, each upload '
+          f'takes {args.chunks * args.delay:.2f}s')
+    for name, run in (('wsgi', run_wsgi), ('asgi', run_asgi)):
+        elapsed, latencies = run(
+            args.clients, args.workers, args.chunks, args.delay
+        )
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(f'{name}  {elapsed:6.2f}s total  '
+              f'{args.clients / elapsed:7.1f} req/s  p95 {p95:6.2f}s')
+
+
+if __name__ == '__main__':
+    main()
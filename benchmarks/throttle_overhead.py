@@ -0,0 +1,64 @@
+"""Overhead of the token bucket throttle per request.
+
+Times TokenBucketThrottle.allow_request for an authenticated and an
+anonymous request with each bucket backend, with limits high enough that
+every request is let through.
+
+    python benchmarks/throttle_overhead.py --calls 200000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recipe_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import AnonymousUser  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from rest_framework.request import Request  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from core.models import User  # noqa: E402
+from core.throttling import TokenBucketThrottle  # noqa: E402
+
+UNLIMITED = {'read': (10 ** 9, 10 ** 9)}
+
+
+class View:
+    throttle_scope = None
+
+
+def per_call(calls, user, backend):
+    """Return microseconds per allow_request call"""
+    request = Request(APIRequestFactory().get('/api/recipe/recipes/'))
+    request.user = user
+    view = View()
+    with override_settings(THROTTLE_BUCKETS=UNLIMITED,
+                           THROTTLE_BACKEND=backend):
+        throttle = TokenBucketThrottle()
+        start = time.perf_counter()
+        for _ in range(calls):
+            throttle.allow_request(request, view)
+        elapsed = time.perf_counter() - start
+    return elapsed / calls * 10 ** 6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=100000)
+    args = parser.parse_args()
+
+    user = User(pk=1, email='bench@example.com')
+    for backend in ('local', 'cache'):
+        for name, who in (('user', user), ('anonymous', AnonymousUser())):
+            cost = per_call(args.calls, who, backend)
+            print(f'{backend:<6} {name:<10} {cost:6.2f} us/request')
+
+
+if __name__ == '__main__':
+    main()
@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        """Connect the signal handlers and register the background jobs"""
+        from core import (  # noqa: F401
+            changes, facets, linked_ids, profiler, response_cache, sharding,
+            signals, similarity, tasks
+        )
+        profiler.install_signal()
@@ -0,0 +1,33 @@
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from core.models import AuthToken
+
+
+class ExpiringTokenAuthentication(TokenAuthentication):
+    """Token authentication against hashed, expiring AuthTokens
+
+    The key prefix is indexed, so a lookup stays one indexed query.
+    """
+    model = AuthToken
+
+    def authenticate_credentials(self, key):
+        candidates = AuthToken.objects.select_related('user').filter(
+            prefix=key[:AuthToken.PREFIX_LENGTH]
+        )
+        for token in candidates:
+            if token.matches(key):
+                break
+        else:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        if token.is_expired():
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+
+        return (token.user, token)
@@ -0,0 +1,83 @@
+import os
+
+from django.db.backends.postgresql import base
+from psycopg2 import pool
+
+from core.backends.postgresql_pool.pool import (
+    BoundedPool, PoolTimeout, pool_for
+)
+
+POOL_OPTIONS = ('pool_min_size', 'pool_max_size', 'pool_timeout')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL backend taking connections from a process-wide pool"""
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        for option in POOL_OPTIONS:
+            conn_params.pop(option, None)
+        return conn_params
+
+    def get_pool(self, conn_params):
+        """Return this process' pool of the alias, creating it on first use"""
+        options = self.settings_dict['OPTIONS']
+        size = options.get('pool_max_size', 10)
+
+        def create():
+            return BoundedPool(
+                pool.ThreadedConnectionPool(
+                    options.get('pool_min_size', 1), size, **conn_params
+                ),
+                size,
+                options.get('pool_timeout', 5),
+            )
+
+        return pool_for(self.alias, create)
+
+    def get_new_connection(self, conn_params):
+        connection_pool = self.get_pool(conn_params)
+        try:
+            connection = connection_pool.getconn()
+            if not self._is_healthy(connection):
+                connection_pool.putconn(connection, close=True)
+                connection = connection_pool.getconn()
+        except PoolTimeout as error:
+            raise base.Database.OperationalError(str(error)) from error
+        self._pool = connection_pool
+
+        # same isolation level handling as the stock backend
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+
+        return connection
+
+    def _is_healthy(self, connection):
+        """Check a pooled connection still talks to the server"""
+        if connection.closed:
+            return False
+        if not self.settings_dict.get('CONN_HEALTH_CHECKS'):
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            connection.rollback()
+        except base.Database.Error:
+            return False
+        return True
+
+    def _close(self):
+        """Give the connection back to the pool instead of closing it"""
+        if self.connection is None:
+            return
+        # inherited through fork, closing it would end the parent's session
+        if self._pool.pid != os.getpid():
+            return
+        with self.wrap_database_errors:
+            self._pool.putconn(self.connection)
@@ -0,0 +1,56 @@
+import os
+import threading
+
+# (alias, pid) -> BoundedPool, a forked worker builds its own pools
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(Exception):
+    """No pooled connection became free in time"""
+
+
+class BoundedPool:
+    """Make a connection pool wait for a free connection
+
+    psycopg2's pools raise as soon as every connection is handed out,
+    getconn here waits up to timeout seconds for one to come back.
+    """
+
+    def __init__(self, pool, size, timeout):
+        self.pool = pool
+        self.timeout = timeout
+        self.pid = os.getpid()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def getconn(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(
+                f'No database connection free within {self.timeout}s'
+            )
+        try:
+            return self.pool.getconn()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def putconn(self, connection, close=False):
+        try:
+            self.pool.putconn(connection, close=close)
+        finally:
+            self._slots.release()
+
+
+def pool_for(alias, create):
+    """Return this process' pool of alias, creating it with create()
+
+    Pools of other pids were inherited through fork. Their sockets
+    belong to the parent, so they are forgotten without being closed.
+    """
+    pid = os.getpid()
+    with _pools_lock:
+        if (alias, pid) not in _pools:
+            for key in [key for key in _pools if key[1] != pid]:
+                del _pools[key]
+            _pools[alias, pid] = create()
+        return _pools[alias, pid]
@@ -0,0 +1,198 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, Max, OuterRef, Q
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core import notify
+from core.models import Change, Ingredient, Recipe, Tag, User
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+KINDS = {
+    Recipe: Change.RECIPE, Tag: Change.TAG, Ingredient: Change.INGREDIENT,
+}
+LINKS = (Recipe.tags.through, Recipe.ingredients.through)
+
+
+def record(user_id, kind, object_id, deleted=False):
+    """Append an entry to a user's change log
+
+    Bumping the user's counter locks their row until the surrounding
+    transaction commits, so sequence numbers of one user are committed
+    in order and a reader never skips one still in flight. Waiters on
+    the user's notifications wake once the entry is committed.
+    """
+    with transaction.atomic():
+        updated = User.objects.filter(pk=user_id).update(
+            change_seq=F('change_seq') + 1
+        )
+        if not updated:
+            return
+        seq = User.objects.filter(pk=user_id).values_list(
+            'change_seq', flat=True
+        ).get()
+        Change.objects.create(
+            user_id=user_id, seq=seq, kind=kind, object_id=object_id,
+            deleted=deleted
+        )
+    transaction.on_commit(lambda: notify.publish(user_id))
+
+
+def _record_recipes(recipe_ids):
+    """Log an update of each of the given recipes"""
+    owners = Recipe.all_objects.filter(pk__in=list(recipe_ids)).values_list(
+        'id', 'user_id', 'deleted_at'
+    )
+    for recipe_id, user_id, deleted_at in owners:
+        if deleted_at is None:
+            record(user_id, Change.RECIPE, recipe_id)
+
+
+def changes(user, cursor, limit):
+    """Return (entries, next cursor, more) of a user's log after cursor
+
+    Returns None when the cursor is missing, unknown or older than the
+    compacted history, the client has to fetch everything again. Only
+    the last entry of an object within the page is returned.
+    """
+    seq, floor = User.objects.filter(pk=user.pk).values_list(
+        'change_seq', 'sync_floor'
+    ).get()
+    if cursor is None or not floor <= cursor <= seq:
+        return None
+
+    entries = list(
+        Change.objects.filter(user=user, seq__gt=cursor).order_by('seq')[
+            :limit
+        ]
+    )
+    if not entries:
+        return [], cursor, False
+    latest = {(entry.kind, entry.object_id): entry for entry in entries}
+    return (
+        sorted(latest.values(), key=lambda entry: entry.seq),
+        entries[-1].seq,
+        len(entries) == limit,
+    )
+
+
+def current(user):
+    """Return the cursor of a user's latest change"""
+    return User.objects.filter(pk=user.pk).values_list(
+        'change_seq', flat=True
+    ).get()
+
+
+def compact(user_id, before):
+    """Drop a user's superseded log entries and those older than before
+
+    Returns how many entries were dropped. History older than before is
+    gone, so the user's floor moves past it.
+    """
+    later = Change.objects.filter(
+        user_id=OuterRef('user_id'), kind=OuterRef('kind'),
+        object_id=OuterRef('object_id'), seq__gt=OuterRef('seq')
+    )
+    with transaction.atomic():
+        floor = Change.objects.filter(
+            user_id=user_id, created__lt=before
+        ).aggregate(seq=Max('seq'))['seq']
+        if floor is not None:
+            User.objects.filter(pk=user_id, sync_floor__lt=floor).update(
+                sync_floor=floor
+            )
+        stale = Change.objects.filter(user_id=user_id).annotate(
+            superseded=Exists(later)
+        ).filter(Q(superseded=True) | Q(created__lt=before)).values('pk')
+        count, _ = Change.objects.filter(pk__in=stale).delete()
+
+    return count
+
+
+def compact_all(batch_size=100, days=None):
+    """Compact every user's log a batch of users at a time
+
+    Returns the number of entries dropped.
+    """
+    days = settings.SYNC_LOG_DAYS if days is None else days
+    before = timezone.now() - timedelta(days=days)
+    last, dropped = 0, 0
+    while True:
+        user_ids = list(
+            User.objects.filter(pk__gt=last).order_by('pk').values_list(
+                'pk', flat=True
+            )[:batch_size]
+        )
+        if not user_ids:
+            return dropped
+        for user_id in user_ids:
+            dropped += compact(user_id, before)
+        last = user_ids[-1]
+
+
+class AtomicWritesMixin:
+    """Run unsafe requests of a view in one transaction
+
+    The change log entries of a request then commit or roll back with
+    the changes themselves. Actions that only read can pass
+    `atomic_writes=False`.
+    """
+    atomic_writes = True
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in SAFE_METHODS or not self.atomic_writes:
+            return super().dispatch(request, *args, **kwargs)
+        with transaction.atomic():
+            return super().dispatch(request, *args, **kwargs)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def log_saved(sender, instance, **kwargs):
+    """Log a created or updated object, a soft deleted recipe as deleted"""
+    deleted = getattr(instance, 'deleted_at', None) is not None
+    record(instance.user_id, KINDS[sender], instance.pk, deleted)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def log_deleted(sender, instance, **kwargs):
+    """Log a tombstone of a deleted object"""
+    # soft deleted recipes were logged as deleted already
+    if getattr(instance, 'deleted_at', None) is None:
+        record(instance.user_id, KINDS[sender], instance.pk, deleted=True)
+
+
+@receiver(m2m_changed)
+def log_links(sender, instance, action, reverse, pk_set, **kwargs):
+    """Log an update of recipes whose tags or ingredients changed"""
+    if sender not in LINKS:
+        return
+    if action == 'pre_clear' and reverse:
+        column = 'tag_id' if sender is LINKS[0] else 'ingredient_id'
+        instance._changed_recipes = list(sender.objects.filter(
+            **{column: instance.pk}
+        ).values_list('recipe_id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if action != 'post_clear' and not pk_set:
+        return
+
+    if not reverse:
+        record(instance.user_id, Change.RECIPE, instance.pk)
+    elif action == 'post_clear':
+        _record_recipes(instance.__dict__.pop('_changed_recipes', []))
+    else:
+        _record_recipes(pk_set)
+
+
+@receiver(post_delete, sender=User)
+def drop_log(sender, instance, **kwargs):
+    """Drop the log of a deleted user, with the entries of its cascade"""
+    Change.objects.filter(user_id=instance.pk).delete()
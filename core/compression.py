@@ -0,0 +1,82 @@
+import gzip
+from io import BytesIO
+
+from core import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSED = metrics.registry.register(metrics.Counter(
+    'compressed_responses_total',
+    'Responses sent compressed by encoding, reused variants included.',
+    ('encoding',),
+))
+BYTES_SAVED = metrics.registry.register(metrics.Counter(
+    'compression_bytes_saved_total',
+    'Bytes of response bodies saved by compression by encoding.',
+    ('encoding',),
+))
+
+
+def _gzip(data):
+    # a fixed mtime keeps the output, and so cached variants, stable;
+    # gzip.compress only takes mtime from Python 3.8
+    buffer = BytesIO()
+    with gzip.GzipFile(
+        fileobj=buffer, mode='wb', compresslevel=6, mtime=0
+    ) as stream:
+        stream.write(data)
+
+    return buffer.getvalue()
+
+
+# encoding -> compress function, in order of preference, levels chosen
+# for cheap compression of small JSON bodies
+CODECS = {}
+if brotli is not None:
+    CODECS['br'] = lambda data: brotli.compress(data, quality=4)
+if zstandard is not None:
+    # compressor objects must not be shared between threads
+    CODECS['zstd'] = lambda data: zstandard.ZstdCompressor(
+        level=3
+    ).compress(data)
+CODECS['gzip'] = _gzip
+
+
+def accepted(header):
+    """Return {encoding: quality} of an Accept-Encoding header"""
+    found = {}
+    for item in header.split(','):
+        encoding, _, params = item.strip().partition(';')
+        quality = 1.0
+        name, _, value = params.strip().partition('=')
+        if name.strip() == 'q':
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        if encoding:
+            found[encoding.strip().lower()] = quality
+
+    return found
+
+
+def negotiate(header):
+    """Return the preferred encoding a client accepts, None for none"""
+    qualities = accepted(header)
+    wildcard = qualities.get('*', 0)
+    for encoding in CODECS:
+        if qualities.get(encoding, wildcard) > 0:
+            return encoding
+
+    return None
+
+
+def compress(encoding, data):
+    return CODECS[encoding](data)
@@ -0,0 +1,118 @@
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+from django.utils import timezone
+
+from core import jobs, response_cache, sharding
+from core.models import AuthToken, Recipe, User
+
+
+def delete_recipe(recipe):
+    """Hide a recipe at once and queue the deletion of its rows"""
+    recipe.deleted_at = timezone.now()
+    recipe.save(update_fields=['deleted_at'])
+    jobs.enqueue(
+        'purge_recipe', recipe_id=recipe.pk, user_id=recipe.user_id
+    )
+
+
+def delete_user(user):
+    """Close an account at once and queue the deletion of its data"""
+    user.is_active = False
+    user.deleted_at = timezone.now()
+    user.save(update_fields=['is_active', 'deleted_at'])
+    shard = sharding.shard_of(user.pk)
+    if shard != DEFAULT_DB_ALIAS:
+        # public lists read on the shard join its copy of the user
+        User.objects.using(shard).filter(pk=user.pk).update(
+            deleted_at=user.deleted_at
+        )
+    AuthToken.objects.filter(user=user).delete()
+    public = Recipe.objects.filter(user=user, is_public=True).values_list(
+        'pk', flat=True
+    )
+    response_cache.purge(
+        response_cache.PUBLIC_RECIPES,
+        *(response_cache.recipe_key(recipe_id) for recipe_id in public)
+    )
+    jobs.enqueue('purge_user', user_id=user.pk)
+
+
+def _cascades(model):
+    """Return (model, field name) of foreign keys cascading from model"""
+    return [
+        (relation.related_model, relation.field.name)
+        for relation in model._meta.get_fields(include_hidden=True)
+        if relation.auto_created and not relation.concrete
+        and (relation.one_to_many or relation.one_to_one)
+        and relation.on_delete is models.CASCADE
+    ]
+
+
+def _files(model, ids):
+    """Return (storage, name) of the files stored by the given rows"""
+    files = []
+    for field in model._meta.concrete_fields:
+        if not isinstance(field, models.FileField):
+            continue
+        names = model._base_manager.filter(pk__in=ids).exclude(
+            **{field.name: ''}
+        ).exclude(**{f'{field.name}__isnull': True}).values_list(
+            field.name, flat=True
+        )
+        files.extend((field.storage, name) for name in names)
+
+    return files
+
+
+def purge(queryset, batch_size=1000):
+    """Delete the rows of queryset and all that cascades from them
+
+    Rows go batch_size at a time, children first, with plain DELETE
+    statements that neither load the rows nor send signals. Each batch of
+    queryset is its own transaction, so locks are held briefly. Returns
+    the number of rows deleted.
+    """
+    model = queryset.model
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        files = _files(model, ids)
+        with transaction.atomic(using=queryset.db):
+            for related, field in _cascades(model):
+                deleted += purge(
+                    related._base_manager.using(queryset.db).filter(
+                        **{f'{field}__in': ids}
+                    ),
+                    batch_size
+                )
+            rows = model._base_manager.using(queryset.db).filter(pk__in=ids)
+            deleted += rows._raw_delete(queryset.db)
+        for storage, name in files:
+            storage.delete(name)
+
+
+def purge_recipe(recipe_id, batch_size=1000):
+    """Delete a deleted recipe's rows, return how many"""
+    return purge(
+        Recipe.all_objects.filter(pk=recipe_id, deleted_at__isnull=False),
+        batch_size
+    )
+
+
+def purge_user(user_id, batch_size=1000):
+    """Delete a closed account's data, return how many rows"""
+    if not User.objects.filter(pk=user_id, deleted_at__isnull=False).exists():
+        return 0
+    shard = sharding.shard_of(user_id)
+    deleted = 0
+    with sharding.using(shard):
+        for related, field in _cascades(User):
+            deleted += purge(
+                related._base_manager.filter(**{field: user_id}), batch_size
+            )
+    # the collector handles anything not deleted by cascade, cheaply now
+    count, _ = User.objects.using(DEFAULT_DB_ALIAS).filter(
+        pk=user_id
+    ).delete()
+    return deleted + count + sharding.drop_stub(user_id, shard)
@@ -0,0 +1,288 @@
+from collections import Counter
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from core import sharding
+from core.models import FacetCount, Ingredient, Recipe, Tag
+
+# Link table -> (facet, column holding the tag or ingredient id)
+LINK_FACETS = {
+    Recipe.tags.through: (FacetCount.TAG, 'tag_id'),
+    Recipe.ingredients.through: (FacetCount.INGREDIENT, 'ingredient_id'),
+}
+
+
+def price_bucket(price):
+    """Return the lower bound of the price bucket holding price"""
+    width = settings.FACET_PRICE_BUCKET
+    return int(Decimal(str(price)) // width) * width
+
+
+def time_bucket(minutes):
+    """Return the lower bound of the time bucket holding minutes"""
+    width = settings.FACET_TIME_BUCKET
+    return int(minutes) // width * width
+
+
+def _buckets(recipe):
+    """Return the (price, time) buckets of a recipe, None if not loaded"""
+    fields = recipe.__dict__
+    if fields.get('price') is None or fields.get('time_minutes') is None:
+        return None
+
+    return price_bucket(recipe.price), time_bucket(recipe.time_minutes)
+
+
+def bump(user_id, facet, values, delta=1):
+    """Add delta to the user's counter of every value in values"""
+    for value, times in Counter(values).items():
+        amount = delta * times
+        counters = FacetCount.objects.filter(
+            user_id=user_id, facet=facet, value=value
+        )
+        if counters.update(count=F('count') + amount) or amount < 0:
+            continue
+        try:
+            with transaction.atomic():
+                FacetCount.objects.create(
+                    user_id=user_id, facet=facet, value=value, count=amount
+                )
+        except IntegrityError:
+            counters.update(count=F('count') + amount)
+
+
+def _bump_recipe(recipe, buckets, delta):
+    """Count a recipe in or out of its user's totals and buckets"""
+    bump(recipe.user_id, FacetCount.RECIPES, [0], delta)
+    bump(recipe.user_id, FacetCount.PRICE, [buckets[0]], delta)
+    bump(recipe.user_id, FacetCount.TIME, [buckets[1]], delta)
+
+
+def _uncount_recipe(recipe, buckets=None):
+    """Remove a recipe and its links from its user's counters"""
+    if buckets is None and _buckets(recipe) is None:
+        recipe.refresh_from_db(fields=('price', 'time_minutes'))
+    _bump_recipe(recipe, buckets or _buckets(recipe), -1)
+    for through, (facet, column) in LINK_FACETS.items():
+        values = through.objects.filter(
+            recipe_id=recipe.pk
+        ).values_list(column, flat=True)
+        bump(recipe.user_id, facet, list(values), -1)
+
+
+# Recipe fields a save must change to move the recipe in the counters
+COUNTED_FIELDS = ('price', 'time_minutes', 'deleted_at')
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_stored(sender, instance, using, update_fields, **kwargs):
+    """Read the stored buckets of a recipe about to be changed
+
+    Only saves of existing recipes that may touch the counted fields pay
+    for the query, loading recipes costs nothing.
+    """
+    if instance._state.adding:
+        return
+    if update_fields is not None and \
+            not set(update_fields) & set(COUNTED_FIELDS):
+        return
+    stored = Recipe.all_objects.using(using).filter(
+        pk=instance.pk
+    ).values(*COUNTED_FIELDS).first()
+    if stored is not None:
+        instance._facet_stored = (
+            price_bucket(stored['price']),
+            time_bucket(stored['time_minutes']),
+            stored['deleted_at'] is None,
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def count_saved_recipe(sender, instance, created, **kwargs):
+    """Count a new recipe, or move it when its price or time changed"""
+    if created:
+        _bump_recipe(instance, _buckets(instance), 1)
+        return
+    stored = instance.__dict__.pop('_facet_stored', None)
+    if stored is None:
+        return
+    old, was_live = stored[:2], stored[2]
+    buckets = _buckets(instance)
+    live = instance.deleted_at is None
+    if not live and was_live:
+        _uncount_recipe(instance, old)
+    elif live and was_live and buckets and old != buckets:
+        for facet, before, after in zip(
+                (FacetCount.PRICE, FacetCount.TIME), old, buckets):
+            if before != after:
+                bump(instance.user_id, facet, [before], -1)
+                bump(instance.user_id, facet, [after], 1)
+
+
+@receiver(pre_delete, sender=Recipe)
+def uncount_deleted_recipe(sender, instance, **kwargs):
+    """Remove a recipe and its links, which go without m2m_changed"""
+    if instance.deleted_at is None:
+        _uncount_recipe(instance)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def drop_deleted_counters(sender, instance, **kwargs):
+    """Forget the counters of a deleted tag or ingredient"""
+    facet = FacetCount.TAG if sender is Tag else FacetCount.INGREDIENT
+    FacetCount.objects.filter(facet=facet, value=instance.pk).delete()
+
+
+def _links(sender, instance, action, reverse, pk_set, column):
+    """Return (user id, value) pairs of the links being added or removed"""
+    recipe_side = 'recipe_id'
+    own_side, other_side = (column, recipe_side) if reverse else (
+        recipe_side, column
+    )
+    if action == 'post_add':
+        ids = pk_set
+    else:
+        links = sender.objects.filter(**{own_side: instance.pk})
+        if pk_set is not None:
+            links = links.filter(**{f'{other_side}__in': pk_set})
+        ids = list(links.values_list(other_side, flat=True))
+
+    if not reverse:
+        return [(instance.user_id, value) for value in ids]
+    users = Recipe.objects.filter(pk__in=ids).values_list(
+        'user_id', flat=True
+    )
+    return [(user_id, instance.pk) for user_id in users]
+
+
+@receiver(m2m_changed)
+def count_links(sender, instance, action, reverse, pk_set, **kwargs):
+    """Follow tags and ingredients being linked to or unlinked from recipes
+
+    Removals are counted before they happen, when the links that really
+    exist can still be read.
+    """
+    if sender not in LINK_FACETS:
+        return
+    if action == 'post_add':
+        delta = 1
+    elif action in ('pre_remove', 'pre_clear'):
+        delta = -1
+    else:
+        return
+
+    facet, column = LINK_FACETS[sender]
+    by_user = {}
+    for user_id, value in _links(
+            sender, instance, action, reverse, pk_set, column):
+        by_user.setdefault(user_id, []).append(value)
+    for user_id, values in by_user.items():
+        bump(user_id, facet, values, delta)
+
+
+def tally(recipes):
+    """Count recipes per facet with GROUP BY, keyed (user, facet, value)"""
+    counts = Counter()
+    for user_id, number in recipes.values_list('user_id').annotate(
+            number=Count('id')).order_by():
+        counts[user_id, FacetCount.RECIPES, 0] += number
+    for field, facet, bucket in (
+            ('price', FacetCount.PRICE, price_bucket),
+            ('time_minutes', FacetCount.TIME, time_bucket)):
+        rows = recipes.values_list('user_id', field).annotate(
+            number=Count('id')
+        ).order_by()
+        for user_id, value, number in rows:
+            counts[user_id, facet, bucket(value)] += number
+    for through, (facet, column) in LINK_FACETS.items():
+        rows = through.objects.filter(recipe__in=recipes).values_list(
+            'recipe__user_id', column
+        ).annotate(number=Count('id')).order_by()
+        for user_id, value, number in rows:
+            counts[user_id, facet, value] += number
+
+    return counts
+
+
+def rebuild(user_ids):
+    """Recompute the counters of the given users from their recipes"""
+    counts = tally(Recipe.objects.filter(user_id__in=user_ids))
+    with transaction.atomic():
+        FacetCount.objects.filter(user_id__in=user_ids).delete()
+        FacetCount.objects.bulk_create(
+            FacetCount(user_id=user_id, facet=facet, value=value, count=n)
+            for (user_id, facet, value), n in counts.items()
+        )
+
+
+def rebuild_all(batch_size=100):
+    """Rebuild every user's counters a batch of users at a time"""
+    rebuilt = 0
+    for alias in sharding.aliases():
+        users, last = sharding.users_on(alias), 0
+        while True:
+            user_ids = list(
+                users.filter(pk__gt=last).order_by('pk').values_list(
+                    'pk', flat=True
+                )[:batch_size]
+            )
+            if not user_ids:
+                break
+            with sharding.using(alias):
+                rebuild(user_ids)
+            last = user_ids[-1]
+            rebuilt += len(user_ids)
+
+    return rebuilt
+
+
+def as_response(rows):
+    """Shape (facet, value, count) rows as the facets endpoint returns them"""
+    price_width = settings.FACET_PRICE_BUCKET
+    time_width = settings.FACET_TIME_BUCKET
+    facets = {
+        'count': 0, 'tags': [], 'ingredients': [],
+        'price': [], 'time_minutes': [],
+    }
+    for facet, value, count in sorted(rows):
+        if count <= 0:
+            continue
+        if facet == FacetCount.RECIPES:
+            facets['count'] = count
+        elif facet == FacetCount.TAG:
+            facets['tags'].append({'id': value, 'count': count})
+        elif facet == FacetCount.INGREDIENT:
+            facets['ingredients'].append({'id': value, 'count': count})
+        elif facet == FacetCount.PRICE:
+            facets['price'].append(
+                {'min': value, 'max': value + price_width, 'count': count}
+            )
+        elif facet == FacetCount.TIME:
+            facets['time_minutes'].append(
+                {'min': value, 'max': value + time_width, 'count': count}
+            )
+
+    return facets
+
+
+def for_user(user):
+    """Return the user's facets from the maintained counters"""
+    return as_response(FacetCount.objects.filter(
+        user=user, count__gt=0
+    ).values_list('facet', 'value', 'count'))
+
+
+def for_recipes(recipes):
+    """Return facets of a filtered recipe queryset, counted on the fly"""
+    return as_response(
+        (facet, value, count)
+        for (_, facet, value), count in tally(recipes).items()
+    )
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """PBKDF2 with the iteration count of settings.PASSWORD_HASH_ITERATIONS
+
+    Hashes made with another count are upgraded on the next login.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(
+            settings,
+            'PASSWORD_HASH_ITERATIONS',
+            hashers.PBKDF2PasswordHasher.iterations
+        )
@@ -0,0 +1,164 @@
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+from core import profiler
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+# collapse variable length parameter lists such as IN (%s, %s, %s)
+PARAMS_RE = re.compile(r'%s(?:, %s)+')
+
+
+def sql_shape(sql):
+    """Return the SQL with parameter lists collapsed to one placeholder"""
+    return PARAMS_RE.sub('%s', sql)
+
+
+def sampled():
+    """Decide if the current request gets profiled"""
+    rate = getattr(settings, 'REQUEST_PROFILE_SAMPLE_RATE', 0)
+    return rate > 0 and random.random() < rate
+
+
+def current():
+    """Return the profile of the current request, None if not sampled"""
+    return getattr(_local, 'profile', None)
+
+
+class RequestProfile:
+    """Query and timing figures of a single request"""
+
+    def __init__(self):
+        self.queries = []
+        self.sql_time = 0.0
+        self.timings = {}
+        self._started = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper timing every query"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.queries.append((sql, duration))
+            self.sql_time += duration
+
+    def start(self, phase):
+        """Start timing a phase of the request"""
+        self._started[phase] = (time.perf_counter(), self.sql_time)
+
+    def stop(self, phase):
+        """Stop timing a phase, leaving out SQL time spent during it"""
+        if phase not in self._started:
+            return
+        start, sql_time = self._started.pop(phase)
+        elapsed = time.perf_counter() - start
+        self.timings[phase] = elapsed - (self.sql_time - sql_time)
+
+    def slowest(self, count=3):
+        """Return the slowest queries as (sql, seconds) pairs"""
+        return sorted(self.queries, key=lambda query: -query[1])[:count]
+
+    def repeated(self, threshold):
+        """Return SQL shapes issued at least `threshold` times (N+1)"""
+        shapes = Counter(sql_shape(sql) for sql, _ in self.queries)
+        return {
+            shape: count for shape, count in shapes.items()
+            if count >= threshold
+        }
+
+    def server_timing(self):
+        """Format the figures as a Server-Timing header value"""
+        metrics = [
+            f'db;dur={self.sql_time * 1000:.2f};'
+            f'desc="{len(self.queries)} queries"'
+        ]
+        for phase, seconds in self.timings.items():
+            metrics.append(f'{phase};dur={seconds * 1000:.2f}')
+        return ', '.join(metrics)
+
+    def as_dict(self, request, response):
+        """Return the structured log record of the request"""
+        threshold = getattr(settings, 'REQUEST_PROFILE_REPEAT_THRESHOLD', 5)
+        return {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': len(self.queries),
+            'sql_ms': round(self.sql_time * 1000, 2),
+            'timings_ms': {
+                phase: round(seconds * 1000, 2)
+                for phase, seconds in self.timings.items()
+            },
+            'slowest': [
+                {'sql': sql, 'ms': round(seconds * 1000, 2)}
+                for sql, seconds in self.slowest()
+            ],
+            'repeated': self.repeated(threshold),
+        }
+
+
+@contextmanager
+def profiling(profile):
+    """Make `profile` current and time queries on every connection"""
+    _local.profile = profile
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile))
+            yield profile
+    finally:
+        _local.profile = None
+
+
+def log_profile(request, response, profile):
+    """Write the structured log line, as a warning when N+1 is suspected"""
+    record = profile.as_dict(request, response)
+    level = logging.WARNING if record['repeated'] else logging.INFO
+    logger.log(level, json.dumps(record))
+
+
+class ProfiledViewMixin:
+    """Time the handler of DRF views (serialisation) for sampled requests
+
+    Also runs core.profiler around the handler of requests asking for it.
+    """
+    view_profile = None
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            # an unhandled exception skips finalize_response
+            if self.view_profile is not None:
+                self.view_profile.stop()
+                self.view_profile = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        profile = current()
+        if profile is not None:
+            profile.start('serialize')
+        # after authentication, which tells if the user is staff
+        self.view_profile = profiler.start(request, self)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self.view_profile is not None:
+            profiler.finish(self.view_profile, response)
+            self.view_profile = None
+        profile = current()
+        if profile is not None:
+            profile.stop('serialize')
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,178 @@
+import json
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from core import metrics
+from core.models import Job
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+
+JOB_DURATION = metrics.registry.register(metrics.Histogram(
+    'job_duration_seconds',
+    'Run time of background jobs by task and outcome.',
+    ('task', 'status'),
+))
+
+
+def task(name, max_attempts=None):
+    """Register the decorated function as the job `name`"""
+    def register(func):
+        func.job_name = name
+        func.max_attempts = max_attempts or settings.JOB_MAX_ATTEMPTS
+        _tasks[name] = func
+        return func
+    return register
+
+
+def enqueue(name, delay=0, **kwargs):
+    """Queue the job `name`, it is called with the JSON-able kwargs
+
+    The job row is part of the current transaction, so a job queued along
+    with a change only runs if the change is committed.
+    """
+    func = _tasks[name]
+    return Job.objects.create(
+        task=name,
+        payload=json.dumps(kwargs),
+        max_attempts=func.max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def _ready(now):
+    """Jobs due now, and running jobs whose worker seems to be gone"""
+    stale = now - timedelta(seconds=settings.JOB_TIMEOUT)
+    return Q(status=Job.QUEUED, run_at__lte=now) | \
+        Q(status=Job.RUNNING, locked_at__lt=stale)
+
+
+def claim(worker, limit=1):
+    """Lock up to `limit` due jobs for `worker` and return them"""
+    now = timezone.now()
+    claimed = {
+        'status': Job.RUNNING,
+        'locked_by': worker,
+        'locked_at': now,
+        'attempts': F('attempts') + 1,
+    }
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(
+                Job.objects.select_for_update(skip_locked=True)
+                .filter(_ready(now)).order_by('run_at')
+                .values_list('id', flat=True)[:limit]
+            )
+            Job.objects.filter(id__in=ids).update(**claimed)
+    else:
+        # no row locks (sqlite): take each candidate with a conditional
+        # UPDATE and skip the ones another worker changed first
+        ids = []
+        candidates = Job.objects.filter(_ready(now)).order_by('run_at') \
+            .values_list('id', 'status', 'locked_at')[:limit]
+        for job_id, status, locked_at in candidates:
+            if Job.objects.filter(
+                    id=job_id, status=status, locked_at=locked_at
+            ).update(**claimed):
+                ids.append(job_id)
+
+    return list(Job.objects.filter(id__in=ids).order_by('run_at'))
+
+
+def _owned(job):
+    """The job's row, as long as no other worker reclaimed it meanwhile
+
+    A job running past JOB_TIMEOUT is handed to another worker while the
+    first may still finish it, only the latest claim records an outcome.
+    """
+    return Job.objects.filter(
+        id=job.id, status=Job.RUNNING,
+        locked_by=job.locked_by, attempts=job.attempts,
+    )
+
+
+def run(job):
+    """Run a claimed job and record the outcome"""
+    start = time.perf_counter()
+    try:
+        _tasks[job.task](**json.loads(job.payload))
+    except Exception:
+        outcome = _failed(job, traceback.format_exc())
+    else:
+        outcome = Job.DONE
+        if not _owned(job).update(
+                status=Job.DONE, finished=timezone.now(), last_error=''):
+            outcome = _reclaimed(job)
+    JOB_DURATION.observe(
+        time.perf_counter() - start, task=job.task, status=outcome
+    )
+    return outcome
+
+
+def _failed(job, error):
+    """Retry the job with exponential backoff or give up on it"""
+    logger.warning('Job %s failed (attempt %s)', job, job.attempts)
+    if job.attempts >= job.max_attempts:
+        if not _owned(job).update(
+                status=Job.FAILED, finished=timezone.now(), last_error=error):
+            return _reclaimed(job)
+        return Job.FAILED
+
+    backoff = settings.JOB_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+    if not _owned(job).update(
+            status=Job.QUEUED,
+            run_at=timezone.now() + timedelta(seconds=backoff),
+            last_error=error):
+        return _reclaimed(job)
+    return Job.QUEUED
+
+
+def _reclaimed(job):
+    logger.warning('Job %s was reclaimed by another worker', job)
+    return 'reclaimed'
+
+
+def work(worker, stop, batch=1, poll_interval=1.0, once=False):
+    """Claim and run jobs until `stop` is set, or the queue is empty"""
+    while not stop.is_set():
+        close_old_connections()
+        try:
+            jobs = claim(worker, batch)
+            for job in jobs:
+                run(job)
+            metrics.registry.flush()
+        except Exception:
+            # a database hiccup must not end the worker, unfinished jobs
+            # are reclaimed once JOB_TIMEOUT passes
+            logger.exception('Job worker %s failed, retrying', worker)
+            close_old_connections()
+            stop.wait(poll_interval)
+            continue
+        if not jobs:
+            if once:
+                return
+            stop.wait(poll_interval)
+
+
+def queue_depth():
+    """Queued and running jobs by task, for the metrics endpoint"""
+    counts = Job.objects.filter(status__in=(Job.QUEUED, Job.RUNNING)) \
+        .values('task', 'status').annotate(count=Count('id')) \
+        .values_list('task', 'status', 'count')
+    return {(name, status): count for name, status, count in counts}
+
+
+metrics.registry.register(metrics.CallbackGauge(
+    'job_queue_depth',
+    'Background jobs waiting or running by task.',
+    ('task', 'status'),
+    callback=queue_depth,
+))
@@ -0,0 +1,130 @@
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import m2m_changed, post_delete, pre_delete
+from django.dispatch import receiver
+
+from core import sharding
+from core.models import Ingredient, Recipe, Tag
+
+# Link table -> (column holding the linked id, copy of the ids on Recipe)
+LINKS = {
+    Recipe.tags.through: ('tag_id', 'tag_ids'),
+    Recipe.ingredients.through: ('ingredient_id', 'ingredient_ids'),
+}
+
+
+def linked(through, recipe_ids, using=DEFAULT_DB_ALIAS):
+    """Return {recipe id: sorted linked ids} read from a link table"""
+    column, _ = LINKS[through]
+    ids = {recipe_id: [] for recipe_id in recipe_ids}
+    rows = through.objects.using(using).filter(
+        recipe_id__in=list(ids)
+    ).order_by(column).values_list('recipe_id', column)
+    for recipe_id, value in rows:
+        ids[recipe_id].append(value)
+
+    return ids
+
+
+def refresh(through, recipe_ids, using=DEFAULT_DB_ALIAS):
+    """Copy the links of the given recipes onto their rows, return them
+
+    The recipes are locked before their links are read, so of two
+    transactions changing the links of a recipe the later one copies
+    the links of both.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return {}
+    _, field = LINKS[through]
+    recipes = Recipe.all_objects.using(using)
+    with transaction.atomic(using=using, savepoint=False):
+        list(recipes.select_for_update().filter(
+            pk__in=recipe_ids
+        ).values_list('pk', flat=True))
+        ids = linked(through, recipe_ids, using)
+        for recipe_id, values in ids.items():
+            recipes.filter(pk=recipe_id).update(**{field: values})
+
+    return ids
+
+
+def check(batch_size=1000, repair=False):
+    """Compare every recipe's id copies with the link tables
+
+    Recipes are streamed batch_size at a time from every database. With
+    repair the copies that differ are rewritten. Returns (recipes
+    checked, recipes out of sync).
+    """
+    checked, stale = 0, 0
+    for alias in sharding.aliases():
+        recipes = Recipe.all_objects.using(alias).order_by('pk')
+        last = 0
+        while True:
+            batch = list(
+                recipes.filter(pk__gt=last).values_list(
+                    'pk', 'tag_ids', 'ingredient_ids'
+                )[:batch_size]
+            )
+            if not batch:
+                break
+            recipe_ids = [recipe_id for recipe_id, _, _ in batch]
+            differing = set()
+            for index, through in enumerate(LINKS, 1):
+                ids = linked(through, recipe_ids, alias)
+                wrong = [row[0] for row in batch if row[index] != ids[row[0]]]
+                if repair:
+                    refresh(through, wrong, alias)
+                differing.update(wrong)
+            checked += len(batch)
+            stale += len(differing)
+            last = recipe_ids[-1]
+
+    return checked, stale
+
+
+@receiver(m2m_changed)
+def copy_links(sender, instance, action, reverse, pk_set, using, **kwargs):
+    """Update the copies of recipes whose tags or ingredients changed"""
+    if sender not in LINKS:
+        return
+    if action == 'pre_clear' and reverse:
+        column, _ = LINKS[sender]
+        instance._copied_recipes = list(sender.objects.using(using).filter(
+            **{column: instance.pk}
+        ).values_list('recipe_id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if action != 'post_clear' and not pk_set:
+        return
+
+    if not reverse:
+        ids = refresh(sender, [instance.pk], using)
+        setattr(instance, LINKS[sender][1], ids[instance.pk])
+    elif action == 'post_clear':
+        refresh(sender, instance.__dict__.pop('_copied_recipes', []), using)
+    else:
+        refresh(sender, pk_set, using)
+
+
+def _through(sender):
+    return Recipe.tags.through if sender is Tag else Recipe.ingredients.through
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_copied_recipes(sender, instance, using, **kwargs):
+    """Note the recipes that lose a tag or ingredient being deleted"""
+    through = _through(sender)
+    instance._copied_recipes = list(through.objects.using(using).filter(
+        **{LINKS[through][0]: instance.pk}
+    ).values_list('recipe_id', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def uncopy_deleted(sender, instance, using, **kwargs):
+    """Drop a deleted tag or ingredient from the copies, links go silently"""
+    refresh(
+        _through(sender), instance.__dict__.pop('_copied_recipes', []), using
+    )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core.tasks import check_linked_ids
+
+
+class Command(BaseCommand):
+    """Verify the tag and ingredient id copies of recipes in batches"""
+    help = 'Compare the tag and ingredient id copies on recipes with the ' \
+        'link tables in batches of recipes, optionally repairing them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--repair', action='store_true',
+            help='rewrite the copies that differ from the link tables'
+        )
+
+    def handle(self, *args, **options):
+        checked, stale = check_linked_ids(
+            batch_size=options['batch_size'], repair=options['repair']
+        )
+        action = 'repaired' if options['repair'] else 'out of sync'
+        self.stdout.write(f'Checked {checked} recipes, {stale} {action}')
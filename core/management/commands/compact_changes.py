@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from core.tasks import compact_changes
+
+
+class Command(BaseCommand):
+    """Drop superseded and old change log entries in batches of users"""
+    help = 'Drop superseded and old change log entries in batches of users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help='keep entries this recent, default SYNC_LOG_DAYS'
+        )
+
+    def handle(self, *args, **options):
+        dropped = compact_changes(
+            batch_size=options['batch_size'], days=options['days']
+        )
+        self.stdout.write(f'Dropped {dropped} change log entries')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core.tasks import purge_tokens
+
+
+class Command(BaseCommand):
+    """Delete expired API tokens in batches"""
+    help = 'Delete expired API tokens in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = purge_tokens(batch_size=options['batch_size'])
+        self.stdout.write(f'Deleted {deleted} expired tokens')
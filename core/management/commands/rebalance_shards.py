@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from core import sharding
+
+
+class Command(BaseCommand):
+    """Move users whose data is not where the hash ring places it"""
+    help = 'Move the recipe data of users the hash ring places on another ' \
+        'database, one user at a time in batches of rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--user', type=int, action='append', dest='users',
+            help='only consider this user id, may be repeated'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='only report the users that would move'
+        )
+
+    def handle(self, *args, **options):
+        users, rows = 0, 0
+        for user_id, current, target in sharding.misplaced(
+                options['batch_size']):
+            if options['users'] and user_id not in options['users']:
+                continue
+            users += 1
+            if options['verbosity'] > 1:
+                self.stdout.write(f'User {user_id}: {current} -> {target}')
+            if not options['dry_run']:
+                rows += sharding.move(user_id, target, options['batch_size'])
+
+        if options['dry_run']:
+            self.stdout.write(f'Would move {users} users')
+        else:
+            self.stdout.write(f'Moved {users} users, {rows} rows')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core.tasks import rebuild_facets
+
+
+class Command(BaseCommand):
+    """Recompute the recipe facet counters in batches of users"""
+    help = 'Recompute the recipe facet counters in batches of users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_facets(batch_size=options['batch_size'])
+        self.stdout.write(f'Rebuilt facets of {rebuilt} users')
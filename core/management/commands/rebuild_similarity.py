@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core.tasks import rebuild_similarity
+
+
+class Command(BaseCommand):
+    """Recompute the recipe similarity index in batches of recipes"""
+    help = 'Recompute the recipe similarity index in batches of recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        indexed = rebuild_similarity(batch_size=options['batch_size'])
+        self.stdout.write(f'Indexed {indexed} recipes')
@@ -0,0 +1,77 @@
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    """Run queued background jobs"""
+    help = 'Run queued background jobs with threads or processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument('--mode', choices=('thread', 'process'),
+                            default='thread')
+        parser.add_argument('--batch', type=int, default=1,
+                            help='jobs claimed at a time')
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--once', action='store_true',
+                            help='exit as soon as the queue is empty')
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *args: stop.set())
+
+        name = f'{socket.gethostname()}:{os.getpid()}'
+        work_options = {
+            'batch': options['batch'],
+            'poll_interval': options['poll_interval'],
+            'once': options['once'],
+        }
+        if options['mode'] == 'process':
+            # children must not share the parent's database connections
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            stop = context.Event()
+            workers = [
+                context.Process(
+                    target=jobs.work,
+                    args=(f'{name}:{index}', stop),
+                    kwargs=work_options,
+                )
+                for index in range(options['concurrency'])
+            ]
+        elif options['concurrency'] == 1:
+            jobs.work(f'{name}:0', stop, **work_options)
+            return
+        else:
+            workers = [
+                threading.Thread(
+                    target=self._work_thread,
+                    args=(f'{name}:{index}', stop),
+                    kwargs=work_options,
+                )
+                for index in range(options['concurrency'])
+            ]
+
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            stop.set()
+
+    def _work_thread(self, worker, stop, **options):
+        try:
+            jobs.work(worker, stop, **options)
+        finally:
+            connections.close_all()
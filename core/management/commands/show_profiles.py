@@ -0,0 +1,67 @@
+import io
+import os
+import pstats
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import profiler
+
+
+class Command(BaseCommand):
+    """List stored view profiles or print them merged"""
+    help = 'List stored view profiles, or print them merged as pstats or ' \
+        'flamegraph collapsed stacks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'profile_ids', nargs='*',
+            help='profiles to merge, default the ones matching --view'
+        )
+        parser.add_argument('--view', help='merge profiles of this view')
+        parser.add_argument(
+            '--format', choices=('list', 'pstats', 'collapsed'),
+            default=None,
+            help='default list, or pstats when profiles are selected'
+        )
+        parser.add_argument('--sort', default='cumulative')
+        parser.add_argument('--limit', type=int, default=30)
+
+    def handle(self, *args, **options):
+        stored = profiler.profiles()
+        view = options['view']
+        selected = options['profile_ids'] or [
+            profile_id for profile_id in stored
+            if view and profiler.of_view(profile_id, view)
+        ]
+        output = options['format'] or ('pstats' if selected else 'list')
+        if output == 'list':
+            for profile_id in selected or stored:
+                self.stdout.write(profile_id)
+            return
+        if not selected:
+            self.stderr.write('No matching profiles')
+            return
+
+        paths = [
+            os.path.join(settings.PROFILER_DIR, profile_id)
+            for profile_id in selected
+        ]
+        if output == 'collapsed':
+            stacks = Counter()
+            for path in paths:
+                with open(f'{path}.collapsed') as collapsed:
+                    for line in collapsed:
+                        stack, _, count = line.rstrip('\n').rpartition(' ')
+                        stacks[stack] += int(count)
+            for stack, count in stacks.most_common():
+                self.stdout.write(f'{stack} {count}')
+            return
+
+        buffer = io.StringIO()
+        stats = pstats.Stats(
+            *(f'{path}.pstats' for path in paths), stream=buffer
+        )
+        stats.sort_stats(options['sort']).print_stats(options['limit'])
+        self.stdout.write(buffer.getvalue())
@@ -0,0 +1,311 @@
+import atexit
+import bisect
+import copy
+import glob
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Metric:
+    kind = None
+    registry = None  # set by Registry.register
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.samples = {}
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def empty_copy(self):
+        """Return the same metric without samples"""
+        metric = copy.copy(self)
+        metric.samples = {}
+        return metric
+
+    def merge(self, key, value):
+        """Add the sample of another process"""
+        self.samples[key] = self.samples.get(key, 0) + value
+
+    def lines(self, samples):
+        for key, value in sorted(samples.items()):
+            yield f'{self.name}{_labels(self.labelnames, key)} {value}'
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.registry.check_pid()
+            self.samples[key] = self.samples.get(key, 0) + amount
+
+
+class Gauge(Counter):
+    """Gauge summed over all worker processes"""
+    kind = 'gauge'
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class CallbackGauge(Metric):
+    """Gauge read from `callback` at scrape time, e.g. from the database
+
+    The value is the same for every process, so it is never merged.
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def empty_copy(self):
+        metric = super().empty_copy()
+        metric.samples = dict(self.callback())
+        return metric
+
+    def merge(self, key, value):
+        pass
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _empty(self):
+        # per bucket counts (the last one is +Inf), then sum
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.registry.lock:
+            self.registry.check_pid()
+            sample = self.samples.setdefault(key, self._empty())
+            sample[index] += 1
+            sample[-1] += value
+
+    def merge(self, key, value):
+        sample = self.samples.setdefault(key, self._empty())
+        for index, amount in enumerate(value):
+            sample[index] += amount
+
+    def lines(self, samples):
+        for key, sample in sorted(samples.items()):
+            cumulative = 0
+            bounds = [str(bound) for bound in self.buckets] + ['+Inf']
+            for bound, count in zip(bounds, sample):
+                cumulative += count
+                labels = _labels(
+                    self.labelnames + ('le',), key + (bound,)
+                )
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _labels(self.labelnames, key)
+            yield f'{self.name}_sum{labels} {sample[-1]}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+def _pid_of(path):
+    name = os.path.basename(path)
+    try:
+        return int(name[len('metrics-'):-len('.json')])
+    except ValueError:
+        return None
+
+
+def _alive(pid):
+    """Tell whether a process with this pid is running"""
+    if pid is None:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # running as another user
+    return True
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass  # removed by another scrape
+
+
+def _escape(value):
+    return value.replace('\\', r'\\').replace('"', r'\"') \
+        .replace('\n', r'\n')
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values)
+    )
+    return '{' + pairs + '}'
+
+
+class Registry:
+    """Metrics of this process and their multi-process aggregation
+
+    Every worker keeps its own samples in memory. With settings.METRICS_DIR
+    set, each worker also dumps them to `metrics-<pid>.json` in that
+    directory every METRICS_FLUSH_INTERVAL seconds and a scrape merges the
+    files of all workers, so any worker can answer for the whole server.
+    A worker removes its file when it exits and files of workers that died
+    without doing so are removed by the next scrape, so the samples of
+    exited workers drop out of the totals like a counter reset.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self._pid = os.getpid()
+        self._flushed_at = 0.0
+        self._exit_hook = False
+
+    def register(self, metric):
+        metric.registry = self
+        self.metrics[metric.name] = metric
+        return metric
+
+    def check_pid(self):
+        """Forget samples inherited from the parent after a fork"""
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            for metric in self.metrics.values():
+                metric.samples = {}
+
+    def snapshot(self):
+        """Return the samples of this process in a JSON friendly form"""
+        with self.lock:
+            self.check_pid()
+            return {
+                name: [[list(key), value]
+                       for key, value in metric.samples.items()]
+                for name, metric in self.metrics.items()
+            }
+
+    def _path(self, directory):
+        return os.path.join(directory, f'metrics-{self._pid}.json')
+
+    def flush(self, force=False):
+        """Dump the samples to METRICS_DIR, at most once per interval"""
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if not directory:
+            return
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+        now = time.monotonic()
+        if not force and now - self._flushed_at < interval:
+            return
+        self._flushed_at = now
+        snapshot = self.snapshot()
+        os.makedirs(directory, exist_ok=True)
+        path = self._path(directory)
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as handle:
+            json.dump(snapshot, handle)
+        os.replace(temporary, path)
+        if not self._exit_hook:
+            # forked workers inherit the hook, it removes their own file
+            self._exit_hook = True
+            atexit.register(self.remove, directory)
+
+    def remove(self, directory):
+        """Remove the file of this process from directory"""
+        with self.lock:
+            self.check_pid()
+        _remove(self._path(directory))
+
+    def collect(self):
+        """Return merged samples of all processes keyed by metric name"""
+        snapshots = [self.snapshot()]
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if directory:
+            own = self._path(directory)
+            for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+                if path == own:
+                    continue
+                if not _alive(_pid_of(path)):
+                    _remove(path)
+                    continue
+                try:
+                    with open(path) as handle:
+                        snapshots.append(json.load(handle))
+                except (OSError, ValueError):
+                    continue  # worker replacing its file right now
+
+        merged = {
+            name: metric.empty_copy()
+            for name, metric in self.metrics.items()
+        }
+        for snapshot in snapshots:
+            for name, samples in snapshot.items():
+                if name not in merged:
+                    continue
+                for key, value in samples:
+                    merged[name].merge(tuple(key), value)
+        return merged
+
+    def exposition(self):
+        """Render all metrics in the text exposition format"""
+        lines = []
+        for metric in self.collect().values():
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.lines(metric.samples))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUESTS = registry.register(Counter(
+    'http_requests_total',
+    'HTTP requests by view, method and status.',
+    ('view', 'method', 'status'),
+))
+LATENCY = registry.register(Histogram(
+    'http_request_duration_seconds',
+    'HTTP request latency by view.',
+    ('view', 'method'),
+))
+QUERIES = registry.register(Histogram(
+    'db_queries_per_request',
+    'Database queries issued per request by view.',
+    ('view',),
+    buckets=QUERY_COUNT_BUCKETS,
+))
+QUERY_DURATION = registry.register(Histogram(
+    'db_query_duration_seconds',
+    'Duration of single database queries.',
+    ('alias',),
+))
+CACHE_LOOKUPS = registry.register(Counter(
+    'cache_lookups_total',
+    'Cache lookups by cache and result (hit or miss).',
+    ('cache', 'result'),
+))
+
+
+def cache_lookup(cache, hit):
+    """Count a lookup of `cache`, the hit ratio is derived from these"""
+    CACHE_LOOKUPS.inc(cache=cache, result='hit' if hit else 'miss')
@@ -0,0 +1,154 @@
+import re
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+
+from core import compression, instrumentation, metrics, routers
+
+COMPRESSIBLE_TYPES = re.compile(
+    r'^(text/|application/(json|javascript|xml)|[^;]*\+(json|xml))'
+)
+
+
+class ReplicaRoutingMiddleware:
+    """Route reads of safe requests to replicas, pin clients that write"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        safe = request.method in routers.SAFE_METHODS
+        routers.read_from_replica(safe and not routers.is_pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.read_from_replica(False)
+
+        if not safe:
+            routers.pin(request)
+        return response
+
+
+class QueryInstrumentationMiddleware:
+    """Profile a sample of requests: queries, SQL, serialise and render time
+
+    Keep it last in MIDDLEWARE so the render phase ends right after the
+    response is rendered.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not instrumentation.sampled():
+            return self.get_response(request)
+
+        profile = instrumentation.RequestProfile()
+        with instrumentation.profiling(profile):
+            profile.start('total')
+            response = self.get_response(request)
+            profile.stop('render')
+            profile.stop('total')
+        # total is wall time, including the SQL excluded by stop()
+        profile.timings['total'] += profile.sql_time
+
+        response['Server-Timing'] = profile.server_timing()
+        instrumentation.log_profile(request, response, profile)
+        return response
+
+    def process_template_response(self, request, response):
+        profile = instrumentation.current()
+        if profile is not None:
+            profile.start('render')
+        return response
+
+
+class MetricsMiddleware:
+    """Count requests and record latency and queries per view"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = []
+
+        def count_query(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                elapsed = time.perf_counter() - start
+                alias = context['connection'].alias
+                metrics.QUERY_DURATION.observe(elapsed, alias=alias)
+                queries.append(sql)
+
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count_query))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        metrics.REQUESTS.inc(
+            view=view, method=request.method, status=response.status_code
+        )
+        metrics.LATENCY.observe(elapsed, view=view, method=request.method)
+        metrics.QUERIES.observe(len(queries), view=view)
+        metrics.registry.flush()
+        return response
+
+
+class CompressionMiddleware:
+    """Compress response bodies with the best encoding the client accepts
+
+    Skips streaming, already encoded, image and other incompressible
+    responses, and bodies under COMPRESS_MIN_SIZE bytes. A response may
+    carry `compressed_variants`, a dict of encoded bodies to reuse, and
+    `store_compressed(encoding, body)` to keep a body just compressed,
+    see core.response_cache.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (response.streaming or response.has_header('Content-Encoding')
+                or not COMPRESSIBLE_TYPES.match(
+                    response.get('Content-Type', ''))
+                or len(response.content) < settings.COMPRESS_MIN_SIZE):
+            return response
+
+        # the body depends on the header even when sent uncompressed
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = compression.negotiate(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        if encoding is None:
+            return response
+
+        variants = getattr(response, 'compressed_variants', {})
+        body = variants.get(encoding)
+        if body is None:
+            body = compression.compress(encoding, response.content)
+            store = getattr(response, 'store_compressed', None)
+            if store is not None:
+                store(encoding, body)
+        if len(body) >= len(response.content):
+            return response
+
+        compression.COMPRESSED.inc(encoding=encoding)
+        compression.BYTES_SAVED.inc(
+            len(response.content) - len(body), encoding=encoding
+        )
+        response.content = body
+        response['Content-Length'] = str(len(body))
+        response['Content-Encoding'] = encoding
+        if response.has_header('ETag'):
+            response['ETag'] = re.sub(r'^"', 'W/"', response['ETag'])
+        return response
@@ -0,0 +1,41 @@
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+
+
+def copy_tokens(apps, schema_editor):
+    """Keep existing rest_framework tokens working as AuthTokens"""
+    Token = apps.get_model('authtoken', 'Token')
+    AuthToken = apps.get_model('core', 'AuthToken')
+    expires = timezone.now() + timedelta(seconds=settings.TOKEN_TTL)
+
+    batch = []
+    for key, user_id in Token.objects.values_list('key', 'user_id') \
+            .iterator(chunk_size=BATCH_SIZE):
+        batch.append(AuthToken(
+            user_id=user_id,
+            prefix=key[:8],
+            digest=hashlib.sha256(key.encode()).hexdigest(),
+            expires=expires,
+        ))
+        if len(batch) == BATCH_SIZE:
+            AuthToken.objects.bulk_create(batch)
+            batch = []
+    AuthToken.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authtoken', '0002_auto_20160226_1747'),
+        ('core', '0006_authtoken'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_tokens, migrations.RunPython.noop),
+    ]
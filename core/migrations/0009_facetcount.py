@@ -0,0 +1,28 @@
+# Generated by Django 2.2 on 2026-10-19 17:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(choices=[('recipes', 'Recipes'), ('tag', 'Tag'), ('ingredient', 'Ingredient'), ('price', 'Price bucket'), ('time', 'Time bucket')], max_length=10)),
+                ('value', models.IntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'facet', 'value')},
+            },
+        ),
+    ]
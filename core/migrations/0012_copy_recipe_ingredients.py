@@ -0,0 +1,46 @@
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def _copy(source, target):
+    """Copy (recipe, ingredient) links between link tables in batches"""
+    last = 0
+    while True:
+        rows = list(
+            source.objects.filter(pk__gt=last).order_by('pk').values_list(
+                'pk', 'recipe_id', 'ingredient_id'
+            )[:BATCH_SIZE]
+        )
+        if not rows:
+            return
+        target.objects.bulk_create(
+            target(recipe_id=recipe_id, ingredient_id=ingredient_id)
+            for _, recipe_id, ingredient_id in rows
+        )
+        last = rows[-1][0]
+
+
+def copy_links(apps, schema_editor):
+    """Keep the existing recipe ingredients, without quantities"""
+    Recipe = apps.get_model('core', 'Recipe')
+    RecipeIngredient = apps.get_model('core', 'RecipeIngredient')
+    _copy(Recipe.ingredients.through, RecipeIngredient)
+
+
+def copy_links_back(apps, schema_editor):
+    """Restore the plain recipe ingredient links"""
+    Recipe = apps.get_model('core', 'Recipe')
+    RecipeIngredient = apps.get_model('core', 'RecipeIngredient')
+    _copy(RecipeIngredient, Recipe.ingredients.through)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_recipeingredient'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_links, copy_links_back),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Django cannot add a through model to an existing ManyToManyField,
+    the old link table is dropped once 0012 copied it"""
+
+    dependencies = [
+        ('core', '0012_copy_recipe_ingredients'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='recipe',
+            name='ingredients',
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredients',
+            field=models.ManyToManyField(through='core.RecipeIngredient', to='core.Ingredient'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 2.2 on 2026-10-19 18:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def start_history(apps, schema_editor):
+    """Make existing users resync once, their earlier changes are unlogged"""
+    User = apps.get_model('core', 'User')
+    User.objects.update(change_seq=1, sync_floor=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_soft_delete'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='change_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='sync_floor',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.BigIntegerField()),
+                ('kind', models.CharField(choices=[('recipe', 'Recipe'), ('tag', 'Tag'), ('ingredient', 'Ingredient')], max_length=10)),
+                ('object_id', models.IntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'seq')},
+                'index_together': {('user', 'kind', 'object_id')},
+            },
+        ),
+        migrations.RunPython(start_history, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 2.2 on 2026-10-19 18:44
+
+import core.models
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def copy_links(apps, schema_editor):
+    """Fill the id copies of existing recipes from the link tables"""
+    db_alias = schema_editor.connection.alias
+    Recipe = apps.get_model('core', 'Recipe')
+    links = (
+        (Recipe.tags.through, 'tag_id', 'tag_ids'),
+        (Recipe.ingredients.through, 'ingredient_id', 'ingredient_ids'),
+    )
+    recipes = Recipe.objects.using(db_alias)
+    last = 0
+    while True:
+        recipe_ids = list(
+            recipes.filter(pk__gt=last).order_by('pk').values_list(
+                'pk', flat=True
+            )[:BATCH_SIZE]
+        )
+        if not recipe_ids:
+            return
+        for through, column, field in links:
+            ids = {}
+            rows = through.objects.using(db_alias).filter(
+                recipe_id__in=recipe_ids
+            ).order_by(column).values_list('recipe_id', column)
+            for recipe_id, value in rows:
+                ids.setdefault(recipe_id, []).append(value)
+            for recipe_id, values in ids.items():
+                recipes.filter(pk=recipe_id).update(**{field: values})
+        last = recipe_ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_sharding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_ids',
+            field=core.models.IdListField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='tag_ids',
+            field=core.models.IdListField(blank=True, default=list, editable=False),
+        ),
+        migrations.RunPython(copy_links, migrations.RunPython.noop),
+    ]
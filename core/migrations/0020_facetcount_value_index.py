@@ -0,0 +1,17 @@
+# Generated by Django 2.2 on 2026-10-19 18:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_recipe_linked_ids'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='facetcount',
+            index=models.Index(fields=['facet', 'value'], name='core_facet_value_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from importlib import import_module
+
+from django.db import DEFAULT_DB_ALIAS, migrations
+
+linked_ids = import_module('core.migrations.0019_recipe_linked_ids')
+
+
+def copy_links(apps, schema_editor):
+    """Fill the id copies of recipes on shards, 0019 only filled default"""
+    if schema_editor.connection.alias != DEFAULT_DB_ALIAS:
+        linked_ids.copy_links(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_facetcount_value_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            copy_links, migrations.RunPython.noop, hints={'shards': True}
+        ),
+    ]
@@ -1,5 +1,9 @@
+import binascii
+import hashlib
 import uuid
 import os
+from datetime import timedelta
+
 from django.db import models
 from django.contrib.auth.models import (AbstractBaseUser,
                                         BaseUserManager,
@@ -7,6 +11,8 @@ from django.contrib.auth.models import (AbstractBaseUser,
                                         )
 
 from django.conf import settings
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
 
 
 def recipe_image_file_path(instance, filename):
@@ -46,6 +52,12 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # set when the account is closed, core.deletion purges it later
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    # last sequence number of the user's change log, and the one below
+    # which compaction dropped history, see core.changes
+    change_seq = models.BigIntegerField(default=0)
+    sync_floor = models.BigIntegerField(default=0)
 
     objects = UserManager()
 
@@ -60,6 +72,14 @@ class Tag(models.Model):
         on_delete=models.CASCADE,
     )
 
+    class Meta:
+        # prefix lookups of the admin search, see core.admin
+        indexes = [models.Index(
+            fields=['name'],
+            name='core_tag_name_prefix_idx',
+            opclasses=['varchar_pattern_ops'],
+        )]
+
     def __str__(self):
         return self.name
 
@@ -72,10 +92,45 @@ class Ingredient(models.Model):
         on_delete=models.CASCADE,
     )
 
+    class Meta:
+        # prefix lookups of the admin search, see core.admin
+        indexes = [models.Index(
+            fields=['name'],
+            name='core_ingr_name_prefix_idx',
+            opclasses=['varchar_pattern_ops'],
+        )]
+
     def __str__(self):
         return self.name
 
 
+class IdListField(models.TextField):
+    """List of ids stored as comma separated text, on any database"""
+
+    def from_db_value(self, value, expression, connection):
+        return self.to_python(value)
+
+    def to_python(self, value):
+        if isinstance(value, list):
+            return value
+        if not value:
+            return []
+        return [int(item) for item in value.split(',')]
+
+    def get_prep_value(self, value):
+        return ','.join(str(item) for item in self.to_python(value))
+
+    def value_to_string(self, obj):
+        return self.get_prep_value(self.value_from_object(obj))
+
+
+class LiveRecipeManager(models.Manager):
+    """Recipes that were not deleted"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Recipe(models.Model):
     """Create recipe objects"""
     user = models.ForeignKey(
@@ -86,9 +141,298 @@ class Recipe(models.Model):
     time_minutes = models.IntegerField()
     price = models.DecimalField(max_digits=5, decimal_places=2)
     link = models.CharField(max_length=255, blank=True)
-    ingredients = models.ManyToManyField('Ingredient')
+    ingredients = models.ManyToManyField(
+        'Ingredient',
+        through='RecipeIngredient'
+    )
     tags = models.ManyToManyField('Tag')
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    is_public = models.BooleanField(default=False, db_index=True)
+    # set when the recipe is deleted, core.deletion purges it later
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    # sorted copies of the linked ids, so lists need no link table reads,
+    # kept by core.linked_ids
+    tag_ids = IdListField(default=list, blank=True, editable=False)
+    ingredient_ids = IdListField(default=list, blank=True, editable=False)
+
+    objects = LiveRecipeManager()
+    all_objects = models.Manager()
+
+    LINKED_ID_FIELDS = ('tag_ids', 'ingredient_ids')
+
+    class Meta:
+        indexes = [models.Index(
+            fields=['title'],
+            name='core_recipe_title_prefix_idx',
+            opclasses=['varchar_pattern_ops'],
+        )]
 
     def __str__(self):
         return self.title
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        """Save the recipe, leaving the id copies of a stored one alone
+
+        The copies loaded with the recipe may be outdated by a concurrent
+        link change, only core.linked_ids writes them unless they are
+        named in update_fields.
+        """
+        if update_fields is None and not force_insert and \
+                not self._state.adding and self.pk is not None:
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in deferred
+                and field.name not in self.LINKED_ID_FIELDS
+            ]
+        super().save(
+            force_insert=force_insert, force_update=force_update,
+            using=using, update_fields=update_fields,
+        )
+
+
+class RecipeIngredient(models.Model):
+    """Ingredient of a recipe with the quantity it needs"""
+    UNIT_CHOICES = (
+        ('g', 'Grams'),
+        ('kg', 'Kilograms'),
+        ('ml', 'Millilitres'),
+        ('l', 'Litres'),
+        ('tsp', 'Teaspoons'),
+        ('tbsp', 'Tablespoons'),
+        ('cup', 'Cups'),
+        ('piece', 'Pieces'),
+    )
+
+    recipe = models.ForeignKey('Recipe', on_delete=models.CASCADE)
+    ingredient = models.ForeignKey('Ingredient', on_delete=models.CASCADE)
+    quantity = models.DecimalField(
+        max_digits=9,
+        decimal_places=3,
+        null=True,
+        blank=True
+    )
+    unit = models.CharField(max_length=5, choices=UNIT_CHOICES, blank=True)
+
+    class Meta:
+        unique_together = ('recipe', 'ingredient')
+
+    def __str__(self):
+        return f'{self.quantity} {self.unit} {self.ingredient_id}'
+
+
+def token_digest(key):
+    """Return the stored digest of a token key"""
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class AuthTokenManager(models.Manager):
+
+    def issue(self, user):
+        """Create a token for the user, return it with its plain key"""
+        key = binascii.hexlify(os.urandom(20)).decode()
+        token = self.create(
+            user=user,
+            prefix=key[:AuthToken.PREFIX_LENGTH],
+            digest=token_digest(key),
+            expires=timezone.now() + timedelta(seconds=settings.TOKEN_TTL),
+        )
+
+        return token, key
+
+
+class AuthToken(models.Model):
+    """Expiring API token, only a digest of the key is stored"""
+    PREFIX_LENGTH = 8
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='auth_tokens',
+    )
+    prefix = models.CharField(max_length=PREFIX_LENGTH, db_index=True)
+    digest = models.CharField(max_length=64)
+    created = models.DateTimeField(auto_now_add=True)
+    expires = models.DateTimeField(db_index=True)
+
+    objects = AuthTokenManager()
+
+    def __str__(self):
+        return self.prefix
+
+    def matches(self, key):
+        """Check the plain key belongs to this token"""
+        return constant_time_compare(self.digest, token_digest(key))
+
+    def is_expired(self):
+        return self.expires <= timezone.now()
+
+    def needs_refresh(self):
+        """Check the token is close enough to expiry to be rotated"""
+        refresh_at = self.expires - timedelta(
+            seconds=settings.TOKEN_REFRESH_WINDOW
+        )
+        return refresh_at <= timezone.now()
+
+
+class Job(models.Model):
+    """Deferred unit of work run by `manage.py run_worker`, see core.jobs"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    task = models.CharField(max_length=100)
+    payload = models.TextField(default='{}')
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=QUEUED
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.task} #{self.pk}'
+
+
+class FacetCount(models.Model):
+    """Number of a user's recipes per tag, ingredient, price and time
+
+    Maintained incrementally by core.facets, `manage.py rebuild_facets`
+    recomputes it from scratch.
+    """
+    RECIPES = 'recipes'
+    TAG = 'tag'
+    INGREDIENT = 'ingredient'
+    PRICE = 'price'
+    TIME = 'time'
+    FACET_CHOICES = (
+        (RECIPES, 'Recipes'),
+        (TAG, 'Tag'),
+        (INGREDIENT, 'Ingredient'),
+        (PRICE, 'Price bucket'),
+        (TIME, 'Time bucket'),
+    )
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+    facet = models.CharField(max_length=10, choices=FACET_CHOICES)
+    # tag or ingredient id, or the lower bound of a price or time bucket
+    value = models.IntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'facet', 'value')
+        indexes = [
+            # counters of a deleted tag or ingredient, over all users
+            models.Index(
+                fields=['facet', 'value'], name='core_facet_value_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.facet}={self.value}: {self.count}'
+
+
+class RecipeBand(models.Model):
+    """One MinHash-LSH band bucket of a recipe's tags and ingredients
+
+    Recipes sharing a bucket are candidates for core.similarity.
+    """
+    recipe = models.ForeignKey(
+        'Recipe',
+        on_delete=models.CASCADE,
+        related_name='bands',
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        index_together = ('user', 'bucket')
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.bucket}'
+
+
+class Change(models.Model):
+    """Entry of a user's change log, read by the sync endpoint
+
+    Written by core.changes in the transaction of the change itself,
+    `manage.py compact_changes` drops superseded and old entries.
+    """
+    RECIPE = 'recipe'
+    TAG = 'tag'
+    INGREDIENT = 'ingredient'
+    KIND_CHOICES = (
+        (RECIPE, 'Recipe'),
+        (TAG, 'Tag'),
+        (INGREDIENT, 'Ingredient'),
+    )
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+    # per user, increasing in commit order
+    seq = models.BigIntegerField()
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.IntegerField()
+    deleted = models.BooleanField(default=False)
+    created = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('user', 'seq')
+        index_together = ('user', 'kind', 'object_id')
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id} #{self.seq}'
+
+
+class ShardAssignment(models.Model):
+    """Directory entry naming the database of a user's recipe data
+
+    Kept in the default database by core.sharding, users without an
+    entry have their data in the default database.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+    )
+    shard = models.CharField(max_length=100)
+    # writes are refused while `manage.py rebalance_shards` copies the data
+    moving = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f'{self.user_id} on {self.shard}'
+
+
+class ShardSequence(models.Model):
+    """Next free id of a sharded model, reserved in blocks by processes"""
+    name = models.CharField(max_length=100, primary_key=True)
+    value = models.BigIntegerField()
+
+    def __str__(self):
+        return f'{self.name} {self.value}'
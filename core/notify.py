@@ -0,0 +1,145 @@
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+
+class LocalNotifier:
+    """Wake threads of this process waiting on a user's changes"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.waiters = {}
+
+    def subscribe(self, user_id):
+        """Return a subscription to pass to wait() and unsubscribe()"""
+        event = threading.Event()
+        with self.lock:
+            self.waiters.setdefault(user_id, set()).add(event)
+        return user_id, event
+
+    def unsubscribe(self, subscription):
+        user_id, event = subscription
+        with self.lock:
+            events = self.waiters.get(user_id)
+            if events is not None:
+                events.discard(event)
+                if not events:
+                    del self.waiters[user_id]
+
+    def wait(self, subscription, timeout):
+        """Block until the user changes something, False on timeout"""
+        return subscription[1].wait(timeout)
+
+    def publish(self, user_id):
+        with self.lock:
+            events = list(self.waiters.get(user_id, ()))
+        for event in events:
+            event.set()
+
+
+class FileNotifier(LocalNotifier):
+    """Wake waiters of every process sharing a directory
+
+    A change replaces the user's file in the directory, waiters of other
+    processes notice the new file within poll_interval seconds. Waiters
+    of the publishing process wake at once.
+    """
+
+    def __init__(self, directory=None, poll_interval=0.5):
+        super().__init__()
+        self.directory = directory
+        self.poll_interval = poll_interval
+
+    def _path(self, user_id):
+        directory = self.directory or settings.NOTIFY_DIR
+        return os.path.join(directory, f'user-{user_id}')
+
+    def _stamp(self, user_id):
+        try:
+            stat = os.stat(self._path(user_id))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def subscribe(self, user_id):
+        return super().subscribe(user_id) + (self._stamp(user_id),)
+
+    def wait(self, subscription, timeout):
+        user_id, event, stamp = subscription
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if event.wait(min(self.poll_interval, remaining)):
+                return True
+            if self._stamp(user_id) != stamp:
+                return True
+
+    def unsubscribe(self, subscription):
+        super().unsubscribe(subscription[:2])
+
+    def publish(self, user_id):
+        super().publish(user_id)
+        path = self._path(user_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # a new file, so a new inode, even within one mtime tick
+        handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+        os.close(handle)
+        os.replace(temporary, path)
+
+
+BACKENDS = {
+    'local': LocalNotifier(),
+    'file': FileNotifier(),
+}
+
+
+def notifier():
+    """Return the backend chosen by settings.NOTIFY_BACKEND"""
+    return BACKENDS[settings.NOTIFY_BACKEND]
+
+
+def publish(user_id):
+    """Wake the waiters of a user"""
+    notifier().publish(user_id)
+
+
+_waiting = 0
+_waiting_lock = threading.Lock()
+
+
+@contextmanager
+def waiting_slot():
+    """Take one of the NOTIFY_MAX_WAITERS waiting slots of this process
+
+    Yields False when all are taken, the caller then answers at once
+    instead of waiting, so idle waiters never hold every request thread.
+    """
+    global _waiting
+    with _waiting_lock:
+        free = _waiting < settings.NOTIFY_MAX_WAITERS
+        if free:
+            _waiting += 1
+    try:
+        yield free
+    finally:
+        if free:
+            with _waiting_lock:
+                _waiting -= 1
+
+
+def release_connections():
+    """Close this thread's database connections before a long wait
+
+    They are reopened, or taken from the pool, by the next query.
+    Connections inside a transaction are left alone.
+    """
+    for connection in connections.all():
+        if not connection.in_atomic_block:
+            connection.close()
@@ -0,0 +1,51 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def estimated_rows(model, using='default'):
+    """Return the planner's estimate of a table's rows, None if unknown"""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s', [table]
+            )
+        elif connection.vendor == 'sqlite':
+            # rowids only grow, the highest is close to the row count
+            cursor.execute(
+                f'SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}'
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None else None
+
+
+def _where(queryset):
+    """Return the SQL and params of a queryset's WHERE clause"""
+    query = queryset.query
+    if not query.where:
+        return '', []
+    return query.get_compiler(queryset.db).compile(query.where)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that never scans a whole large table to count it
+
+    Lists of tables larger than max_count that are not filtered beyond
+    the default manager use the planner's estimate, filtered ones count
+    at most max_count rows.
+    """
+    max_count = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        default = queryset.model._default_manager.all()
+        if _where(queryset) == _where(default):
+            estimate = estimated_rows(queryset.model, queryset.db)
+            if estimate is not None and estimate > self.max_count:
+                return estimate
+        return queryset.order_by()[:self.max_count].count()
@@ -0,0 +1,46 @@
+from collections import defaultdict
+
+from django.db.models import Count, F, Q
+
+from core.models import Recipe
+
+
+def matches(user, pantry, max_missing=0, limit=20):
+    """Return [(recipe id, missing count)] of the user's recipes the pantry
+    covers best, fewest missing ingredients first
+
+    Only recipes linked to a pantry ingredient are grouped, so the cost
+    follows the pantry's links rather than the size of the collection.
+    """
+    through = Recipe.ingredients.through
+    pantry = list(set(pantry))
+    candidates = through.objects.filter(
+        ingredient_id__in=pantry, recipe__user=user,
+        recipe__deleted_at__isnull=True
+    ).values('recipe_id')
+    rows = through.objects.filter(recipe_id__in=candidates).values(
+        'recipe_id'
+    ).annotate(
+        total=Count('id'),
+        matched=Count('id', filter=Q(ingredient_id__in=pantry)),
+    ).annotate(
+        missing=F('total') - F('matched')
+    ).filter(missing__lte=max_missing).order_by(
+        'missing', '-matched', 'recipe_id'
+    )[:limit]
+
+    return [(row['recipe_id'], row['missing']) for row in rows]
+
+
+def missing_ingredients(recipe_ids, pantry):
+    """Return {recipe id: [ingredient ids not in the pantry]}"""
+    missing = defaultdict(list)
+    rows = Recipe.ingredients.through.objects.filter(
+        recipe_id__in=list(recipe_ids)
+    ).exclude(ingredient_id__in=list(pantry)).order_by(
+        'ingredient_id'
+    ).values_list('recipe_id', 'ingredient_id')
+    for recipe_id, ingredient_id in rows:
+        missing[recipe_id].append(ingredient_id)
+
+    return missing
@@ -0,0 +1,204 @@
+import cProfile
+import itertools
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'HTTP_X_PROFILE'
+# profiling every request of the process, toggled by PROFILER_SIGNAL
+_process = {'enabled': False}
+# numbers the profiles a process takes within the same second
+_sequence = itertools.count()
+# the profile running in this thread, cProfile only reports a second
+# active profiler itself from Python 3.12
+_active = threading.local()
+
+
+def _frame_name(code):
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:' \
+        f'{code.co_firstlineno})'
+
+
+def collapse(frame):
+    """Return the stack of a frame as a flamegraph collapsed stack"""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler(threading.Thread):
+    """Sample the stacks of registered threads every interval seconds
+
+    Started by the first profiled request, it sleeps while no thread is
+    registered.
+    """
+
+    def __init__(self, interval):
+        super().__init__(name='profiler-sampler', daemon=True)
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.targets = {}
+        self.wake = threading.Event()
+
+    def register(self, ident):
+        """Start sampling a thread, return its stack counter"""
+        stacks = Counter()
+        with self.lock:
+            self.targets[ident] = stacks
+        self.wake.set()
+        return stacks
+
+    def unregister(self, ident):
+        with self.lock:
+            self.targets.pop(ident, None)
+
+    def run(self):
+        while True:
+            with self.lock:
+                targets = dict(self.targets)
+            if not targets:
+                self.wake.wait()
+                self.wake.clear()
+                continue
+            frames = sys._current_frames()
+            for ident, stacks in targets.items():
+                frame = frames.get(ident)
+                if frame is not None:
+                    stacks[collapse(frame)] += 1
+            time.sleep(self.interval)
+
+
+_sampler = {}
+_sampler_lock = threading.Lock()
+
+
+def sampler():
+    """Return the process' sampler, starting it on first use"""
+    with _sampler_lock:
+        if 'thread' not in _sampler:
+            _sampler['thread'] = Sampler(settings.PROFILER_INTERVAL)
+            _sampler['thread'].start()
+    return _sampler['thread']
+
+
+class ViewProfile:
+    """cProfile and stack samples of one request's view"""
+
+    def __init__(self, name):
+        self.name = name
+        self.profile = cProfile.Profile()
+        self.ident = threading.get_ident()
+        self.stacks = None
+
+    def start(self):
+        """Start profiling, False if another profiler is active"""
+        if getattr(_active, 'profile', None) is not None:
+            return False
+        try:
+            self.profile.enable()
+        except ValueError:
+            return False
+        _active.profile = self
+        self.stacks = sampler().register(self.ident)
+        return True
+
+    def stop(self):
+        self.profile.disable()
+        _active.profile = None
+        sampler().unregister(self.ident)
+
+    def save(self):
+        """Write the .pstats and .collapsed files, return the profile id"""
+        directory = settings.PROFILER_DIR
+        os.makedirs(directory, exist_ok=True)
+        profile_id = '{}-{}-{:06d}-{}'.format(
+            time.strftime('%Y%m%d%H%M%S'), os.getpid(),
+            next(_sequence) % 10 ** 6, self.name
+        )
+        path = os.path.join(directory, profile_id)
+        self.profile.dump_stats(f'{path}.pstats')
+        with open(f'{path}.collapsed', 'w') as collapsed:
+            for stack, count in self.stacks.most_common():
+                collapsed.write(f'{stack} {count}\n')
+        rotate(directory, settings.PROFILER_KEEP)
+        return profile_id
+
+
+def requested(request):
+    """Check if a request asked for, or falls under, profiling"""
+    if _process['enabled']:
+        return True
+    if not request.META.get(HEADER):
+        return False
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_staff
+
+
+def start(request, view):
+    """Start profiling a view if requested, return the profile or None"""
+    if not requested(request):
+        return None
+    name = f'{type(view).__name__}.{getattr(view, "action", None) or ""}'
+    profile = ViewProfile(name.strip('.'))
+    return profile if profile.start() else None
+
+
+def finish(profile, response):
+    """Stop and save a profile, naming it in the X-Profile-Id header"""
+    profile.stop()
+    response['X-Profile-Id'] = profile.save()
+
+
+def profiles(directory=None):
+    """Return the ids of the stored profiles, oldest first"""
+    directory = directory or settings.PROFILER_DIR
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return sorted(
+        name[:-len('.pstats')] for name in names if name.endswith('.pstats')
+    )
+
+
+def of_view(profile_id, view):
+    """Check if a profile is of a view class, or of one of its actions"""
+    name = profile_id.split('-', 3)[3]
+    return name == view or name.startswith(f'{view}.')
+
+
+def rotate(directory, keep):
+    """Delete all but the newest keep profiles"""
+    for profile_id in profiles(directory)[:-keep or None]:
+        for suffix in ('.pstats', '.collapsed'):
+            try:
+                os.remove(os.path.join(directory, profile_id + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def toggle(signum=None, frame=None):
+    """Switch profiling of every request of this process on or off"""
+    _process['enabled'] = not _process['enabled']
+    logger.warning(
+        'Profiling of process %s %s', os.getpid(),
+        'enabled' if _process['enabled'] else 'disabled'
+    )
+
+
+def install_signal():
+    """Toggle process profiling on settings.PROFILER_SIGNAL"""
+    name = settings.PROFILER_SIGNAL
+    if not name or threading.current_thread() is not threading.main_thread():
+        return
+    signal.signal(getattr(signal, name), toggle)
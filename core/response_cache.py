@@ -0,0 +1,182 @@
+import hashlib
+import uuid
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_save
+)
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from core import metrics
+from core.models import Ingredient, Recipe, Tag
+
+PUBLIC_RECIPES = 'public-recipes'
+# changed by every purge, before the versions of the purged keys
+GENERATION = 'surrogate:generation'
+# headers kept with a cached response
+HEADERS = ('Cache-Control', 'Surrogate-Key', 'Vary', 'Allow')
+
+
+def recipe_key(recipe_id):
+    """Return the surrogate key of a recipe"""
+    return f'recipe-{recipe_id}'
+
+
+def _cache():
+    return caches['responses']
+
+
+def _version_key(key):
+    return f'surrogate:{key}'
+
+
+def purge(*keys):
+    """Invalidate every cached response tagged with one of the keys"""
+    if keys:
+        _cache().set(GENERATION, uuid.uuid4().hex, None)
+        _cache().set_many(
+            {_version_key(key): uuid.uuid4().hex for key in keys}, None
+        )
+
+
+def _versions(keys):
+    """Return {key: current version or None}"""
+    found = _cache().get_many([_version_key(key) for key in keys])
+    return {key: found.get(_version_key(key)) for key in keys}
+
+
+def _store_compressed(cache_key, entry, encoding, body):
+    """Keep a compressed variant with a cached response"""
+    entry['compressed'] = dict(entry.get('compressed', {}), **{
+        encoding: body
+    })
+    _cache().set(cache_key, entry)
+
+
+def _attach_variants(response, cache_key, entry):
+    """Let core.middleware.CompressionMiddleware reuse and keep variants"""
+    response.compressed_variants = entry.get('compressed', {})
+    response.store_compressed = partial(_store_compressed, cache_key, entry)
+
+
+def _response_key(request):
+    raw = f"{request.get_full_path()}|{request.META.get('HTTP_ACCEPT', '')}"
+    return 'response:' + hashlib.sha1(raw.encode()).hexdigest()
+
+
+class SharedCacheMixin:
+    """Serve GET responses of an anonymous view from the shared cache
+
+    Each response is stored with the versions of the surrogate keys
+    returned by surrogate_keys() and is stale once one of them is purged.
+    The keys are only known once the data is rendered, so a response is
+    not stored when anything was purged while it was being rendered, it
+    could show data older than the versions read afterwards. Its
+    compressed variants are stored with it as they are made.
+    """
+
+    def surrogate_keys(self, data):
+        """Return the surrogate keys of a response's data"""
+        return []
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+
+        cache_key = _response_key(request)
+        cached = _cache().get(cache_key)
+        hit = cached is not None and (
+            _versions(cached['versions']) == cached['versions']
+        )
+        metrics.cache_lookup('public_response', hit)
+        if hit:
+            response = HttpResponse(
+                cached['content'],
+                status=cached['status'],
+                content_type=cached['content_type'],
+            )
+            for header, value in cached['headers']:
+                response[header] = value
+            _attach_variants(response, cache_key, cached)
+            return response
+
+        generation = _cache().get(GENERATION)
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        keys = self.surrogate_keys(response.data)
+        patch_cache_control(
+            response, public=True, max_age=settings.PUBLIC_CACHE_MAX_AGE
+        )
+        patch_vary_headers(response, ('Accept',))
+        response['Surrogate-Key'] = ' '.join(keys)
+        response.render()
+        entry = {
+            'versions': _versions(keys),
+            'content': response.content,
+            'status': response.status_code,
+            'content_type': response['Content-Type'],
+            'headers': [
+                (header, response[header])
+                for header in HEADERS if response.has_header(header)
+            ],
+        }
+        if _cache().get(GENERATION) != generation:
+            return response
+        _cache().set(cache_key, entry)
+        _attach_variants(response, cache_key, entry)
+        return response
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_public(sender, instance, using, update_fields, **kwargs):
+    """Read whether a recipe about to be changed is stored as public
+
+    Only saves of existing recipes that may change is_public pay for the
+    query, loading recipes costs nothing.
+    """
+    if instance._state.adding:
+        return
+    if update_fields is not None and 'is_public' not in update_fields:
+        return
+    instance._was_public = Recipe.all_objects.using(using).filter(
+        pk=instance.pk, is_public=True
+    ).exists()
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def purge_recipe(sender, instance, **kwargs):
+    """Purge a changed recipe, and the public list if it is or was on it"""
+    keys = [recipe_key(instance.pk)]
+    was_public = instance.__dict__.pop('_was_public', False)
+    if instance.is_public or was_public:
+        keys.append(PUBLIC_RECIPES)
+    purge(*keys)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def purge_attribute(sender, instance, **kwargs):
+    """Purge responses showing a changed tag or ingredient"""
+    purge(f'{sender._meta.model_name}-{instance.pk}')
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def purge_links(sender, instance, action, reverse, pk_set, **kwargs):
+    """Purge recipes whose tags or ingredients changed"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        purge(recipe_key(instance.pk))
+    elif action == 'post_clear':
+        purge(f'{instance._meta.model_name}-{instance.pk}')
+    else:
+        purge(*(recipe_key(recipe_id) for recipe_id in pk_set))
@@ -0,0 +1,90 @@
+import hashlib
+import random
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core import metrics, sharding
+
+_state = threading.local()
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def read_from_replica(enabled):
+    """Allow or forbid replica reads for the current thread"""
+    _state.read_from_replica = enabled
+
+
+def _pin_key(request):
+    """Return the cache key pinning this client, None if anonymous"""
+    credential = request.META.get('HTTP_AUTHORIZATION') or \
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credential:
+        return None
+    digest = hashlib.sha1(credential.encode()).hexdigest()
+    return f'replica-pin:{digest}'
+
+
+def is_pinned(request):
+    """Check if the client wrote recently and must read the primary"""
+    key = _pin_key(request)
+    if key is None:
+        return False
+    pinned = caches['replica_pins'].get(key) is not None
+    metrics.cache_lookup('replica_pin', pinned)
+    return pinned
+
+
+def pin(request):
+    """Pin the client to the primary for REPLICA_PIN_SECONDS"""
+    key = _pin_key(request)
+    if key is not None:
+        caches['replica_pins'].set(key, True, settings.REPLICA_PIN_SECONDS)
+
+
+class ShardRouter:
+    """Send recipe data to the database of the user it belongs to"""
+
+    def db_for_read(self, model, **hints):
+        if model not in sharding.SHARDED or not sharding.enabled():
+            return None
+        return sharding.db_for(hints.get('instance'))
+
+    db_for_write = db_for_read
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Run data migrations on shards only when they ask for it
+
+        Shards get every table, but the RunPython steps written before
+        sharding read and write through the default managers, which lead
+        to the default database. A data migration meant for the rows of a
+        shard passes hints={'shards': True} and uses the schema editor's
+        alias.
+        """
+        if model_name is None and db != DEFAULT_DB_ALIAS and \
+                not hints.get('shards'):
+            return False
+        return None
+
+
+class PrimaryReplicaRouter:
+    """Send reads to a replica when the current request allows it"""
+
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if not replicas or not getattr(_state, 'read_from_replica', False):
+            return DEFAULT_DB_ALIAS
+        # reads inside a transaction must see its uncommitted writes
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Replicas hold the same data, so any relation is fine"""
+        return True
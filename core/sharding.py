@@ -0,0 +1,395 @@
+import bisect
+import hashlib
+import heapq
+import itertools
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import F, Max
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.exceptions import APIException
+
+from core.models import (
+    Ingredient, Recipe, RecipeBand, RecipeIngredient, ShardAssignment,
+    ShardSequence, Tag, User
+)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# copied with their ids, which are unique across shards
+MOVED = (Tag, Ingredient, Recipe)
+# rows linking the above, given new ids where they are copied to
+LINKED = (Recipe.tags.through, RecipeIngredient, RecipeBand)
+SHARDED = frozenset(MOVED + LINKED)
+
+_state = threading.local()
+# model label -> (next id, end) of the block of ids this process reserved
+_blocks = {}
+_blocks_lock = threading.Lock()
+_rings = {}
+
+
+def enabled():
+    """Check if recipe data is spread over several databases"""
+    return bool(getattr(settings, 'DATABASE_SHARDS', None))
+
+
+def aliases():
+    """Return the databases holding recipe data, default first"""
+    return [DEFAULT_DB_ALIAS] + list(getattr(settings, 'DATABASE_SHARDS', []))
+
+
+def _hash(key):
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+class HashRing:
+    """Consistent hash ring placing keys on databases
+
+    Each database sits at vnodes points of the ring and a key belongs to
+    the first point after its hash, so adding a database to N others
+    only moves about 1/(N + 1) of the keys, all of them onto the new one.
+    """
+
+    def __init__(self, nodes, vnodes):
+        points = sorted(
+            (_hash(f'{node}#{index}'), node)
+            for node in nodes for index in range(vnodes)
+        )
+        self.hashes = [point for point, _ in points]
+        self.nodes = [node for _, node in points]
+
+    def node(self, key):
+        """Return the database of a key"""
+        index = bisect.bisect(self.hashes, _hash(str(key)))
+        return self.nodes[index % len(self.nodes)]
+
+
+def ring():
+    """Return the hash ring of the configured databases"""
+    key = (tuple(aliases()), settings.SHARD_VNODES)
+    if key not in _rings:
+        _rings[key] = HashRing(*key)
+    return _rings[key]
+
+
+def placement(user_id):
+    """Return (database, moving) of a user's recipe data"""
+    row = ShardAssignment.objects.using(DEFAULT_DB_ALIAS).filter(
+        user_id=user_id
+    ).values_list('shard', 'moving').first()
+    return row or (DEFAULT_DB_ALIAS, False)
+
+
+def shard_of(user_id):
+    """Return the database of a user's recipe data"""
+    if not enabled() or user_id is None:
+        return DEFAULT_DB_ALIAS
+    return placement(user_id)[0]
+
+
+class Merged:
+    """A queryset read from every database holding recipe data
+
+    Rows are merged by key, which must follow the queryset's ordering.
+    Supports what pagination needs, count() and slices. Each database
+    reads its rows up to the end of the slice, so deep pages cost more.
+    """
+
+    def __init__(self, queryset, key):
+        self.queryset = queryset
+        self.key = key
+
+    def count(self):
+        return sum(
+            self.queryset.using(alias).count() for alias in aliases()
+        )
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        parts = [
+            self.queryset.using(alias)[:index.stop] for alias in aliases()
+        ]
+        return list(itertools.islice(
+            heapq.merge(*parts, key=self.key), index.start or 0, index.stop
+        ))
+
+
+def users_on(alias):
+    """Return the users whose recipe data is on a database"""
+    if not enabled():
+        return User.objects.all()
+    directory = ShardAssignment.objects.all()
+    if alias == DEFAULT_DB_ALIAS:
+        return User.objects.exclude(pk__in=directory.exclude(
+            shard=alias
+        ).values('user_id'))
+    return User.objects.filter(pk__in=directory.filter(
+        shard=alias
+    ).values('user_id'))
+
+
+def active():
+    """Return the database recipe data is routed to, None if not set"""
+    return getattr(_state, 'shard', None)
+
+
+@contextmanager
+def using(alias):
+    """Route recipe data to a database within the block"""
+    previous = active()
+    _state.shard = alias
+    try:
+        yield alias
+    finally:
+        _state.shard = previous
+
+
+def using_user(user_id):
+    """Route recipe data to a user's database within the block"""
+    return using(shard_of(user_id))
+
+
+def db_for(instance=None):
+    """Return the database of recipe data related to instance
+
+    The active database wins, then the one instance was loaded from,
+    then the one of the user instance is or belongs to.
+    """
+    shard = active()
+    if shard is not None:
+        return shard
+    if instance is None:
+        return DEFAULT_DB_ALIAS
+    if type(instance) in SHARDED and instance._state.db:
+        return instance._state.db
+    if isinstance(instance, User):
+        return shard_of(instance.pk)
+    return shard_of(getattr(instance, 'user_id', None))
+
+
+def _allocate(model, count):
+    """Reserve count ids of model in the default database
+
+    Returns (first, end) of the block. The first block of a model starts
+    above the highest id found on any database.
+    """
+    name = model._meta.label_lower
+    sequences = ShardSequence.objects.using(DEFAULT_DB_ALIAS)
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        reserved = sequences.filter(name=name).update(
+            value=F('value') + count
+        )
+        if not reserved:
+            highest = max(
+                model._base_manager.using(alias).aggregate(
+                    highest=Max('pk')
+                )['highest'] or 0
+                for alias in aliases()
+            )
+            try:
+                with transaction.atomic(using=DEFAULT_DB_ALIAS):
+                    sequences.create(name=name, value=highest + 1 + count)
+            except IntegrityError:
+                sequences.filter(name=name).update(
+                    value=F('value') + count
+                )
+        end = sequences.filter(name=name).values_list(
+            'value', flat=True
+        ).get()
+
+    return end - count, end
+
+
+def next_id(model):
+    """Return an id of model unused on every database"""
+    label = model._meta.label_lower
+    with _blocks_lock:
+        first, end = _blocks.get(label, (0, 0))
+        if first >= end:
+            first, end = _allocate(model, settings.SHARD_ID_BLOCK)
+        _blocks[label] = (first + 1, end)
+    return first
+
+
+def _stub(user_id, alias):
+    """Create the user row the recipe data on alias refers to"""
+    if alias == DEFAULT_DB_ALIAS:
+        return
+    # only the key is needed, the account itself stays in default
+    User.objects.using(alias).bulk_create([User(
+        pk=user_id, email=f'{user_id}@shard.invalid', password='!',
+        is_active=False
+    )], ignore_conflicts=True)
+
+
+def place(user_id):
+    """Put a new user where the ring says, return the database"""
+    shard = ring().node(user_id)
+    ShardAssignment.objects.using(DEFAULT_DB_ALIAS).create(
+        user_id=user_id, shard=shard
+    )
+    _stub(user_id, shard)
+    return shard
+
+
+def drop_stub(user_id, alias):
+    """Delete the user row of a user on a shard, return how many"""
+    if alias == DEFAULT_DB_ALIAS:
+        return 0
+    # no signals: the account itself is not deleted
+    return User.objects.using(alias).filter(pk=user_id)._raw_delete(alias)
+
+
+def _rows(model, user_id, alias):
+    """Return the rows of model on a database belonging to a user"""
+    owner = 'recipe__user_id' if model in LINKED[:2] else 'user_id'
+    return model._base_manager.using(alias).filter(**{owner: user_id})
+
+
+def _copy(model, user_id, source, target, batch_size):
+    """Copy a user's rows of model in batches, return how many"""
+    rows = _rows(model, user_id, source).order_by('pk')
+    last, copied = 0, 0
+    while True:
+        batch = list(rows.filter(pk__gt=last)[:batch_size])
+        if not batch:
+            return copied
+        last = batch[-1].pk
+        if model in LINKED:
+            for row in batch:
+                row.pk = None
+        with transaction.atomic(using=target):
+            model._base_manager.using(target).bulk_create(batch)
+        copied += len(batch)
+
+
+def _drop(model, user_id, alias, batch_size):
+    """Delete a user's rows of model in batches, return how many"""
+    rows = _rows(model, user_id, alias)
+    dropped = 0
+    while True:
+        ids = list(rows.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return dropped
+        with transaction.atomic(using=alias):
+            dropped += model._base_manager.using(alias).filter(
+                pk__in=ids
+            )._raw_delete(alias)
+
+
+def _drop_all(user_id, alias, batch_size):
+    return sum(
+        _drop(model, user_id, alias, batch_size)
+        for model in LINKED + MOVED[::-1]
+    )
+
+
+def move(user_id, target, batch_size=500):
+    """Move a user's recipe data to the target database online
+
+    The user's writes are refused while rows are copied batch_size at a
+    time, reads keep going to the old database until the directory
+    switches to the target, then the old rows are dropped. Rows left on
+    the target by an interrupted move are dropped first. Returns the
+    number of rows copied.
+    """
+    source = shard_of(user_id)
+    if source == target:
+        return 0
+    directory = ShardAssignment.objects.using(DEFAULT_DB_ALIAS)
+    directory.update_or_create(
+        user_id=user_id, defaults={'shard': source, 'moving': True}
+    )
+    # requests that read the placement before the flag was set
+    time.sleep(settings.SHARD_MOVE_GRACE)
+    _drop_all(user_id, target, batch_size)
+    _stub(user_id, target)
+    copied = sum(
+        _copy(model, user_id, source, target, batch_size)
+        for model in MOVED + LINKED
+    )
+    directory.filter(user_id=user_id).update(shard=target, moving=False)
+
+    # requests still reading the old database
+    time.sleep(settings.SHARD_MOVE_GRACE)
+    _drop_all(user_id, source, batch_size)
+    drop_stub(user_id, source)
+    return copied
+
+
+def misplaced(batch_size=500):
+    """Yield (user id, current, target) of users the ring places elsewhere"""
+    current_ring = ring()
+    last = 0
+    while True:
+        user_ids = list(
+            User.objects.using(DEFAULT_DB_ALIAS).filter(pk__gt=last)
+            .order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not user_ids:
+            return
+        placed = dict(ShardAssignment.objects.using(
+            DEFAULT_DB_ALIAS
+        ).filter(user_id__in=user_ids).values_list('user_id', 'shard'))
+        for user_id in user_ids:
+            current = placed.get(user_id, DEFAULT_DB_ALIAS)
+            target = current_ring.node(user_id)
+            if current != target:
+                yield user_id, current, target
+        last = user_ids[-1]
+
+
+class ShardMoving(APIException):
+    status_code = 503
+    default_detail = 'Your recipes are being moved, try again shortly.'
+    default_code = 'shard_moving'
+    # seconds, sent as Retry-After
+    wait = 5
+
+
+class ShardedViewMixin:
+    """Route a view's recipe data to the database of the requesting user
+
+    Unsafe requests of views with `atomic_writes` run in a transaction
+    on that database too, committed after the default database's one.
+    Writes of a user whose data is being moved are refused with 503.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        self.shard_context = ExitStack()
+        with self.shard_context:
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if not enabled() or not request.user.is_authenticated:
+            return
+        shard, moving = placement(request.user.pk)
+        unsafe = request.method not in SAFE_METHODS
+        if moving and unsafe:
+            raise ShardMoving()
+        self.shard_context.enter_context(using(shard))
+        if unsafe and shard != DEFAULT_DB_ALIAS and \
+                getattr(self, 'atomic_writes', False):
+            self.shard_context.enter_context(transaction.atomic(using=shard))
+
+
+@receiver(pre_save)
+def assign_id(sender, instance, raw, **kwargs):
+    """Give new recipes, tags and ingredients an id unique across shards"""
+    if sender in MOVED and instance.pk is None and not raw and enabled():
+        instance.pk = next_id(sender)
+
+
+@receiver(post_save, sender=User)
+def place_user(sender, instance, created, raw, using, **kwargs):
+    """Place a new user's recipe data on the ring"""
+    if not created or raw or using != DEFAULT_DB_ALIAS or not enabled():
+        return
+    place(instance.pk)
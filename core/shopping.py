@@ -0,0 +1,64 @@
+from decimal import Decimal
+
+from django.db.models import (
+    Case, CharField, DecimalField, F, Sum, Value, When
+)
+
+from core.models import RecipeIngredient
+
+# unit -> (unit quantities are summed in, factor converting to it)
+UNITS = {
+    '': ('', Decimal(1)),
+    'g': ('g', Decimal(1)),
+    'kg': ('g', Decimal(1000)),
+    'ml': ('ml', Decimal(1)),
+    'l': ('ml', Decimal(1000)),
+    'tsp': ('ml', Decimal('4.929')),
+    'tbsp': ('ml', Decimal('14.787')),
+    'cup': ('ml', Decimal('236.588')),
+    'piece': ('piece', Decimal(1)),
+}
+QUANTITY = DecimalField(max_digits=18, decimal_places=3)
+
+
+def _case(field, mapping, output_field):
+    """Return a CASE expression mapping values of field"""
+    return Case(
+        *[When(**{field: key}, then=Value(value))
+          for key, value in mapping.items()],
+        output_field=output_field
+    )
+
+
+def shopping_list(user, multipliers):
+    """Return the ingredients of the user's recipes summed per base unit
+
+    multipliers maps recipe ids to how many times each recipe is made.
+    Units are normalised and scaled inside a single grouped query.
+    """
+    base_unit = _case(
+        'unit', {unit: base for unit, (base, _) in UNITS.items()},
+        CharField()
+    )
+    factor = _case(
+        'unit', {unit: factor for unit, (_, factor) in UNITS.items()},
+        QUANTITY
+    )
+    multiplier = _case('recipe_id', multipliers, QUANTITY)
+    rows = RecipeIngredient.objects.filter(
+        recipe_id__in=list(multipliers), recipe__user=user,
+        recipe__deleted_at__isnull=True
+    ).annotate(base_unit=base_unit).values(
+        'ingredient_id', 'ingredient__name', 'base_unit'
+    ).annotate(
+        total=Sum(F('quantity') * factor * multiplier, output_field=QUANTITY)
+    ).order_by('ingredient__name', 'ingredient_id', 'base_unit')
+
+    return [{
+        'ingredient': row['ingredient_id'],
+        'name': row['ingredient__name'],
+        'quantity': None if row['total'] is None else str(
+            row['total'].quantize(Decimal('0.001'))
+        ),
+        'unit': row['base_unit'],
+    } for row in rows]
@@ -0,0 +1,200 @@
+import hashlib
+import math
+import random
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete
+)
+from django.dispatch import receiver
+
+from core import sharding
+from core.models import Ingredient, Recipe, RecipeBand, Tag
+
+# Link table -> (column holding the linked id, feature prefix)
+LINKS = {
+    Recipe.tags.through: ('tag_id', 't'),
+    Recipe.ingredients.through: ('ingredient_id', 'i'),
+}
+# Mersenne prime modulus of the MinHash permutations
+PRIME = (1 << 61) - 1
+
+
+def jaccard(first, second):
+    """Return the Jaccard similarity of two feature sets"""
+    union = len(first | second)
+    return len(first & second) / union if union else 0.0
+
+
+def cosine(first, second):
+    """Return the cosine similarity of two binary feature sets"""
+    norm = math.sqrt(len(first) * len(second))
+    return len(first & second) / norm if norm else 0.0
+
+
+METRICS = {'jaccard': jaccard, 'cosine': cosine}
+
+
+def _hash(text):
+    """Return a stable signed 64 bit hash of text"""
+    digest = hashlib.blake2b(text.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+@lru_cache(maxsize=None)
+def _permutations(count):
+    """Return the (a, b) coefficients of count hash permutations"""
+    rng = random.Random(count)
+    return tuple(
+        (rng.randrange(1, PRIME), rng.randrange(PRIME)) for _ in range(count)
+    )
+
+
+def buckets(features):
+    """Return the LSH band buckets of a feature set"""
+    if not features:
+        return []
+    bands, rows = settings.SIMILARITY_BANDS, settings.SIMILARITY_ROWS
+    hashes = [_hash(feature) % PRIME for feature in features]
+    signature = [
+        min((a * value + b) % PRIME for value in hashes)
+        for a, b in _permutations(bands * rows)
+    ]
+    return [
+        _hash(f'{band}:{signature[band * rows:(band + 1) * rows]}')
+        for band in range(bands)
+    ]
+
+
+def features(recipe_ids):
+    """Return {recipe id: set of tag and ingredient features}"""
+    found = {recipe_id: set() for recipe_id in recipe_ids}
+    for through, (column, prefix) in LINKS.items():
+        rows = through.objects.filter(
+            recipe_id__in=list(found)
+        ).values_list('recipe_id', column)
+        for recipe_id, value in rows:
+            found[recipe_id].add(f'{prefix}{value}')
+
+    return found
+
+
+def index(recipe_ids):
+    """Recompute the band buckets of the given recipes"""
+    owners = dict(
+        Recipe.objects.filter(pk__in=list(recipe_ids)).values_list(
+            'id', 'user_id'
+        )
+    )
+    found = features(owners)
+    with transaction.atomic():
+        RecipeBand.objects.filter(recipe_id__in=list(owners)).delete()
+        RecipeBand.objects.bulk_create(
+            RecipeBand(recipe_id=recipe_id, user_id=owners[recipe_id],
+                       bucket=bucket)
+            for recipe_id, recipe_features in found.items()
+            for bucket in set(buckets(recipe_features))
+        )
+
+
+def rebuild_all(batch_size=500):
+    """Index every recipe a batch at a time, return how many"""
+    indexed = 0
+    for alias in sharding.aliases():
+        last = 0
+        with sharding.using(alias):
+            while True:
+                recipe_ids = list(
+                    Recipe.objects.filter(pk__gt=last).order_by(
+                        'pk'
+                    ).values_list('pk', flat=True)[:batch_size]
+                )
+                if not recipe_ids:
+                    break
+                index(recipe_ids)
+                last = recipe_ids[-1]
+                indexed += len(recipe_ids)
+
+    return indexed
+
+
+def similar(recipe, limit=10, metric='jaccard'):
+    """Return [(recipe id, score)] of the owner's recipes most like recipe
+
+    Only recipes sharing a band bucket are scored, the candidates sharing
+    the most buckets first.
+    """
+    own = RecipeBand.objects.filter(recipe=recipe).values('bucket')
+    candidates = RecipeBand.objects.filter(
+        user_id=recipe.user_id, bucket__in=own
+    ).exclude(recipe_id=recipe.pk).values_list('recipe_id').annotate(
+        hits=Count('id')
+    ).order_by('-hits')[:settings.SIMILARITY_CANDIDATES]
+    candidate_ids = [recipe_id for recipe_id, _ in candidates]
+    if not candidate_ids:
+        return []
+
+    found = features([recipe.pk] + candidate_ids)
+    target = found.pop(recipe.pk)
+    score = METRICS[metric]
+    ranked = sorted(
+        ((score(target, other), recipe_id)
+         for recipe_id, other in found.items()),
+        key=lambda item: (-item[0], item[1]),
+    )
+    return [
+        (recipe_id, value) for value, recipe_id in ranked[:limit] if value
+    ]
+
+
+@receiver(m2m_changed)
+def reindex_links(sender, instance, action, reverse, pk_set, **kwargs):
+    """Reindex recipes whose tags or ingredients changed"""
+    if sender not in LINKS:
+        return
+    if action == 'pre_clear' and reverse:
+        column = LINKS[sender][0]
+        instance._similarity_recipes = list(sender.objects.filter(
+            **{column: instance.pk}
+        ).values_list('recipe_id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if action != 'post_clear' and not pk_set:
+        return
+
+    if not reverse:
+        index([instance.pk])
+    elif action == 'post_clear':
+        index(instance.__dict__.pop('_similarity_recipes', []))
+    else:
+        index(pk_set)
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_linked_recipes(sender, instance, **kwargs):
+    """Note the recipes that lose a tag or ingredient being deleted"""
+    through = Recipe.tags.through if sender is Tag else (
+        Recipe.ingredients.through
+    )
+    instance._similarity_recipes = list(through.objects.filter(
+        **{LINKS[through][0]: instance.pk}
+    ).values_list('recipe_id', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def reindex_linked_recipes(sender, instance, **kwargs):
+    """Reindex the recipes that lost a deleted tag or ingredient"""
+    index(instance.__dict__.pop('_similarity_recipes', []))
+
+
+@receiver(post_save, sender=Recipe)
+def unindex_deleted_recipe(sender, instance, **kwargs):
+    """Take a deleted recipe out of the index"""
+    if instance.deleted_at is not None:
+        RecipeBand.objects.filter(recipe=instance).delete()
@@ -0,0 +1,94 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+
+from core import (
+    changes, deletion, facets, jobs, linked_ids, sharding, similarity
+)
+from core.models import AuthToken, Recipe
+
+
+@jobs.task('process_recipe_image')
+def process_recipe_image(recipe_id, user_id=None):
+    """Shrink an uploaded recipe image to RECIPE_IMAGE_MAX_SIZE pixels"""
+    # Pillow is only needed by the worker, keep it out of web processes
+    from PIL import Image
+
+    with sharding.using_user(user_id):
+        recipe = Recipe.objects.filter(id=recipe_id).first()
+    if recipe is None or not recipe.image:
+        return
+
+    with recipe.image.open('rb') as image_file:
+        image = Image.open(image_file)
+        image.load()
+    size = settings.RECIPE_IMAGE_MAX_SIZE
+    if max(image.size) <= size:
+        return
+    image_format = image.format
+    image.thumbnail((size, size))
+    buffer = BytesIO()
+    image.save(buffer, format=image_format)
+
+    # rename the shrunk copy over the original, so nobody reads a missing
+    # or half written image, also when a reclaimed job runs twice
+    storage, name = recipe.image.storage, recipe.image.name
+    temporary = storage.save(f'{name}.tmp', ContentFile(buffer.getvalue()))
+    os.replace(storage.path(temporary), storage.path(name))
+
+
+@jobs.task('purge_tokens')
+def purge_tokens(batch_size=1000):
+    """Delete expired API tokens in batches, return how many"""
+    now = timezone.now()
+    deleted = 0
+    while True:
+        ids = list(
+            AuthToken.objects.filter(expires__lte=now)
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        # nothing refers to tokens, so this is a single DELETE
+        count, _ = AuthToken.objects.filter(id__in=ids).delete()
+        deleted += count
+
+
+@jobs.task('rebuild_facets')
+def rebuild_facets(batch_size=100):
+    """Recompute every user's facet counters, return how many users"""
+    return facets.rebuild_all(batch_size=batch_size)
+
+
+@jobs.task('rebuild_similarity')
+def rebuild_similarity(batch_size=500):
+    """Recompute the similarity index of every recipe, return how many"""
+    return similarity.rebuild_all(batch_size=batch_size)
+
+
+@jobs.task('purge_recipe')
+def purge_recipe(recipe_id, batch_size=1000, user_id=None):
+    """Delete the rows of a deleted recipe, return how many"""
+    with sharding.using_user(user_id):
+        return deletion.purge_recipe(recipe_id, batch_size=batch_size)
+
+
+@jobs.task('purge_user')
+def purge_user(user_id, batch_size=1000):
+    """Delete the data of a closed account, return how many rows"""
+    return deletion.purge_user(user_id, batch_size=batch_size)
+
+
+@jobs.task('compact_changes')
+def compact_changes(batch_size=100, days=None):
+    """Drop superseded and old change log entries, return how many"""
+    return changes.compact_all(batch_size=batch_size, days=days)
+
+
+@jobs.task('check_linked_ids')
+def check_linked_ids(batch_size=1000, repair=False):
+    """Verify recipes' tag and ingredient id copies, return (checked, stale)"""
+    return linked_ids.check(batch_size=batch_size, repair=repair)
@@ -1,7 +1,12 @@
+from unittest.mock import patch
+
 from django.test import TestCase, Client
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
+from core.models import Recipe, Tag
+from core.pagination import EstimatedCountPaginator
+
 
 class AdminSiteTests(TestCase):
 
@@ -43,3 +48,74 @@ class AdminSiteTests(TestCase):
         res = self.client.get(url)
 
         self.assertEqual(res.status_code, 200)
+
+
+class LargeTableAdminTests(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.admin_user = get_user_model().objects.create_superuser(
+            email='admin@gmail.com',
+            password='thebeast'
+        )
+        self.client.force_login(self.admin_user)
+
+    def sample_recipe(self, title='Soup'):
+        return Recipe.objects.create(
+            user=self.admin_user, title=title, time_minutes=5, price=1
+        )
+
+    def test_recipe_changelist_queries_constant(self):
+        """Test the recipe list does not query per row"""
+        self.sample_recipe()
+        url = reverse('admin:core_recipe_changelist')
+        # session, user, count, rows with their users, is_public filter
+        with self.assertNumQueries(5):
+            self.client.get(url)
+        for index in range(5):
+            self.sample_recipe(f'Soup {index}')
+
+        with self.assertNumQueries(5):
+            res = self.client.get(url)
+
+        self.assertContains(res, 'Soup 4')
+
+    def test_search_prefix_and_id(self):
+        """Test the search looks up title prefixes and ids"""
+        soup = self.sample_recipe('Soup')
+        stew = self.sample_recipe('Stew')
+        url = reverse('admin:core_recipe_changelist')
+
+        by_prefix = self.client.get(url, {'q': 'Sou'})
+        by_id = self.client.get(url, {'q': str(stew.id)})
+
+        self.assertEqual(list(by_prefix.context['cl'].result_list), [soup])
+        self.assertEqual(list(by_id.context['cl'].result_list), [stew])
+
+    def test_recipe_change_page(self):
+        """Test the recipe change page renders its ingredient inline"""
+        recipe = self.sample_recipe()
+        url = reverse('admin:core_recipe_change', args=[recipe.id])
+
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, 200)
+
+    def test_paginator_estimates_large_tables(self):
+        """Test unfiltered counts of large tables use the estimate"""
+        Tag.objects.create(user=self.admin_user, name='Vegan')
+        paginator = EstimatedCountPaginator(Tag.objects.order_by('id'), 10)
+
+        with patch('core.pagination.estimated_rows', return_value=10 ** 7):
+            self.assertEqual(paginator.count, 10 ** 7)
+
+    def test_paginator_bounds_filtered_counts(self):
+        """Test filtered counts stop at max_count"""
+        for index in range(3):
+            Tag.objects.create(user=self.admin_user, name=f'Tag {index}')
+        paginator = EstimatedCountPaginator(
+            Tag.objects.filter(name__startswith='Tag').order_by('id'), 1
+        )
+        paginator.max_count = 2
+
+        self.assertEqual(paginator.count, 2)
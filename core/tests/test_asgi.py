@@ -0,0 +1,112 @@
+import asyncio
+import json
+
+from django.core.wsgi import get_wsgi_application
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from core.asgi import WsgiToAsgi
+
+HEALTH_URL = reverse('health')
+
+
+def run(coroutine):
+    """Run a coroutine on a new event loop, like asyncio.run in 3.7"""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def call(application, scope, chunks=(b'',)):
+    """Run one ASGI request, return the messages sent back"""
+    incoming = [
+        {'type': 'http.request', 'body': chunk,
+         'more_body': index < len(chunks) - 1}
+        for index, chunk in enumerate(chunks)
+    ]
+    sent = []
+
+    async def receive():
+        await asyncio.sleep(0)
+        return incoming.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    run(application(scope, receive, send))
+    return sent
+
+
+def http_scope(method, path, headers=(), query_string=b''):
+    return {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'query_string': query_string,
+        'headers': list(headers),
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 5000),
+    }
+
+
+class WsgiToAsgiTests(SimpleTestCase):
+
+    def setUp(self):
+        self.application = WsgiToAsgi(get_wsgi_application(), max_workers=2)
+
+    def test_response_status_and_headers(self):
+        """Test the Django response is sent as ASGI messages"""
+        sent = call(self.application, http_scope(
+            'GET', reverse('receipe:recipe-list')
+        ))
+
+        self.assertEqual(sent[0]['type'], 'http.response.start')
+        self.assertEqual(sent[0]['status'], 401)
+        self.assertIn(
+            (b'content-type', b'application/json'), sent[0]['headers']
+        )
+        self.assertFalse(sent[-1].get('more_body', False))
+
+    def test_body_received_in_chunks(self):
+        """Test a body sent in several chunks reaches the view"""
+        body = json.dumps({'email': '', 'password': ''}).encode()
+        sent = call(
+            self.application,
+            http_scope('POST', reverse('user:token'), headers=[
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode()),
+            ]),
+            chunks=(body[:5], body[5:])
+        )
+
+        self.assertEqual(sent[0]['status'], 400)
+        payload = json.loads(b''.join(m.get('body', b'') for m in sent[1:]))
+        self.assertIn('email', payload)
+
+    def test_disconnect_before_body(self):
+        """Test a client leaving mid upload never reaches Django"""
+        sent = []
+
+        async def receive():
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        run(self.application(
+            http_scope('POST', reverse('user:token')), receive, send
+        ))
+
+        self.assertEqual(sent, [])
+
+
+class HealthCheckTests(TestCase):
+
+    def test_health_ok(self):
+        """Test the health check reports a reachable database"""
+        res = self.client.get(HEALTH_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json(), {'status': 'ok'})
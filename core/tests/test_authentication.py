@@ -0,0 +1,108 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import exceptions, status
+from rest_framework.test import APIClient
+
+from core.authentication import ExpiringTokenAuthentication
+from core.models import AuthToken
+
+RECIPES_URL = reverse('receipe:recipe-list')
+TOKEN_URL = reverse('user:token')
+
+
+class ExpiringTokenTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'abc@gmail.com',
+            'testpass'
+        )
+        self.token, self.key = AuthToken.objects.issue(self.user)
+        self.client = APIClient()
+
+    def test_key_not_stored(self):
+        """Test only the prefix and a digest of the key are stored"""
+        self.assertEqual(self.token.prefix, self.key[:8])
+        self.assertNotIn(self.key, self.token.digest)
+        self.assertTrue(self.token.matches(self.key))
+
+    def test_authenticate_single_query(self):
+        """Test authenticating a token is one indexed lookup"""
+        with self.assertNumQueries(1):
+            user, token = ExpiringTokenAuthentication() \
+                .authenticate_credentials(self.key)
+
+        self.assertEqual(user, self.user)
+        self.assertEqual(token, self.token)
+
+    def test_valid_token_accepted(self):
+        """Test requests with a valid token are authenticated"""
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.key}')
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_expired_token_rejected(self):
+        """Test an expired token no longer authenticates"""
+        self.token.expires = timezone.now() - timedelta(seconds=1)
+        self.token.save()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.key}')
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_wrong_key_with_same_prefix_rejected(self):
+        """Test a key matching only the prefix is rejected"""
+        forged = self.key[:8] + '0' * 32
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            ExpiringTokenAuthentication().authenticate_credentials(forged)
+
+    def test_token_rotated_close_to_expiry(self):
+        """Test a login with a nearly expired token gets a new one"""
+        self.token.expires = timezone.now() + timedelta(minutes=5)
+        self.token.save()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.key}')
+
+        res = self.client.post(
+            TOKEN_URL, {'email': 'abc@gmail.com', 'password': 'testpass'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res.data['token'], self.key)
+        self.assertFalse(AuthToken.objects.filter(id=self.token.id).exists())
+
+    def test_token_not_rotated_without_password(self):
+        """Test a nearly expired token is not renewed by a bad password"""
+        self.token.expires = timezone.now() + timedelta(minutes=5)
+        self.token.save()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.key}')
+
+        res = self.client.post(
+            TOKEN_URL, {'email': 'abc@gmail.com', 'password': 'wrong'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('token', res.data)
+        self.assertEqual(AuthToken.objects.filter(user=self.user).count(), 1)
+        self.assertTrue(AuthToken.objects.filter(id=self.token.id).exists())
+
+    def test_purge_expired_tokens(self):
+        """Test the purge command deletes only expired tokens"""
+        expired, _ = AuthToken.objects.issue(self.user)
+        expired.expires = timezone.now() - timedelta(days=1)
+        expired.save()
+
+        call_command('purge_tokens', batch_size=1, stdout=StringIO())
+
+        self.assertFalse(AuthToken.objects.filter(id=expired.id).exists())
+        self.assertTrue(AuthToken.objects.filter(id=self.token.id).exists())
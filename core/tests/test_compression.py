@@ -0,0 +1,108 @@
+import gzip
+import json
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import compression
+from core.middleware import CompressionMiddleware
+from core.models import Recipe
+
+PUBLIC_URL = reverse('receipe:public-recipe-list')
+
+
+class NegotiateTests(SimpleTestCase):
+    """Test choosing a content encoding"""
+
+    def test_gzip(self):
+        """Test gzip is used when it is the only encoding offered"""
+        self.assertEqual(compression.negotiate('gzip, deflate'), 'gzip')
+
+    def test_refused(self):
+        """Test encodings with a zero quality are not used"""
+        self.assertIsNone(compression.negotiate('gzip;q=0, deflate'))
+        self.assertIsNone(compression.negotiate(''))
+
+    def test_wildcard(self):
+        """Test a wildcard accepts the preferred encoding"""
+        self.assertEqual(
+            compression.negotiate('*'), next(iter(compression.CODECS))
+        )
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    """Test which responses are compressed"""
+
+    def respond(self, content, content_type='application/json'):
+        middleware = CompressionMiddleware(
+            lambda request: HttpResponse(content, content_type=content_type)
+        )
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        return middleware(request)
+
+    def test_large_json_compressed(self):
+        """Test a large JSON body is compressed"""
+        body = json.dumps([{'title': 'sample recipe'}] * 200).encode()
+
+        res = self.respond(body)
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(res['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(res.content), body)
+
+    def test_gzip_output_stable(self):
+        """Test gzip bodies carry no timestamp so variants match"""
+        body = json.dumps([{'title': 'sample recipe'}] * 200).encode()
+
+        first = self.respond(body).content
+        second = self.respond(body).content
+
+        self.assertEqual(first, second)
+        self.assertEqual(first[4:8], b'\x00' * 4)
+        self.assertEqual(gzip.decompress(first), body)
+
+    def test_small_body_not_compressed(self):
+        """Test bodies under the threshold are sent as they are"""
+        res = self.respond(b'{"title": "sample recipe"}')
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+    def test_image_not_compressed(self):
+        """Test images are sent as they are"""
+        res = self.respond(b'\xff' * 4096, content_type='image/jpeg')
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+
+class CachedCompressionTests(TestCase):
+    """Test compressed variants are kept with cached responses"""
+
+    def setUp(self):
+        caches['responses'].clear()
+        user = get_user_model().objects.create_user('abc@gmail.com', 'pass')
+        Recipe.objects.bulk_create(
+            Recipe(user=user, title=f'sample recipe {i}', time_minutes=10,
+                   price=5, is_public=True)
+            for i in range(30)
+        )
+        self.client = APIClient()
+
+    def test_variant_reused(self):
+        """Test a repeated hit does not compress again"""
+        with patch.object(compression, 'compress',
+                          wraps=compression.compress) as compress:
+            first = self.client.get(PUBLIC_URL, HTTP_ACCEPT_ENCODING='gzip')
+            second = self.client.get(PUBLIC_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(compress.call_count, 1)
+        self.assertEqual(second['Content-Encoding'], 'gzip')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(
+            len(json.loads(gzip.decompress(second.content))['results']), 30
+        )
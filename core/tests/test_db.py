@@ -0,0 +1,47 @@
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from core.signals import apply_sqlite_pragmas, check_persistent_connections
+
+
+class DatabaseSetupTests(TestCase):
+
+    def test_sqlite_pragmas_applied(self):
+        """Test the sqlite pragmas are set on the connection"""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            busy_timeout = cursor.fetchone()[0]
+            cursor.execute('PRAGMA synchronous')
+            synchronous = cursor.fetchone()[0]
+
+        self.assertEqual(busy_timeout, 5000)
+        self.assertEqual(synchronous, 1)  # NORMAL
+
+    @override_settings(SQLITE_PRAGMAS={'busy_timeout': 1234})
+    def test_sqlite_pragmas_from_settings(self):
+        """Test the pragmas come from settings.SQLITE_PRAGMAS"""
+        apply_sqlite_pragmas(sender=None, connection=connection)
+
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 1234)
+
+    def test_unusable_connection_closed_on_request(self):
+        """Test health checks close a broken persistent connection"""
+        connection.ensure_connection()
+        with patch.dict(connection.settings_dict, CONN_HEALTH_CHECKS=True), \
+                patch.object(connection, 'is_usable', return_value=False), \
+                patch.object(connection, 'close') as close:
+            check_persistent_connections(sender=None)
+
+        close.assert_called_once_with()
+
+    def test_health_checks_disabled(self):
+        """Test connections are not pinged without CONN_HEALTH_CHECKS"""
+        connection.ensure_connection()
+        with patch.object(connection, 'is_usable') as is_usable:
+            check_persistent_connections(sender=None)
+
+        is_usable.assert_not_called()
@@ -0,0 +1,64 @@
+import os
+import threading
+
+from django.test import SimpleTestCase
+
+from core.backends.postgresql_pool import pool
+
+
+class ListPool:
+    """Connection pool handing out plain objects"""
+
+    def __init__(self):
+        self.free = [object() for _ in range(2)]
+
+    def getconn(self):
+        return self.free.pop()
+
+    def putconn(self, connection, close=False):
+        self.free.append(connection)
+
+
+class BoundedPoolTests(SimpleTestCase):
+    """Test the pooled Postgres backend's connection pool"""
+
+    def tearDown(self):
+        pool._pools.clear()
+
+    def test_exhausted_pool_waits(self):
+        """Test a request waits for a connection given back meanwhile"""
+        bounded = pool.BoundedPool(ListPool(), 2, timeout=5)
+        first, second = bounded.getconn(), bounded.getconn()
+
+        threading.Timer(0.1, bounded.putconn, [first]).start()
+
+        self.assertIs(bounded.getconn(), first)
+        bounded.putconn(second)
+
+    def test_exhausted_pool_times_out(self):
+        """Test waiting for a connection is bounded"""
+        bounded = pool.BoundedPool(ListPool(), 2, timeout=0.05)
+        bounded.getconn()
+        bounded.getconn()
+
+        with self.assertRaises(pool.PoolTimeout):
+            bounded.getconn()
+
+    def test_forked_worker_gets_own_pool(self):
+        """Test a forked process does not reuse its parent's pool"""
+        parent = pool.pool_for('default', object)
+        read, write = os.pipe()
+        self.addCleanup(os.close, read)
+        self.addCleanup(os.close, write)
+
+        pid = os.fork()
+        if pid == 0:
+            child = pool.pool_for('default', object)
+            os.write(write, b'1' if child is not parent and list(
+                pool._pools
+            ) == [('default', os.getpid())] else b'0')
+            os._exit(0)
+        os.waitpid(pid, 0)
+
+        self.assertEqual(os.read(read, 1), b'1')
+        self.assertIs(pool.pool_for('default', object), parent)
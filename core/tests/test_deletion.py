@@ -0,0 +1,108 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import deletion
+from core.models import (
+    AuthToken, FacetCount, Ingredient, Job, Recipe, RecipeIngredient, Tag
+)
+
+RECIPES_URL = reverse('receipe:recipe-list')
+ME_URL = reverse('user:me')
+
+
+def detail_url(recipe_id):
+    return reverse('receipe:recipe-detail', args=[recipe_id])
+
+
+class DeletionTests(TestCase):
+    """Test soft deletes and the background purge"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'abc@gmail.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name='Salt'
+        )
+
+    def sample_recipe(self, **params):
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=1, **params
+        )
+        recipe.tags.add(self.tag)
+        recipe.ingredients.add(self.ingredient)
+        return recipe
+
+    def test_delete_recipe_hides_it(self):
+        """Test a deleted recipe disappears at once and a purge is queued"""
+        recipe = self.sample_recipe()
+
+        res = self.client.delete(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.get(RECIPES_URL).data, [])
+        self.assertTrue(Recipe.all_objects.filter(pk=recipe.pk).exists())
+        self.assertFalse(FacetCount.objects.filter(
+            user=self.user, facet='recipes', count__gt=0
+        ).exists())
+        self.assertTrue(Job.objects.filter(task='purge_recipe').exists())
+
+    def test_purge_recipe(self):
+        """Test the purge removes a deleted recipe and its links"""
+        recipe = self.sample_recipe()
+        deletion.delete_recipe(recipe)
+
+        deletion.purge_recipe(recipe.pk)
+
+        self.assertFalse(Recipe.all_objects.filter(pk=recipe.pk).exists())
+        self.assertFalse(RecipeIngredient.objects.exists())
+        self.assertFalse(Recipe.tags.through.objects.exists())
+        self.assertTrue(Tag.objects.filter(pk=self.tag.pk).exists())
+
+    def test_purge_skips_live_recipe(self):
+        """Test the purge leaves a recipe that was not deleted"""
+        recipe = self.sample_recipe()
+
+        self.assertEqual(deletion.purge_recipe(recipe.pk), 0)
+        self.assertTrue(Recipe.objects.filter(pk=recipe.pk).exists())
+
+    def test_delete_user_deactivates(self):
+        """Test closing an account signs it out and queues a purge"""
+        AuthToken.objects.issue(self.user)
+
+        res = self.client.delete(ME_URL)
+
+        self.user.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(self.user.is_active)
+        self.assertIsNotNone(self.user.deleted_at)
+        self.assertFalse(AuthToken.objects.filter(user=self.user).exists())
+        self.assertTrue(Job.objects.filter(task='purge_user').exists())
+
+    def test_purge_user_in_batches(self):
+        """Test the purge removes all of a closed account's data"""
+        for _ in range(5):
+            self.sample_recipe(is_public=True)
+        other = get_user_model().objects.create_user('x@gmail.com', 'pass')
+        kept = Recipe.objects.create(
+            user=other, title='Kept', time_minutes=5, price=1
+        )
+        deletion.delete_user(self.user)
+
+        deletion.purge_user(self.user.pk, batch_size=2)
+
+        self.assertFalse(
+            get_user_model().objects.filter(pk=self.user.pk).exists()
+        )
+        self.assertEqual(list(Recipe.all_objects.all()), [kept])
+        self.assertFalse(Tag.objects.exists())
+        self.assertFalse(Ingredient.objects.exists())
+        self.assertFalse(RecipeIngredient.objects.exists())
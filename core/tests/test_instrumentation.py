@@ -0,0 +1,89 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import instrumentation
+from core.models import Ingredient, Recipe
+
+RECIPES_URL = reverse('receipe:recipe-list')
+
+
+def quantities_url(recipe_id):
+    return reverse('receipe:recipe-quantities', args=[recipe_id])
+
+
+class SqlShapeTests(TestCase):
+
+    def test_parameter_lists_collapsed(self):
+        """Test IN lists of any length share one shape"""
+        short = 'SELECT * FROM t WHERE id IN (%s, %s)'
+        long = 'SELECT * FROM t WHERE id IN (%s, %s, %s, %s)'
+
+        self.assertEqual(
+            instrumentation.sql_shape(short),
+            instrumentation.sql_shape(long)
+        )
+
+
+class QueryInstrumentationTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'abc@gmail.com',
+            'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @override_settings(REQUEST_PROFILE_SAMPLE_RATE=0)
+    def test_unsampled_request_untouched(self):
+        """Test requests outside the sample get no Server-Timing"""
+        res = self.client.get(RECIPES_URL)
+
+        self.assertNotIn('Server-Timing', res)
+
+    @override_settings(REQUEST_PROFILE_SAMPLE_RATE=1)
+    def test_server_timing_header(self):
+        """Test sampled requests report queries and phase timings"""
+        Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=5
+        )
+
+        with self.assertLogs('core.instrumentation', 'INFO') as logs:
+            res = self.client.get(RECIPES_URL)
+
+        timing = res['Server-Timing']
+        for metric in ('db;dur=', 'serialize;dur=', 'render;dur=',
+                       'total;dur='):
+            self.assertIn(metric, timing)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], RECIPES_URL)
+        self.assertGreater(record['queries'], 0)
+        self.assertEqual(record['repeated'], {})
+
+    @override_settings(REQUEST_PROFILE_SAMPLE_RATE=1,
+                       REQUEST_PROFILE_REPEAT_THRESHOLD=3)
+    def test_repeated_queries_flagged(self):
+        """Test repeated SQL shapes are logged as a warning"""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Dish', time_minutes=5, price=5
+        )
+        ingredients = [
+            Ingredient.objects.create(user=self.user, name=f'Item {index}')
+            for index in range(3)
+        ]
+        recipe.ingredients.add(*ingredients)
+
+        # one UPDATE per ingredient already linked
+        with self.assertLogs('core.instrumentation', 'WARNING') as logs:
+            self.client.put(quantities_url(recipe.id), [
+                {'ingredient': ingredient.id, 'quantity': '1', 'unit': 'g'}
+                for ingredient in ingredients
+            ], format='json')
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertTrue(record['repeated'])
@@ -0,0 +1,175 @@
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import jobs
+from core.models import Job, Recipe
+
+calls = []
+
+
+@jobs.task('test_record')
+def record(value):
+    calls.append(value)
+
+
+@jobs.task('test_fail', max_attempts=2)
+def fail():
+    raise RuntimeError('boom')
+
+
+def run_worker():
+    # the test transaction must survive the worker's connection recycling
+    with patch('core.jobs.close_old_connections'):
+        call_command('run_worker', once=True, stdout=StringIO())
+
+
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueued_job_runs(self):
+        """Test the worker runs a queued job with its arguments"""
+        job = jobs.enqueue('test_record', value=42)
+
+        run_worker()
+
+        job.refresh_from_db()
+        self.assertEqual(calls, [42])
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 1)
+
+    def test_delayed_job_not_claimed(self):
+        """Test jobs are not claimed before their run time"""
+        jobs.enqueue('test_record', delay=60, value=1)
+
+        self.assertEqual(jobs.claim('worker'), [])
+
+    def test_claimed_job_not_claimed_twice(self):
+        """Test a running job is invisible to other workers"""
+        jobs.enqueue('test_record', value=1)
+
+        first = jobs.claim('one')
+        second = jobs.claim('two')
+
+        self.assertEqual(len(first), 1)
+        self.assertEqual(first[0].locked_by, 'one')
+        self.assertEqual(second, [])
+
+    def test_stale_running_job_reclaimed(self):
+        """Test jobs of a vanished worker are picked up again"""
+        job = jobs.enqueue('test_record', value=1)
+        Job.objects.filter(id=job.id).update(
+            status=Job.RUNNING,
+            locked_at=timezone.now() - timedelta(hours=1)
+        )
+
+        self.assertEqual(jobs.claim('worker'), [job])
+
+    def test_reclaimed_job_outcome_kept(self):
+        """Test a worker whose job was reclaimed does not record an outcome"""
+        jobs.enqueue('test_record', value=1)
+        slow, = jobs.claim('slow')
+        Job.objects.filter(id=slow.id).update(
+            locked_at=timezone.now() - timedelta(hours=1)
+        )
+        fast, = jobs.claim('fast')
+
+        self.assertEqual(jobs.run(slow), 'reclaimed')
+        fast.refresh_from_db()
+        self.assertEqual(
+            (fast.status, fast.locked_by, fast.attempts),
+            (Job.RUNNING, 'fast', 2)
+        )
+        self.assertEqual(jobs.run(fast), Job.DONE)
+
+    @override_settings(JOB_RETRY_BACKOFF=30)
+    def test_failed_job_retried_with_backoff(self):
+        """Test a failing job is queued again later"""
+        job = jobs.enqueue('test_fail')
+
+        run_worker()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('boom', job.last_error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=20))
+
+    def test_job_fails_after_max_attempts(self):
+        """Test a job gives up after its last attempt"""
+        job = jobs.enqueue('test_fail')
+        Job.objects.filter(id=job.id).update(attempts=1)
+
+        run_worker()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+    def test_worker_survives_database_error(self):
+        """Test a failed claim is logged and the worker carries on"""
+        job = jobs.enqueue('test_record', value=1)
+        claim = jobs.claim
+        failures = [OperationalError('database is locked')]
+
+        def flaky_claim(worker, limit=1):
+            if failures:
+                raise failures.pop()
+            return claim(worker, limit)
+
+        with patch('core.jobs.claim', flaky_claim), \
+                patch('core.jobs.close_old_connections'), \
+                self.assertLogs('core.jobs', 'ERROR'):
+            jobs.work('worker', threading.Event(), poll_interval=0, once=True)
+
+        job.refresh_from_db()
+        self.assertEqual(calls, [1])
+        self.assertEqual(job.status, Job.DONE)
+
+    def test_queue_depth(self):
+        """Test queued jobs are counted by task"""
+        jobs.enqueue('test_record', value=1)
+        jobs.enqueue('test_record', value=2)
+
+        self.assertEqual(
+            jobs.queue_depth(), {('test_record', Job.QUEUED): 2}
+        )
+
+
+class RecipeImageJobTests(TestCase):
+
+    def setUp(self):
+        user = get_user_model().objects.create_user('abc@gmail.com', 'pass')
+        self.recipe = Recipe.objects.create(
+            user=user, title='Soup', time_minutes=5, price=5
+        )
+
+    def tearDown(self):
+        self.recipe.image.delete()
+
+    @override_settings(RECIPE_IMAGE_MAX_SIZE=50)
+    def test_large_image_shrunk(self):
+        """Test the image job shrinks big uploads"""
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (200, 100)).save(ntf, format='JPEG')
+            ntf.seek(0)
+            self.recipe.image.save(os.path.basename(ntf.name), ntf)
+
+        jobs.enqueue('process_recipe_image', recipe_id=self.recipe.id)
+        run_worker()
+
+        self.recipe.refresh_from_db()
+        with Image.open(self.recipe.image.path) as image:
+            self.assertEqual(image.size, (50, 25))
+        self.assertFalse(os.path.exists(f'{self.recipe.image.path}.tmp'))
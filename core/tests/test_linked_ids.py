@@ -0,0 +1,134 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+from receipe.serializers import RecipeSerializer
+
+RECIPES_URL = reverse('receipe:recipe-list')
+
+
+class LinkedIdsTests(TestCase):
+    """Test the tag and ingredient id copies on recipes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'abc@gmail.com',
+            'testpass'
+        )
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.quick = Tag.objects.create(user=self.user, name='Quick')
+        self.salt = Ingredient.objects.create(user=self.user, name='Salt')
+
+    def sample_recipe(self, title='Soup'):
+        return Recipe.objects.create(
+            user=self.user, title=title, time_minutes=5, price=1
+        )
+
+    def stored(self, recipe):
+        return Recipe.objects.values_list(
+            'tag_ids', 'ingredient_ids'
+        ).get(pk=recipe.pk)
+
+    def test_links_copied(self):
+        """Test adding and removing links updates the copies"""
+        recipe = self.sample_recipe()
+
+        recipe.tags.add(self.quick, self.vegan)
+        recipe.ingredients.add(self.salt)
+        self.assertEqual(
+            recipe.tag_ids, sorted([self.vegan.id, self.quick.id])
+        )
+        self.assertEqual(
+            self.stored(recipe), (recipe.tag_ids, [self.salt.id])
+        )
+
+        recipe.tags.remove(self.vegan)
+        recipe.ingredients.clear()
+        self.assertEqual(self.stored(recipe), ([self.quick.id], []))
+
+    def test_update_keeps_concurrent_link_change(self):
+        """Test saving a recipe does not restore the copies it loaded"""
+        recipe = self.sample_recipe()
+        loaded = Recipe.objects.get(pk=recipe.pk)
+        recipe.tags.add(self.vegan)
+
+        serializer = RecipeSerializer(
+            loaded, data={'title': 'Stew'}, partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.assertEqual(self.stored(recipe), ([self.vegan.id], []))
+        self.assertEqual(Recipe.objects.get(pk=recipe.pk).title, 'Stew')
+
+    def test_reverse_links_copied(self):
+        """Test links changed from the tag side update the copies"""
+        first, second = self.sample_recipe(), self.sample_recipe('Stew')
+
+        self.vegan.recipe_set.add(first, second)
+        self.assertEqual(self.stored(second), ([self.vegan.id], []))
+
+        self.vegan.recipe_set.clear()
+        self.assertEqual(self.stored(first), ([], []))
+        self.assertEqual(self.stored(second), ([], []))
+
+    def test_deleted_tag_uncopied(self):
+        """Test a deleted tag disappears from the copies"""
+        recipe = self.sample_recipe()
+        recipe.tags.add(self.vegan, self.quick)
+
+        self.vegan.delete()
+
+        self.assertEqual(self.stored(recipe), ([self.quick.id], []))
+
+    def test_list_reads_no_link_tables(self):
+        """Test the recipe list costs the same queries for any size"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        recipe = self.sample_recipe()
+        recipe.tags.add(self.vegan)
+        with CaptureQueriesContext(connection) as one:
+            client.get(RECIPES_URL)
+        for index in range(4):
+            recipe = self.sample_recipe(f'Dish {index}')
+            recipe.tags.add(self.vegan, self.quick)
+            recipe.ingredients.add(self.salt)
+
+        with CaptureQueriesContext(connection) as five:
+            res = client.get(RECIPES_URL)
+
+        self.assertEqual(len(five), len(one))
+        self.assertEqual(res.data[-1]['tags'], recipe.tag_ids)
+        self.assertEqual(res.data[-1]['ingredients'], [self.salt.id])
+
+    def test_check_and_repair(self):
+        """Test the command finds and repairs links made without signals"""
+        recipe = self.sample_recipe()
+        recipe.tags.add(self.vegan)
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=self.quick.id)
+        ])
+        found, repaired, clean = StringIO(), StringIO(), StringIO()
+
+        call_command('check_linked_ids', stdout=found)
+        call_command('check_linked_ids', repair=True, stdout=repaired)
+        call_command('check_linked_ids', stdout=clean)
+
+        self.assertEqual(
+            [found.getvalue(), repaired.getvalue(), clean.getvalue()], [
+                'Checked 1 recipes, 1 out of sync\n',
+                'Checked 1 recipes, 1 repaired\n',
+                'Checked 1 recipes, 0 out of sync\n',
+            ]
+        )
+        self.assertEqual(
+            self.stored(recipe), (sorted([self.vegan.id, self.quick.id]), [])
+        )
@@ -0,0 +1,133 @@
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import metrics
+
+METRICS_URL = reverse('metrics')
+RECIPES_URL = reverse('receipe:recipe-list')
+
+
+class MetricsRegistryTests(TestCase):
+
+    def test_histogram_buckets_cumulative(self):
+        """Test histogram buckets, sum and count are exposed"""
+        metrics.LATENCY.observe(0.003, view='test-histogram', method='GET')
+        metrics.LATENCY.observe(0.3, view='test-histogram', method='GET')
+
+        text = metrics.registry.exposition()
+
+        labels = 'view="test-histogram",method="GET"'
+        self.assertIn(
+            f'http_request_duration_seconds_bucket{{{labels},le="0.005"}} 1',
+            text
+        )
+        self.assertIn(
+            f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2',
+            text
+        )
+        self.assertIn(
+            f'http_request_duration_seconds_count{{{labels}}} 2', text
+        )
+        self.assertIn('# TYPE http_request_duration_seconds histogram', text)
+
+    def test_label_values_escaped(self):
+        """Test quotes in label values are escaped"""
+        metrics.cache_lookup('say "hi"', hit=True)
+
+        text = metrics.registry.exposition()
+
+        self.assertIn(
+            'cache_lookups_total{cache="say \\"hi\\"",result="hit"} 1', text
+        )
+
+    def test_workers_aggregated_through_directory(self):
+        """Test samples flushed by other workers are merged"""
+        metrics.cache_lookup('test-merge', hit=False)
+        other_worker = {
+            'cache_lookups_total': [[['test-merge', 'miss'], 2]],
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'metrics-1.json'), 'w') as f:
+                json.dump(other_worker, f)
+            with override_settings(METRICS_DIR=directory):
+                metrics.registry.flush(force=True)
+                text = metrics.registry.exposition()
+
+        self.assertIn(
+            'cache_lookups_total{cache="test-merge",result="miss"} 3', text
+        )
+
+    def test_samples_reset_after_fork(self):
+        """Test a forked worker does not report its parent's samples"""
+        registry = metrics.Registry()
+        counter = registry.register(metrics.Counter('test_total', 'Test.'))
+        counter.inc()
+        read, write = os.pipe()
+
+        pid = os.fork()
+        if pid == 0:
+            counter.inc(5)
+            os.write(write, registry.exposition().encode())
+            os._exit(0)
+        os.close(write)
+        os.waitpid(pid, 0)
+        with os.fdopen(read) as pipe:
+            child = pipe.read()
+
+        self.assertIn('test_total 5\n', child)
+        self.assertIn('test_total 1\n', registry.exposition())
+
+    def test_dead_workers_dropped(self):
+        """Test files of exited workers are removed and not merged"""
+        registry = metrics.Registry()
+        counter = registry.register(metrics.Counter('test_total', 'Test.'))
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0)
+        os.waitpid(pid, 0)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, f'metrics-{pid}.json')
+            with open(path, 'w') as f:
+                json.dump({'test_total': [[[], 2]]}, f)
+            with override_settings(METRICS_DIR=directory):
+                counter.inc()
+                text = registry.exposition()
+                registry.flush(force=True)
+                registry.remove(directory)
+
+            self.assertEqual(os.listdir(directory), [])
+        self.assertIn('test_total 1\n', text)
+
+
+class MetricsEndpointTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_requests_counted(self):
+        """Test the endpoint reports requests by view"""
+        user = get_user_model().objects.create_user(
+            'abc@gmail.com',
+            'testpass'
+        )
+        self.client.force_authenticate(user)
+        self.client.get(RECIPES_URL)
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        text = res.content.decode()
+        self.assertIn(
+            'http_requests_total{view="receipe:recipe-list",method="GET",'
+            'status="200"}',
+            text
+        )
+        self.assertIn('db_queries_per_request_bucket{view=', text)
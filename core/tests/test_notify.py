@@ -0,0 +1,59 @@
+import tempfile
+import threading
+
+from django.test import SimpleTestCase
+
+from core import notify
+
+
+class LocalNotifierTests(SimpleTestCase):
+    """Test the in-process notifications"""
+
+    def setUp(self):
+        self.notifier = notify.LocalNotifier()
+
+    def test_publish_wakes_subscriber(self):
+        """Test a waiter of the user wakes up"""
+        subscription = self.notifier.subscribe(1)
+        threading.Timer(0.05, self.notifier.publish, [1]).start()
+
+        self.assertTrue(self.notifier.wait(subscription, 5))
+
+    def test_other_user_times_out(self):
+        """Test changes of another user do not wake a waiter"""
+        subscription = self.notifier.subscribe(1)
+        self.notifier.publish(2)
+
+        self.assertFalse(self.notifier.wait(subscription, 0.05))
+
+    def test_unsubscribe(self):
+        """Test finished waiters are forgotten"""
+        subscription = self.notifier.subscribe(1)
+        self.notifier.unsubscribe(subscription)
+
+        self.assertEqual(self.notifier.waiters, {})
+
+
+class FileNotifierTests(SimpleTestCase):
+    """Test the notifications shared through a directory"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.publisher = notify.FileNotifier(directory.name)
+        self.notifier = notify.FileNotifier(directory.name, 0.01)
+
+    def test_other_process_wakes(self):
+        """Test a change published by another notifier wakes a waiter"""
+        self.publisher.publish(1)
+        subscription = self.notifier.subscribe(1)
+        threading.Timer(0.05, self.publisher.publish, [1]).start()
+
+        self.assertTrue(self.notifier.wait(subscription, 5))
+
+    def test_times_out(self):
+        """Test a waiter gives up after the timeout"""
+        subscription = self.notifier.subscribe(1)
+        self.publisher.publish(2)
+
+        self.assertFalse(self.notifier.wait(subscription, 0.05))
@@ -0,0 +1,121 @@
+import os
+import signal
+import sys
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import profiler
+
+RECIPES_URL = reverse('receipe:recipe-list')
+
+
+class ProfilerTests(TestCase):
+    """Test on-demand profiling of API views"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(PROFILER_DIR=directory.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.directory = directory.name
+        self.user = get_user_model().objects.create_user(
+            'abc@gmail.com',
+            'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_staff_header_profiles(self):
+        """Test a staff request with the header is profiled"""
+        self.user.is_staff = True
+        self.user.save()
+
+        res = self.client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+
+        profile_id = res['X-Profile-Id']
+        self.assertTrue(profile_id.endswith('-RecipeViewSet.list'))
+        self.assertEqual(
+            sorted(os.listdir(self.directory)),
+            [f'{profile_id}.collapsed', f'{profile_id}.pstats']
+        )
+
+    def test_header_ignored_for_users(self):
+        """Test other users cannot turn profiling on"""
+        res = self.client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+
+        self.assertFalse(res.has_header('X-Profile-Id'))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_unhandled_exception_stops_profile(self):
+        """Test a request failing with a 500 does not leave profiling on"""
+        self.user.is_staff = True
+        self.user.save()
+
+        with patch('receipe.views.RecipeViewSet.list',
+                   side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                self.client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+        res = self.client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+
+        self.assertIsNone(sys.getprofile())
+        self.assertTrue(res.has_header('X-Profile-Id'))
+
+    def test_one_profile_per_thread(self):
+        """Test a second profile of the same thread does not start"""
+        first = profiler.ViewProfile('first')
+        self.assertTrue(first.start())
+        try:
+            self.assertFalse(profiler.ViewProfile('second').start())
+        finally:
+            first.stop()
+
+    def test_signal_toggles_process(self):
+        """Test the signal profiles every request until sent again"""
+        sig = getattr(signal, settings.PROFILER_SIGNAL)
+        self.addCleanup(profiler._process.update, enabled=False)
+
+        with self.assertLogs('core.profiler', 'WARNING'):
+            os.kill(os.getpid(), sig)
+            profiled = self.client.get(RECIPES_URL)
+            os.kill(os.getpid(), sig)
+        plain = self.client.get(RECIPES_URL)
+
+        self.assertTrue(profiled.has_header('X-Profile-Id'))
+        self.assertFalse(plain.has_header('X-Profile-Id'))
+
+    @override_settings(PROFILER_KEEP=2)
+    def test_rotation(self):
+        """Test only the newest profiles are kept"""
+        self.user.is_staff = True
+        self.user.save()
+
+        for _ in range(3):
+            self.client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+
+        self.assertEqual(len(profiler.profiles()), 2)
+
+    def test_show_profiles(self):
+        """Test the command merges profiles of a view"""
+        self.user.is_staff = True
+        self.user.save()
+        for _ in range(2):
+            self.client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+        stats, collapsed = StringIO(), StringIO()
+
+        call_command('show_profiles', view='RecipeViewSet', stdout=stats)
+        call_command('show_profiles', view='RecipeViewSet.list',
+                     format='collapsed', stdout=collapsed)
+
+        self.assertIn('function calls', stats.getvalue())
+        for line in collapsed.getvalue().splitlines():
+            self.assertRegex(line, r'^\S.* \d+$')
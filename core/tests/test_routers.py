@@ -0,0 +1,162 @@
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connections
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import routers
+from core.middleware import ReplicaRoutingMiddleware
+from core.models import AuthToken, Recipe
+
+AUTH_HEADER = 'Token 0123456789abcdef'
+RECIPES_URL = reverse('receipe:recipe-list')
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_PIN_SECONDS=10)
+class ReplicaRoutingTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = routers.PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+        self.used = []
+
+        def get_response(request):
+            self.used.append(self.router.db_for_read(Recipe))
+            return HttpResponse()
+
+        self.middleware = ReplicaRoutingMiddleware(get_response)
+
+    def tearDown(self):
+        caches['replica_pins'].clear()
+
+    def test_reads_use_primary_outside_requests(self):
+        """Test reads outside of a request go to the primary"""
+        self.assertEqual(self.router.db_for_read(Recipe), 'default')
+
+    def test_writes_use_primary(self):
+        """Test writes always go to the primary"""
+        routers.read_from_replica(True)
+        try:
+            self.assertEqual(self.router.db_for_write(Recipe), 'default')
+        finally:
+            routers.read_from_replica(False)
+
+    def test_safe_request_reads_replica(self):
+        """Test GET requests read from a replica"""
+        self.middleware(self.factory.get('/', HTTP_AUTHORIZATION=AUTH_HEADER))
+
+        self.assertEqual(self.used, ['replica1'])
+        self.assertEqual(self.router.db_for_read(Recipe), 'default')
+
+    def test_unsafe_request_reads_primary(self):
+        """Test reads during a POST go to the primary"""
+        self.middleware(self.factory.post('/', HTTP_AUTHORIZATION=AUTH_HEADER))
+
+        self.assertEqual(self.used, ['default'])
+
+    def test_client_pinned_after_write(self):
+        """Test a client reads its own writes after a POST"""
+        self.middleware(self.factory.post('/', HTTP_AUTHORIZATION=AUTH_HEADER))
+        self.middleware(self.factory.get('/', HTTP_AUTHORIZATION=AUTH_HEADER))
+        self.middleware(self.factory.get('/', HTTP_AUTHORIZATION='Token x'))
+
+        self.assertEqual(self.used, ['default', 'default', 'replica1'])
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas_configured(self):
+        """Test everything reads the primary without replicas"""
+        self.middleware(self.factory.get('/'))
+
+        self.assertEqual(self.used, ['default'])
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_PIN_SECONDS=10)
+class ReplicaDatabaseTests(TransactionTestCase):
+    """Test routing between a primary and a replica sqlite file"""
+    databases = {'default', 'replica1'}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        connections.databases['replica1'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(cls.directory, 'replica.sqlite3'),
+        }
+        call_command('migrate', database='replica1', verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica1'].close()
+        del connections['replica1']
+        del connections.databases['replica1']
+        shutil.rmtree(cls.directory)
+
+    def setUp(self):
+        caches['replica_pins'].clear()
+        caches['throttle'].clear()
+        user = get_user_model().objects.create_user(
+            'abc@gmail.com', 'testpass'
+        )
+        token, key = AuthToken.objects.issue(user)
+        # the replica has caught up with the account but nothing later
+        get_user_model().objects.using('replica1').bulk_create([user])
+        AuthToken.objects.using('replica1').bulk_create([token])
+        self.user = user
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+
+    def test_reads_lag_behind_until_client_writes(self):
+        """Test safe reads use the replica until the client writes"""
+        Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=1
+        )
+
+        self.assertEqual(self.client.get(RECIPES_URL).data, [])
+
+        res = self.client.post(RECIPES_URL, {
+            'title': 'Stew', 'time_minutes': 5, 'price': '1.00',
+        })
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(
+            Recipe.objects.using('replica1').filter(title='Stew').exists()
+        )
+
+        titles = [
+            recipe['title']
+            for recipe in self.client.get(RECIPES_URL).data
+        ]
+        self.assertEqual(sorted(titles), ['Soup', 'Stew'])
+
+
+class ShardRouterTests(SimpleTestCase):
+    """Test migrations routed by the shard router"""
+
+    def setUp(self):
+        self.router = routers.ShardRouter()
+
+    def test_data_migrations_skip_shards(self):
+        """Test RunPython steps only run on shards when they ask to"""
+        self.assertIsNone(self.router.allow_migrate('default', 'core'))
+        self.assertFalse(self.router.allow_migrate('shard1', 'core'))
+        self.assertIsNone(
+            self.router.allow_migrate('shard1', 'core', shards=True)
+        )
+
+    def test_tables_created_on_shards(self):
+        """Test schema changes run on every database"""
+        self.assertIsNone(
+            self.router.allow_migrate('shard1', 'core', model_name='recipe')
+        )
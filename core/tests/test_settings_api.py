@@ -0,0 +1,74 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from recipe_project import settings_api
+
+# run by a child process started with the API settings module
+SERVE = '''
+import json
+from django.core.management import call_command
+from django.test import Client
+from recipe_project.wsgi_api import application  # sets up Django
+from django.contrib.auth import get_user_model
+from core.models import AuthToken
+
+call_command('check', fail_level='ERROR')
+call_command('migrate', verbosity=0)
+user = get_user_model().objects.create_user('abc@gmail.com', 'pass')
+_, key = AuthToken.objects.issue(user)
+client = Client(HTTP_HOST='localhost')
+tags = client.get('/api/recipe/tags/', HTTP_AUTHORIZATION=f'Token {key}')
+admin = client.get('/admin/')
+print(json.dumps({
+    'tags': [tags.status_code, tags['Content-Type']],
+    'admin': admin.status_code,
+}))
+'''
+
+
+class ApiProfileTests(SimpleTestCase):
+    """Test the API-only settings profile"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(
+                os.environ,
+                DJANGO_SETTINGS_MODULE='recipe_project.settings_api',
+                DB_ENGINE='sqlite',
+                DB_NAME=os.path.join(directory, 'api.sqlite3'),
+            )
+            done = subprocess.run(
+                [sys.executable, '-c', SERVE], cwd=settings.BASE_DIR,
+                env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                universal_newlines=True, timeout=120,
+            )
+        cls.served = done.returncode == 0 and json.loads(
+            done.stdout.splitlines()[-1]
+        )
+        cls.errors = done.stderr
+
+    def test_api_served(self):
+        """Test token requests work without sessions and templates"""
+        self.assertTrue(self.served, self.errors)
+        self.assertEqual(self.served['tags'], [200, 'application/json'])
+
+    def test_admin_not_served(self):
+        """Test the admin is left to the full profile"""
+        self.assertTrue(self.served, self.errors)
+        self.assertEqual(self.served['admin'], 404)
+
+    def test_unused_middleware_dropped(self):
+        """Test sessions and CSRF are not in the API middleware"""
+        self.assertNotIn(
+            'django.contrib.sessions.middleware.SessionMiddleware',
+            settings_api.MIDDLEWARE
+        )
+        self.assertNotIn('django.contrib.admin', settings_api.INSTALLED_APPS)
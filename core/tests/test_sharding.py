@@ -0,0 +1,276 @@
+import itertools
+import os
+import shutil
+import tempfile
+import threading
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connections
+from django.test import (
+    Client, SimpleTestCase, TransactionTestCase, override_settings
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import jobs, sharding
+from core.models import (
+    Recipe, RecipeBand, RecipeIngredient, ShardAssignment, Tag
+)
+
+SHARDS = ['shard1', 'shard2']
+RECIPES_URL = reverse('receipe:recipe-list')
+TAGS_URL = reverse('receipe:tag-list')
+INGREDIENTS_URL = reverse('receipe:ingredient-list')
+ME_URL = reverse('user:me')
+PUBLIC_URL = reverse('receipe:public-recipe-list')
+
+
+class HashRingTests(SimpleTestCase):
+    """Test the consistent hash ring"""
+
+    def test_keys_spread(self):
+        """Test keys are spread over all databases"""
+        ring = sharding.HashRing(['default', 'shard1', 'shard2'], 64)
+
+        placed = [ring.node(key) for key in range(3000)]
+
+        for node in ('default', 'shard1', 'shard2'):
+            self.assertGreater(placed.count(node), 600)
+
+    def test_added_database_takes_few_keys(self):
+        """Test adding a database only moves keys onto it"""
+        before = sharding.HashRing(['default', 'shard1'], 64)
+        after = sharding.HashRing(['default', 'shard1', 'shard2'], 64)
+
+        moved = [
+            key for key in range(3000) if before.node(key) != after.node(key)
+        ]
+
+        self.assertLess(len(moved), 1500)
+        self.assertEqual({after.node(key) for key in moved}, {'shard2'})
+
+
+@override_settings(
+    DATABASE_SHARDS=SHARDS, SHARD_MOVE_GRACE=0, SHARD_ID_BLOCK=10
+)
+class ShardingTests(TransactionTestCase):
+    """Test recipe data spread over several sqlite files"""
+    databases = {'default', *SHARDS}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        for alias in SHARDS:
+            connections.databases[alias] = {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': os.path.join(cls.directory, f'{alias}.sqlite3'),
+            }
+            call_command('migrate', database=alias, verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for alias in SHARDS:
+            connections[alias].close()
+            del connections[alias]
+            del connections.databases[alias]
+        shutil.rmtree(cls.directory)
+
+    def setUp(self):
+        sharding._blocks.clear()
+        self.emails = itertools.count()
+
+    def user_on(self, alias):
+        """Create users until the ring places one on alias"""
+        while True:
+            user = get_user_model().objects.create_user(
+                f'user{next(self.emails)}@gmail.com', 'testpass'
+            )
+            if sharding.ring().node(user.pk) == alias:
+                return user
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def sample_recipe(self, client):
+        """Create a recipe with a tag and an ingredient through the API"""
+        tag = client.post(TAGS_URL, {'name': 'Vegan'}).data
+        ingredient = client.post(INGREDIENTS_URL, {'name': 'Salt'}).data
+        res = client.post(RECIPES_URL, {
+            'title': 'Soup', 'time_minutes': 5, 'price': '1.00',
+            'tags': [tag['id']], 'ingredients': [ingredient['id']],
+        })
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res.data
+
+    def test_users_placed_by_ring(self):
+        """Test new users are placed by the ring, with a row on their shard"""
+        users = [self.user_on(alias) for alias in ('default', *SHARDS)]
+
+        for user in users:
+            shard = ShardAssignment.objects.get(user=user).shard
+            self.assertEqual(shard, sharding.ring().node(user.pk))
+            self.assertTrue(get_user_model().objects.using(shard).filter(
+                pk=user.pk
+            ).exists())
+
+    def test_api_uses_user_shard(self):
+        """Test a user's recipe data is written to and read from its shard"""
+        client = self.client_for(self.user_on('shard1'))
+
+        recipe = self.sample_recipe(client)
+
+        stored = Recipe.objects.using('shard1').get(pk=recipe['id'])
+        self.assertEqual(
+            list(stored.tags.values_list('id', flat=True)), recipe['tags']
+        )
+        self.assertFalse(Recipe.objects.using('default').exists())
+        self.assertFalse(Recipe.objects.using('shard2').exists())
+        self.assertEqual(client.get(RECIPES_URL).data, [recipe])
+
+    def test_ids_unique_across_shards(self):
+        """Test objects on different shards never share an id"""
+        ids = []
+        for alias in ('default', *SHARDS):
+            client = self.client_for(self.user_on(alias))
+            for name in ('Vegan', 'Dessert'):
+                ids.append(client.post(TAGS_URL, {'name': name}).data['id'])
+
+        self.assertEqual(len(set(ids)), 6)
+
+    def test_public_recipes_of_every_shard(self):
+        """Test the public list and detail read every database"""
+        caches['responses'].clear()
+        self.addCleanup(caches['responses'].clear)
+        ids = []
+        for alias in ('default', *SHARDS):
+            client = self.client_for(self.user_on(alias))
+            recipe = self.sample_recipe(client)
+            client.patch(
+                reverse('receipe:recipe-detail', args=[recipe['id']]),
+                {'is_public': True}
+            )
+            ids.append(recipe['id'])
+        anonymous = APIClient()
+
+        listed = anonymous.get(PUBLIC_URL, {'limit': 2})
+        rest = anonymous.get(PUBLIC_URL, {'limit': 2, 'offset': 2})
+        detail = anonymous.get(
+            reverse('receipe:public-recipe-detail', args=[ids[1]])
+        )
+
+        self.assertEqual(listed.data['count'], 3)
+        self.assertEqual(
+            [item['id'] for item in listed.data['results']] +
+            [item['id'] for item in rest.data['results']],
+            sorted(ids, reverse=True)
+        )
+        self.assertEqual(detail.status_code, status.HTTP_200_OK)
+        self.assertEqual(detail.data['tags'][0]['name'], 'Vegan')
+
+    def test_closed_account_hidden_from_public_list(self):
+        """Test public recipes of a closed account on a shard disappear"""
+        caches['responses'].clear()
+        self.addCleanup(caches['responses'].clear)
+        client = self.client_for(self.user_on('shard1'))
+        recipe = self.sample_recipe(client)
+        Recipe.objects.using('shard1').filter(pk=recipe['id']).update(
+            is_public=True
+        )
+
+        client.delete(ME_URL)
+
+        self.assertEqual(APIClient().get(PUBLIC_URL).data['count'], 0)
+
+    def test_admin_reaches_shards(self):
+        """Test staff can list and edit recipe data of any database"""
+        recipe = self.sample_recipe(self.client_for(self.user_on('shard2')))
+        staff = get_user_model().objects.create_superuser(
+            'admin@gmail.com', 'testpass'
+        )
+        client = Client()
+        client.force_login(staff)
+        changelist = reverse('admin:core_recipe_changelist')
+        change = reverse('admin:core_recipe_change', args=[recipe['id']])
+
+        default = client.get(changelist)
+        listed = client.get(changelist, {'db': 'shard2'})
+        page = client.get(change)
+
+        self.assertNotContains(default, f'/{recipe["id"]}/change/')
+        self.assertContains(listed, f'/{recipe["id"]}/change/')
+        self.assertContains(page, 'Soup')
+
+    def test_writes_refused_while_moving(self):
+        """Test a moving user can read but not write"""
+        user = self.user_on('shard1')
+        client = self.client_for(user)
+        ShardAssignment.objects.filter(user=user).update(moving=True)
+
+        refused = client.post(TAGS_URL, {'name': 'Vegan'})
+        read = client.get(TAGS_URL)
+
+        self.assertEqual(
+            refused.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+        self.assertIn('Retry-After', refused)
+        self.assertEqual(read.status_code, status.HTTP_200_OK)
+
+    def test_rebalance_after_adding_shard(self):
+        """Test adding a shard moves a user's data there, ids unchanged"""
+        ring = sharding.ring()
+        with self.settings(DATABASE_SHARDS=['shard1']):
+            user = self.user_on('shard1')
+            while ring.node(user.pk) != 'shard2':
+                user = self.user_on('shard1')
+            client = self.client_for(user)
+            recipe = self.sample_recipe(client)
+        self.assertEqual(sharding.shard_of(user.pk), 'shard1')
+        # a tag, an ingredient, the recipe, its two links and its bands
+        rows = 5 + RecipeBand.objects.using('shard1').count()
+
+        dry_run = StringIO()
+        call_command(
+            'rebalance_shards', user=[user.pk], dry_run=True, stdout=dry_run
+        )
+        self.assertEqual(sharding.shard_of(user.pk), 'shard1')
+        out = StringIO()
+        call_command('rebalance_shards', user=[user.pk], stdout=out)
+
+        self.assertEqual(dry_run.getvalue(), 'Would move 1 users\n')
+        self.assertEqual(out.getvalue(), f'Moved 1 users, {rows} rows\n')
+        self.assertEqual(
+            sharding.placement(user.pk), ('shard2', False)
+        )
+        self.assertEqual(client.get(RECIPES_URL).data, [recipe])
+        self.assertTrue(RecipeIngredient.objects.using('shard2').filter(
+            recipe_id=recipe['id'], ingredient_id=recipe['ingredients'][0]
+        ).exists())
+        self.assertTrue(RecipeBand.objects.using('shard2').exists())
+        for model in (Recipe, Tag, RecipeIngredient, RecipeBand):
+            self.assertFalse(model._base_manager.using('shard1').exists())
+        self.assertFalse(get_user_model().objects.using('shard1').filter(
+            pk=user.pk
+        ).exists())
+
+    def test_purge_user_on_shard(self):
+        """Test closing an account purges its rows on its shard"""
+        user = self.user_on('shard2')
+        client = self.client_for(user)
+        self.sample_recipe(client)
+
+        client.delete(ME_URL)
+        jobs.work('test', threading.Event(), batch=10, once=True)
+
+        self.assertFalse(Recipe.all_objects.using('shard2').exists())
+        self.assertFalse(Tag.objects.using('shard2').exists())
+        self.assertFalse(get_user_model().objects.using('shard2').exists())
+        self.assertFalse(ShardAssignment.objects.exists())
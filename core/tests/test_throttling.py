@@ -0,0 +1,157 @@
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import throttling
+from core.models import Recipe
+
+RECIPES_URL = reverse('receipe:recipe-list')
+
+
+class LocalBucketsTests(SimpleTestCase):
+    """Test the in-process token buckets"""
+
+    def setUp(self):
+        self.now = 100.0
+        self.buckets = throttling.LocalBuckets()
+        self.buckets.timer = lambda: self.now
+
+    def test_burst_then_wait(self):
+        """Test a bucket allows its burst then asks to wait for a refill"""
+        waits = [self.buckets.take('key', 3, 0.5) for _ in range(4)]
+
+        self.assertEqual(waits, [0, 0, 0, 2.0])
+
+    def test_refill(self):
+        """Test spent tokens come back at the refill rate"""
+        for _ in range(3):
+            self.buckets.take('key', 3, 0.5)
+
+        self.now += 2
+        self.assertEqual(self.buckets.take('key', 3, 0.5), 0)
+        self.assertGreater(self.buckets.take('key', 3, 0.5), 0)
+
+    def test_keys_independent(self):
+        """Test clients do not share buckets"""
+        self.buckets.take('first', 1, 1)
+
+        self.assertEqual(self.buckets.take('second', 1, 1), 0)
+
+    def test_refilled_buckets_evicted_first(self):
+        """Test many new clients do not reset a throttled one"""
+        self.buckets.max_buckets = 4
+        self.buckets.take('throttled', 1, 0.01)
+        for key in ('first', 'second', 'third'):
+            self.buckets.take(key, 2, 1)
+
+        self.now += 1
+        self.buckets.take('fourth', 2, 1)
+
+        self.assertEqual(set(self.buckets.buckets), {'throttled', 'fourth'})
+        self.assertGreater(self.buckets.take('throttled', 1, 0.01), 0)
+
+    def test_least_recently_used_evicted(self):
+        """Test the least recently used bucket goes when none refilled"""
+        self.buckets.max_buckets = 3
+        for key in ('first', 'second', 'third'):
+            self.buckets.take(key, 1, 0.01)
+        self.buckets.take('first', 1, 0.01)
+
+        self.buckets.take('fourth', 1, 0.01)
+
+        self.assertEqual(
+            list(self.buckets.buckets), ['third', 'first', 'fourth']
+        )
+
+
+class CacheBucketsTests(SimpleTestCase):
+    """Test token buckets kept in a cache"""
+
+    def test_clients_share_buckets(self):
+        """Test two cache clients of one backend spend the same bucket"""
+        with tempfile.TemporaryDirectory() as directory:
+            first = throttling.CacheBuckets(FileBasedCache(directory, {}))
+            second = throttling.CacheBuckets(FileBasedCache(directory, {}))
+
+            self.assertEqual(first.take('key', 1, 0.5), 0)
+            self.assertGreater(second.take('key', 1, 0.5), 0)
+
+
+@override_settings(THROTTLE_BUCKETS={
+    'read': (2, 0.01), 'write': (1, 0.01), 'upload': (1, 0.01),
+})
+class TokenBucketThrottleApiTests(TestCase):
+    """Test the token bucket throttle on the API"""
+
+    def setUp(self):
+        throttling.BACKENDS['local'].clear()
+        caches['throttle'].clear()
+        # drained buckets would throttle the tests that run next
+        self.addCleanup(throttling.BACKENDS['local'].clear)
+        self.addCleanup(caches['throttle'].clear)
+        self.user = get_user_model().objects.create_user(
+            'abc@gmail.com',
+            'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_reads_throttled_with_retry_after(self):
+        """Test a drained bucket answers 429 with Retry-After"""
+        before = throttling.THROTTLED.samples.get(('read',), 0)
+        for _ in range(2):
+            res = self.client.get(RECIPES_URL)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '100')
+        self.assertEqual(throttling.THROTTLED.samples[('read',)], before + 1)
+
+    def test_classes_and_users_separate(self):
+        """Test writes and other users have their own buckets"""
+        for _ in range(3):
+            self.client.get(RECIPES_URL)
+
+        res = self.client.post(RECIPES_URL, {
+            'title': 'Soup', 'time_minutes': 5, 'price': 1,
+        })
+        other = APIClient()
+        other.force_authenticate(
+            get_user_model().objects.create_user('x@gmail.com', 'pass')
+        )
+        other_res = other.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(other_res.status_code, status.HTTP_200_OK)
+
+    def test_upload_class(self):
+        """Test image uploads use the upload bucket"""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=1
+        )
+        url = reverse('receipe:recipe-upload-image', args=[recipe.id])
+
+        self.client.post(url, {'image': 'x'})
+        res = self.client.post(url, {'image': 'x'})
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(THROTTLE_BACKEND='cache')
+    def test_cache_backend(self):
+        """Test buckets can be shared through the cache"""
+        for _ in range(2):
+            self.client.get(RECIPES_URL)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertFalse(throttling.BACKENDS['local'].buckets)
@@ -0,0 +1,135 @@
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+from core import metrics
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+THROTTLED = metrics.registry.register(metrics.Counter(
+    'throttled_requests_total',
+    'Requests rejected by the token bucket throttle by endpoint class.',
+    ('scope',),
+))
+
+
+class LocalBuckets:
+    """Token buckets in the memory of this process
+
+    A bucket is a (tokens, timestamp, time it is full again) tuple replaced
+    whole, which the GIL keeps consistent without a lock. Two threads
+    racing on one bucket can at worst both spend the same token.
+    """
+    # past this many clients refilled buckets are dropped, they behave
+    # like missing ones, then the least recently used
+    max_buckets = 100000
+    timer = staticmethod(time.monotonic)
+
+    def __init__(self):
+        self.buckets = {}
+
+    def take(self, key, burst, rate):
+        """Spend a token, return 0 or the seconds until one is available"""
+        now = self.timer()
+        # buckets are inserted again on every use, so the dict stays in
+        # least recently used order
+        tokens, stamp, _ = self.buckets.pop(key, (burst, now, now))
+        tokens = min(burst, tokens + (now - stamp) * rate)
+        wait = 0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        # the third item is when the bucket is full again
+        self.buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+        if len(self.buckets) > self.max_buckets:
+            self.evict(now)
+        return wait
+
+    def evict(self, now):
+        """Drop refilled buckets, then the least recently used ones"""
+        for key, (_, _, full) in list(self.buckets.items()):
+            if full <= now:
+                self.buckets.pop(key, None)
+        excess = len(self.buckets) - self.max_buckets
+        if excess > 0:
+            # leave some room so the next clients do not evict again
+            excess += self.max_buckets // 10
+            for key in list(self.buckets)[:excess]:
+                self.buckets.pop(key, None)
+
+    def clear(self):
+        self.buckets.clear()
+
+
+class CacheBuckets(LocalBuckets):
+    """Token buckets kept in a Django cache
+
+    Processes share them when the cache is a shared backend such as
+    memcached, not with the local memory cache. The read and write of a
+    bucket are not atomic, concurrent requests of one client can spend the
+    same token.
+    """
+    timer = staticmethod(time.time)
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def take(self, key, burst, rate):
+        now = self.timer()
+        key = f'bucket:{key}'
+        tokens, stamp = self.cache.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - stamp) * rate)
+        # an untouched bucket refills within this time and can expire
+        timeout = math.ceil(burst / rate)
+        if tokens >= 1:
+            self.cache.set(key, (tokens - 1, now), timeout)
+            return 0
+        self.cache.set(key, (tokens, now), timeout)
+        return (1 - tokens) / rate
+
+    def clear(self):
+        self.cache.clear()
+
+
+BACKENDS = {
+    'local': LocalBuckets(),
+    'cache': CacheBuckets(caches['throttle']),
+}
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Token bucket per user, or client IP when anonymous, and endpoint class
+
+    Views pick their class with a `throttle_scope` attribute, otherwise
+    safe methods are reads and the rest writes. The (burst, tokens per
+    second) of each class come from settings.THROTTLE_BUCKETS.
+    """
+    wait_seconds = None
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None) or (
+            'read' if request.method in SAFE_METHODS else 'write'
+        )
+        limit = settings.THROTTLE_BUCKETS.get(scope)
+        if limit is None:
+            return True
+
+        user = request.user
+        if user is not None and user.is_authenticated:
+            ident = f'user-{user.pk}'
+        else:
+            ident = self.get_ident(request)
+        self.wait_seconds = BACKENDS[settings.THROTTLE_BACKEND].take(
+            f'{scope}:{ident}', *limit
+        )
+        if self.wait_seconds:
+            THROTTLED.inc(scope=scope)
+            return False
+        return True
+
+    def wait(self):
+        return self.wait_seconds
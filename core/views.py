@@ -0,0 +1,24 @@
+from django.db import DatabaseError, connection
+from django.http import HttpResponse, JsonResponse
+
+from core import metrics
+
+
+def metrics_view(request):
+    """Expose the metrics of all workers in the text exposition format"""
+    metrics.registry.flush(force=True)
+    return HttpResponse(
+        metrics.registry.exposition(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
+def health_view(request):
+    """Report if the process can reach its database"""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except DatabaseError:
+        return JsonResponse({'status': 'unavailable'}, status=503)
+
+    return JsonResponse({'status': 'ok'})
@@ -1,6 +1,7 @@
+from django.conf import settings
 from rest_framework import serializers
 
-from core.models import Tag, Ingredient, Recipe
+from core.models import Tag, Ingredient, Recipe, RecipeIngredient
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -21,30 +22,73 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
+class LinkedIdsField(serializers.ManyRelatedField):
+    """Ids of a many to many relation, read from their copy on the row"""
+
+    def __init__(self, copy, queryset, **kwargs):
+        self.copy = copy
+        super().__init__(
+            child_relation=serializers.PrimaryKeyRelatedField(
+                queryset=queryset
+            ),
+            **kwargs
+        )
+
+    def get_attribute(self, instance):
+        return getattr(instance, self.copy)
+
+    def to_representation(self, ids):
+        return list(ids)
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     """Serialize a recipe"""
-    ingredients = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=Ingredient.objects.all()
-    )
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=Tag.objects.all()
-    )
+    ingredients = LinkedIdsField('ingredient_ids', Ingredient.objects.all())
+    tags = LinkedIdsField('tag_ids', Tag.objects.all())
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'title', 'ingredients', 'tags',
-            'time_minutes', 'price', 'link'
+            'time_minutes', 'price', 'link', 'is_public'
         )
         read_only_fields = ('id',)
 
 
+class RecipeIngredientSerializer(serializers.ModelSerializer):
+    """Serialize the quantity of an ingredient in a recipe"""
+    ingredient = serializers.PrimaryKeyRelatedField(
+        queryset=Ingredient.objects.all()
+    )
+
+    class Meta:
+        model = RecipeIngredient
+        fields = ('ingredient', 'quantity', 'unit')
+
+    def get_fields(self):
+        """Only accept ingredients of the requesting user"""
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is not None:
+            # anonymous readers of public recipes have no pk, and no choices
+            fields['ingredient'].queryset = Ingredient.objects.filter(
+                user_id=request.user.pk
+            )
+        return fields
+
+
 class RecipeDetailSerializer(RecipeSerializer):
     """Serialize a recipe detail"""
     ingredients = IngredientSerializer(many=True, read_only=True)
     tags = TagSerializer(many=True, read_only=True)
+    quantities = RecipeIngredientSerializer(
+        source='recipeingredient_set',
+        many=True,
+        read_only=True
+    )
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ('quantities',)
 
 
 class RecipeImageSerializer(serializers.ModelSerializer):
@@ -54,3 +98,40 @@ class RecipeImageSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = ('id', 'image')
         read_only_fields = ('id',)
+
+
+class PantrySerializer(serializers.Serializer):
+    """Serializer for the ingredients a user has at hand"""
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(),
+        min_length=1,
+        max_length=settings.PANTRY_MAX_INGREDIENTS
+    )
+    max_missing = serializers.IntegerField(min_value=0, default=0)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+
+class RecipePortionSerializer(serializers.Serializer):
+    """Serializer for a recipe and how many times it is made"""
+    id = serializers.IntegerField()
+    multiplier = serializers.DecimalField(
+        max_digits=6,
+        decimal_places=2,
+        min_value=0,
+        default=1
+    )
+
+
+class ShoppingListSerializer(serializers.Serializer):
+    """Serializer for the recipes a shopping list is made for"""
+    recipes = RecipePortionSerializer(many=True)
+
+    def validate_recipes(self, value):
+        """Check the list is not empty and not too long"""
+        if not value:
+            raise serializers.ValidationError('Pick at least one recipe.')
+        if len(value) > settings.SHOPPING_LIST_MAX_RECIPES:
+            raise serializers.ValidationError(
+                f'Pick at most {settings.SHOPPING_LIST_MAX_RECIPES} recipes.'
+            )
+        return value
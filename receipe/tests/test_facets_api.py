@@ -0,0 +1,151 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import facets
+from core.models import FacetCount, Ingredient, Recipe, Tag
+
+FACETS_URL = reverse('receipe:recipe-facets')
+
+
+def sample_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'sample recipe',
+        'time_minutes': 10,
+        'price': 7.00
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class FacetsApiTests(TestCase):
+    """Test the maintained recipe facet counters"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'abc@gmail.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.dessert = Tag.objects.create(user=self.user, name='Dessert')
+        self.salt = Ingredient.objects.create(user=self.user, name='Salt')
+
+    def counters(self):
+        """Return the user's counters as (facet, value, count) rows"""
+        return sorted(FacetCount.objects.filter(
+            user=self.user, count__gt=0
+        ).values_list('facet', 'value', 'count'))
+
+    def rebuilt(self):
+        """Return the counters a full rebuild produces"""
+        facets.rebuild([self.user.id])
+        return self.counters()
+
+    def test_counts_tags_ingredients_and_buckets(self):
+        """Test the endpoint returns counts for the user's recipes"""
+        soup = sample_recipe(self.user, price=3, time_minutes=20)
+        soup.tags.add(self.vegan)
+        soup.ingredients.add(self.salt)
+        cake = sample_recipe(self.user, price=12.5, time_minutes=50)
+        cake.tags.add(self.vegan, self.dessert)
+        other = get_user_model().objects.create_user('x@gmail.com', 'pass')
+        sample_recipe(other)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(FACETS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['count'], 2)
+        self.assertEqual(res.data['tags'], [
+            {'id': self.vegan.id, 'count': 2},
+            {'id': self.dessert.id, 'count': 1},
+        ])
+        self.assertEqual(res.data['ingredients'],
+                         [{'id': self.salt.id, 'count': 1}])
+        self.assertEqual(res.data['price'], [
+            {'min': 0, 'max': 5, 'count': 1},
+            {'min': 10, 'max': 15, 'count': 1},
+        ])
+        self.assertEqual(res.data['time_minutes'], [
+            {'min': 15, 'max': 30, 'count': 1},
+            {'min': 45, 'max': 60, 'count': 1},
+        ])
+
+    def test_filtered_facets(self):
+        """Test facets narrow to the recipes matching the filters"""
+        soup = sample_recipe(self.user)
+        soup.tags.add(self.vegan)
+        soup.ingredients.add(self.salt)
+        cake = sample_recipe(self.user)
+        cake.tags.add(self.vegan, self.dessert)
+
+        res = self.client.get(FACETS_URL, {'tags': f'{self.dessert.id}'})
+
+        self.assertEqual(res.data['count'], 1)
+        self.assertEqual(res.data['tags'], [
+            {'id': self.vegan.id, 'count': 1},
+            {'id': self.dessert.id, 'count': 1},
+        ])
+        self.assertEqual(res.data['ingredients'], [])
+
+    def test_counters_follow_changes(self):
+        """Test removals, edits and deletes keep counters consistent"""
+        soup = sample_recipe(self.user, price=3)
+        soup.tags.add(self.vegan, self.dessert)
+        soup.tags.remove(self.dessert, self.dessert)
+        self.salt.recipe_set.add(soup)
+        cake = sample_recipe(self.user)
+        cake.tags.set([self.dessert])
+        self.assertEqual(self.counters(), self.rebuilt())
+
+        soup = Recipe.objects.get(id=soup.id)
+        soup.price = 22
+        soup.save()
+        soup.tags.clear()
+        self.vegan.recipe_set.add(cake)
+        self.assertEqual(self.counters(), self.rebuilt())
+
+        cake.delete()
+        self.dessert.delete()
+        self.salt.recipe_set.clear()
+        self.assertEqual(self.counters(), self.rebuilt())
+        self.assertIn((FacetCount.PRICE, 20, 1), self.counters())
+
+    def test_loading_recipes_reads_nothing_more(self):
+        """Test loading recipes or saving other fields skips the counters"""
+        sample_recipe(self.user)
+
+        with self.assertNumQueries(1):
+            soup = Recipe.objects.get()
+        soup.title = 'Soup'
+        with CaptureQueriesContext(connection) as queries:
+            soup.save(update_fields=['title'])
+
+        self.assertFalse([
+            query['sql'] for query in queries.captured_queries
+            if 'facetcount' in query['sql'] or
+            query['sql'].startswith('SELECT "core_recipe"')
+        ])
+
+    def test_rebuild_command(self):
+        """Test the command recomputes drifted counters"""
+        soup = sample_recipe(self.user)
+        soup.tags.add(self.vegan)
+        expected = self.counters()
+        FacetCount.objects.all().delete()
+
+        call_command('rebuild_facets', batch_size=1, stdout=StringIO())
+
+        self.assertEqual(self.counters(), expected)
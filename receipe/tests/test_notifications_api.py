@@ -0,0 +1,126 @@
+import asyncio
+import threading
+
+from django.contrib.auth import get_user_model
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.asgi import WsgiToAsgi
+from core.models import AuthToken, Tag
+
+NOTIFICATIONS_URL = reverse('receipe:notifications')
+SYNC_URL = reverse('receipe:sync')
+
+
+class NotificationsApiTests(TestCase):
+    """Test the change notifications endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'abc@gmail.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_changed_since_cursor(self):
+        """Test an outdated cursor is answered at once"""
+        cursor = self.client.get(SYNC_URL).data['cursor']
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.get(NOTIFICATIONS_URL, {'since': cursor})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.data['changed'])
+        self.assertEqual(res.data['cursor'], cursor + 1)
+
+    def test_timeout(self):
+        """Test the wait ends without a change after the timeout"""
+        cursor = self.client.get(SYNC_URL).data['cursor']
+
+        res = self.client.get(
+            NOTIFICATIONS_URL, {'since': cursor, 'timeout': 0.01}
+        )
+
+        self.assertEqual(res.data, {'cursor': cursor, 'changed': False})
+
+    def test_invalid_timeout(self):
+        """Test a timeout that is not a number is rejected"""
+        res = self.client.get(NOTIFICATIONS_URL, {'timeout': 'abc'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class NotificationsWakeTests(TransactionTestCase):
+    """Test a waiting request returns on a change"""
+
+    def test_change_wakes_request(self):
+        """Test a change committed by another thread ends the wait"""
+        user = get_user_model().objects.create_user('abc@gmail.com', 'pass')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        def change():
+            Tag.objects.create(user=user, name='Vegan')
+            connection.close()
+
+        threading.Timer(0.2, change).start()
+        res = client.get(NOTIFICATIONS_URL, {'timeout': 10})
+
+        self.assertTrue(res.data['changed'])
+
+
+@override_settings(NOTIFY_MAX_WAITERS=1)
+class NotificationsWaitersTests(TransactionTestCase):
+    """Test waiting requests leave threads for other requests"""
+
+    def test_other_requests_served_while_waiting(self):
+        """Test a full set of waiters neither blocks nor queues requests"""
+        user = get_user_model().objects.create_user('abc@gmail.com', 'pass')
+        _, key = AuthToken.objects.issue(user)
+        application = WsgiToAsgi(get_wsgi_application(), max_workers=2)
+        finished = []
+
+        async def get(name, path, query_string=b''):
+            sent = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b''}
+
+            async def send(message):
+                sent.append(message)
+
+            await application({
+                'type': 'http', 'method': 'GET', 'path': path,
+                'query_string': query_string, 'server': ('testserver', 80),
+                'headers': [(b'authorization', f'Token {key}'.encode())],
+            }, receive, send)
+            finished.append((name, sent[0]['status']))
+
+        async def requests():
+            waiter = asyncio.ensure_future(
+                get('waiter', NOTIFICATIONS_URL, b'timeout=1')
+            )
+            await asyncio.sleep(0.2)
+            await asyncio.gather(
+                get('second waiter', NOTIFICATIONS_URL, b'timeout=1'),
+                get('sync', SYNC_URL),
+            )
+            await waiter
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(requests())
+        finally:
+            loop.close()
+
+        self.assertEqual(sorted(finished[:2]), [
+            ('second waiter', status.HTTP_429_TOO_MANY_REQUESTS),
+            ('sync', status.HTTP_200_OK),
+        ])
+        self.assertEqual(finished[2], ('waiter', status.HTTP_200_OK))
@@ -0,0 +1,92 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe
+
+PANTRY_URL = reverse('receipe:recipe-pantry')
+
+
+def sample_recipe(user, ingredients=(), **params):
+    """Create and return a sample recipe using the ingredients"""
+    defaults = {
+        'title': 'sample recipe',
+        'time_minutes': 10,
+        'price': 5.00
+    }
+    defaults.update(params)
+    recipe = Recipe.objects.create(user=user, **defaults)
+    recipe.ingredients.add(*ingredients)
+
+    return recipe
+
+
+class PantryApiTests(TestCase):
+    """Test matching recipes against the ingredients at hand"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'abc@gmail.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.eggs, self.flour, self.milk, self.salt = (
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ('Eggs', 'Flour', 'Milk', 'Salt')
+        )
+
+    def test_ranks_by_missing_ingredients(self):
+        """Test recipes come back fewest missing ingredients first"""
+        pancakes = sample_recipe(
+            self.user, (self.eggs, self.flour, self.milk)
+        )
+        omelette = sample_recipe(self.user, (self.eggs, self.salt))
+        bread = sample_recipe(self.user, (self.flour, self.salt))
+        sample_recipe(self.user, (self.milk,))
+        other = get_user_model().objects.create_user('x@gmail.com', 'pass')
+        sample_recipe(other, (self.eggs,))
+
+        res = self.client.post(PANTRY_URL, {
+            'ingredients': [self.eggs.id, self.flour.id, self.salt.id],
+            'max_missing': 1,
+        }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in res.data],
+                         [omelette.id, bread.id, pancakes.id])
+        self.assertEqual(res.data[0]['missing_ingredients'], [])
+        self.assertEqual(res.data[2]['missing_ingredients'], [self.milk.id])
+
+    def test_only_complete_recipes_by_default(self):
+        """Test recipes missing an ingredient are left out by default"""
+        omelette = sample_recipe(self.user, (self.eggs, self.salt))
+        sample_recipe(self.user, (self.eggs, self.milk))
+
+        res = self.client.post(PANTRY_URL, {
+            'ingredients': [self.eggs.id, self.salt.id],
+        }, format='json')
+
+        self.assertEqual([item['id'] for item in res.data], [omelette.id])
+
+    def test_query_count_independent_of_matches(self):
+        """Test the ranking is not computed per recipe"""
+        for _ in range(5):
+            sample_recipe(self.user, (self.eggs, self.flour))
+        payload = {'ingredients': [self.eggs.id], 'max_missing': 1}
+
+        # ranking, recipes with their tag and ingredient ids, missing ones
+        with self.assertNumQueries(3):
+            res = self.client.post(PANTRY_URL, payload, format='json')
+
+        self.assertEqual(len(res.data), 5)
+
+    def test_empty_pantry_rejected(self):
+        """Test a pantry needs at least one ingredient"""
+        res = self.client.post(PANTRY_URL, {'ingredients': []},
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,158 @@
+from django.contrib.auth import get_user_model
+from unittest.mock import patch
+
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import response_cache
+from core.models import Ingredient, Recipe, Tag
+from receipe.views import PublicRecipeViewSet
+
+PUBLIC_URL = reverse('receipe:public-recipe-list')
+
+
+def public_url(recipe_id):
+    """Return the public detail url of a recipe"""
+    return reverse('receipe:public-recipe-detail', args=[recipe_id])
+
+
+def sample_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'sample recipe',
+        'time_minutes': 10,
+        'price': 5.00
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class PublicRecipeApiTests(TestCase):
+    """Test anonymous access to public recipes"""
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'abc@gmail.com',
+            'testpass'
+        )
+        self.recipe = sample_recipe(self.user, is_public=True)
+
+    def test_public_recipe_readable_anonymously(self):
+        """Test public recipes are served with shared cache headers"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe.tags.add(tag)
+
+        res = self.client.get(public_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['title'], self.recipe.title)
+        self.assertIn('public', res['Cache-Control'])
+        self.assertEqual(res['Surrogate-Key'],
+                         f'recipe-{self.recipe.id} tag-{tag.id}')
+
+    def test_public_detail_shows_quantities(self):
+        """Test anonymous readers see a recipe's ingredient quantities"""
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        self.recipe.ingredients.add(salt, through_defaults={'unit': 'g'})
+
+        res = self.client.get(public_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['quantities'][0]['ingredient'], salt.id)
+
+    def test_private_recipe_hidden(self):
+        """Test private recipes are not served"""
+        private = sample_recipe(self.user)
+
+        res = self.client.get(public_url(private.id))
+        listed = self.client.get(PUBLIC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual([item['id'] for item in listed.data['results']],
+                         [self.recipe.id])
+
+    def test_repeat_served_from_cache(self):
+        """Test a repeated request does not reach the database"""
+        self.client.get(public_url(self.recipe.id))
+        other = APIClient()
+
+        with self.assertNumQueries(0):
+            res = other.get(public_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('public', res['Cache-Control'])
+
+    def test_purged_while_rendering_not_stored(self):
+        """Test a response rendered across a purge is not cached"""
+        keys = PublicRecipeViewSet.surrogate_keys
+
+        def purge_first(view, data):
+            response_cache.purge(response_cache.recipe_key(self.recipe.id))
+            return keys(view, data)
+
+        with patch.object(PublicRecipeViewSet, 'surrogate_keys', purge_first):
+            self.client.get(public_url(self.recipe.id))
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(public_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(queries.captured_queries)
+
+    def test_edit_purges_cached_recipe(self):
+        """Test owner edits are visible at once"""
+        self.client.get(public_url(self.recipe.id))
+        self.client.get(PUBLIC_URL)
+        owner = APIClient()
+        owner.force_authenticate(self.user)
+
+        owner.patch(reverse('receipe:recipe-detail', args=[self.recipe.id]),
+                    {'title': 'Renamed'})
+        res = self.client.get(public_url(self.recipe.id))
+        listed = self.client.get(PUBLIC_URL)
+
+        self.assertEqual(res.data['title'], 'Renamed')
+        self.assertEqual(listed.data['results'][0]['title'], 'Renamed')
+
+    def test_publishing_purges_list(self):
+        """Test a newly public recipe appears in the cached list"""
+        self.client.get(PUBLIC_URL)
+        recipe = sample_recipe(self.user, title='Later')
+
+        recipe.is_public = True
+        recipe.save()
+        listed = self.client.get(PUBLIC_URL)
+
+        self.assertEqual(listed.data['count'], 2)
+
+    def test_unpublishing_purges_list(self):
+        """Test a recipe made private leaves the cached list"""
+        self.client.get(PUBLIC_URL)
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        self.assertNotIn('_was_public', recipe.__dict__)
+
+        recipe.is_public = False
+        recipe.save()
+        listed = self.client.get(PUBLIC_URL)
+
+        self.assertEqual(listed.data['count'], 0)
+
+    def test_tag_rename_purges_detail(self):
+        """Test renaming a tag purges recipes showing it"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe.tags.add(tag)
+        self.client.get(public_url(self.recipe.id))
+
+        tag.name = 'Plant based'
+        tag.save()
+        res = self.client.get(public_url(self.recipe.id))
+
+        self.assertEqual(res.data['tags'][0]['name'], 'Plant based')
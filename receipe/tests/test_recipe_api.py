@@ -10,7 +10,7 @@ from django.test import TestCase
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Recipe, Tag, Ingredient
+from core.models import Job, Recipe, Tag, Ingredient
 from receipe.serializers import RecipeSerializer, RecipeDetailSerializer
 
 RECIPES_URL = reverse('receipe:recipe-list')
@@ -229,6 +229,10 @@ class RecipeImageUploadTest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertIn('image', res.data)
         self.assertTrue(os.path.exists(self.recipe.image.path))
+        self.assertTrue(Job.objects.filter(
+            task='process_recipe_image',
+            payload__contains=str(self.recipe.id)
+        ).exists())
 
     def test_upload_bad_image_request(self):
         """Test uploading invalid image failed"""
@@ -0,0 +1,134 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, RecipeIngredient
+
+SHOPPING_LIST_URL = reverse('receipe:recipe-shopping-list')
+
+
+def quantities_url(recipe_id):
+    """Return the ingredient quantities url of a recipe"""
+    return reverse('receipe:recipe-quantities', args=[recipe_id])
+
+
+def sample_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'sample recipe',
+        'time_minutes': 10,
+        'price': 5.00
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class ShoppingListApiTests(TestCase):
+    """Test ingredient quantities and shopping lists"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'abc@gmail.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.flour = Ingredient.objects.create(user=self.user, name='Flour')
+        self.milk = Ingredient.objects.create(user=self.user, name='Milk')
+        self.salt = Ingredient.objects.create(user=self.user, name='Salt')
+
+    def test_set_quantities(self):
+        """Test quantities update links and add missing ingredients"""
+        recipe = sample_recipe(self.user)
+        recipe.ingredients.add(self.flour)
+
+        res = self.client.put(quantities_url(recipe.id), [
+            {'ingredient': self.flour.id, 'quantity': '0.5', 'unit': 'kg'},
+            {'ingredient': self.milk.id, 'quantity': '2', 'unit': 'cup'},
+        ], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 2)
+        flour = RecipeIngredient.objects.get(recipe=recipe,
+                                             ingredient=self.flour)
+        self.assertEqual(str(flour.quantity), '0.500')
+        self.assertEqual(flour.unit, 'kg')
+        self.assertIn(self.milk, recipe.ingredients.all())
+
+    def test_set_quantities_foreign_ingredient(self):
+        """Test ingredients of another user are rejected"""
+        recipe = sample_recipe(self.user)
+        other = get_user_model().objects.create_user(
+            'other@gmail.com', 'testpass'
+        )
+        pepper = Ingredient.objects.create(user=other, name='Pepper')
+
+        res = self.client.put(quantities_url(recipe.id), [
+            {'ingredient': pepper.id, 'quantity': '1', 'unit': 'g'},
+        ], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(recipe.ingredients.exists())
+
+    def test_shopping_list_sums_scaled_quantities(self):
+        """Test quantities are normalised, scaled and summed"""
+        bread = sample_recipe(self.user)
+        bread.ingredients.add(self.flour, through_defaults={
+            'quantity': '0.5', 'unit': 'kg'
+        })
+        bread.ingredients.add(self.salt)
+        pancakes = sample_recipe(self.user)
+        pancakes.ingredients.add(self.flour, through_defaults={
+            'quantity': 200, 'unit': 'g'
+        })
+        pancakes.ingredients.add(self.milk, through_defaults={
+            'quantity': '0.25', 'unit': 'l'
+        })
+        other = get_user_model().objects.create_user('x@gmail.com', 'pass')
+        stranger = sample_recipe(other)
+        stranger.ingredients.add(self.flour, through_defaults={
+            'quantity': 1, 'unit': 'kg'
+        })
+
+        with self.assertNumQueries(1):
+            res = self.client.post(SHOPPING_LIST_URL, {'recipes': [
+                {'id': bread.id, 'multiplier': 2},
+                {'id': pancakes.id},
+                {'id': pancakes.id, 'multiplier': '0.5'},
+                {'id': stranger.id},
+            ]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'ingredient': self.flour.id, 'name': 'Flour',
+             'quantity': '1300.000', 'unit': 'g'},
+            {'ingredient': self.milk.id, 'name': 'Milk',
+             'quantity': '375.000', 'unit': 'ml'},
+            {'ingredient': self.salt.id, 'name': 'Salt',
+             'quantity': None, 'unit': ''},
+        ])
+
+    def test_detail_shows_quantities(self):
+        """Test the recipe detail lists ingredient quantities"""
+        recipe = sample_recipe(self.user)
+        recipe.ingredients.add(self.milk, through_defaults={
+            'quantity': 1, 'unit': 'l'
+        })
+
+        res = self.client.get(reverse('receipe:recipe-detail',
+                                      args=[recipe.id]))
+
+        self.assertEqual(res.data['quantities'], [
+            {'ingredient': self.milk.id, 'quantity': '1.000', 'unit': 'l'}
+        ])
+
+    def test_empty_shopping_list_rejected(self):
+        """Test a shopping list needs a recipe"""
+        res = self.client.post(SHOPPING_LIST_URL, {'recipes': []},
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,129 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, RecipeBand, Tag
+
+
+def similar_url(recipe_id):
+    """Return the similar recipes url of a recipe"""
+    return reverse('receipe:recipe-similar', args=[recipe_id])
+
+
+def sample_recipe(user, tags=(), ingredients=(), **params):
+    """Create and return a sample recipe with the given links"""
+    defaults = {
+        'title': 'sample recipe',
+        'time_minutes': 10,
+        'price': 5.00
+    }
+    defaults.update(params)
+    recipe = Recipe.objects.create(user=user, **defaults)
+    recipe.tags.add(*tags)
+    recipe.ingredients.add(*ingredients)
+
+    return recipe
+
+
+class SimilarRecipesApiTests(TestCase):
+    """Test the similar recipes endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'abc@gmail.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.tags = [
+            Tag.objects.create(user=self.user, name=f'tag {index}')
+            for index in range(4)
+        ]
+        self.ingredients = [
+            Ingredient.objects.create(user=self.user, name=f'item {index}')
+            for index in range(6)
+        ]
+        self.recipe = sample_recipe(
+            self.user, self.tags[:2], self.ingredients[:3]
+        )
+
+    def test_ranks_by_similarity(self):
+        """Test recipes are ranked by shared tags and ingredients"""
+        twin = sample_recipe(self.user, self.tags[:2], self.ingredients[:3])
+        close = sample_recipe(self.user, self.tags[:2], self.ingredients[:2])
+        sample_recipe(self.user, self.tags[2:], self.ingredients[3:])
+        other = get_user_model().objects.create_user('x@gmail.com', 'pass')
+        stranger = sample_recipe(other, self.tags[:2], self.ingredients[:3])
+
+        res = self.client.get(similar_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in res.data],
+                         [twin.id, close.id])
+        self.assertEqual(res.data[0]['similarity'], 1.0)
+        self.assertEqual(res.data[1]['similarity'], 0.8)
+        self.assertNotIn(stranger.id, [item['id'] for item in res.data])
+
+    def test_cosine_metric(self):
+        """Test cosine similarity can be requested"""
+        sample_recipe(self.user, self.tags[:2], self.ingredients[:2])
+
+        res = self.client.get(similar_url(self.recipe.id), {
+            'metric': 'cosine'
+        })
+
+        self.assertEqual(res.data[0]['similarity'], round(4 / 20 ** .5, 4))
+
+    def test_invalid_metric(self):
+        """Test an unknown metric is rejected"""
+        res = self.client.get(similar_url(self.recipe.id), {'metric': 'x'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_limit_clamped(self):
+        """Test a zero or negative limit still returns the best match"""
+        twin = sample_recipe(self.user, self.tags[:2], self.ingredients[:3])
+        sample_recipe(self.user, self.tags[:2], self.ingredients[:2])
+
+        for limit in (0, -1):
+            res = self.client.get(similar_url(self.recipe.id), {
+                'limit': limit
+            })
+
+            self.assertEqual([item['id'] for item in res.data], [twin.id])
+
+    def test_index_follows_link_changes(self):
+        """Test removing shared links drops a recipe from the results"""
+        twin = sample_recipe(self.user, self.tags[:2], self.ingredients[:3])
+        twin.tags.clear()
+        for ingredient in self.ingredients[:3]:
+            ingredient.recipe_set.remove(twin)
+
+        res = self.client.get(similar_url(self.recipe.id))
+
+        self.assertEqual(res.data, [])
+        self.assertFalse(RecipeBand.objects.filter(recipe=twin).exists())
+
+    def test_rebuild_command(self):
+        """Test the command indexes links created without signals"""
+        twin = sample_recipe(self.user)
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=twin.id, tag_id=tag.id)
+            for tag in self.tags[:2]
+        )
+        Recipe.ingredients.through.objects.bulk_create(
+            Recipe.ingredients.through(recipe_id=twin.id,
+                                       ingredient_id=ingredient.id)
+            for ingredient in self.ingredients[:3]
+        )
+
+        call_command('rebuild_similarity', stdout=StringIO())
+        res = self.client.get(similar_url(self.recipe.id))
+
+        self.assertEqual([item['id'] for item in res.data], [twin.id])
@@ -0,0 +1,155 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Change, Ingredient, Recipe, Tag
+
+SYNC_URL = reverse('receipe:sync')
+RECIPES_URL = reverse('receipe:recipe-list')
+
+
+class SyncApiTests(TestCase):
+    """Test the incremental sync endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'abc@gmail.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def sync(self, since, **params):
+        res = self.client.get(SYNC_URL, dict(params, since=since))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_reset_without_cursor(self):
+        """Test a client without a cursor is told to fetch everything"""
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.get(SYNC_URL)
+
+        self.assertTrue(res.data['reset'])
+        self.assertEqual(res.data['changes'], [])
+        self.assertEqual(self.sync(res.data['cursor'])['changes'], [])
+
+    def test_changes_since_cursor(self):
+        """Test only later changes are returned, with their data"""
+        Tag.objects.create(user=self.user, name='Old')
+        cursor = self.client.get(SYNC_URL).data['cursor']
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        res = self.client.post(RECIPES_URL, {
+            'title': 'Soup', 'time_minutes': 5, 'price': 1,
+            'tags': [tag.id],
+        })
+
+        data = self.sync(cursor)
+
+        self.assertFalse(data['reset'])
+        self.assertEqual(
+            [(item['type'], item['id']) for item in data['changes']],
+            [('tag', tag.id), ('recipe', res.data['id'])]
+        )
+        self.assertEqual(data['changes'][1]['data']['tags'], [tag.id])
+        self.assertEqual(self.sync(data['cursor'])['changes'], [])
+
+    def test_tombstones(self):
+        """Test deleted objects come back as tombstones"""
+        cursor = self.client.get(SYNC_URL).data['cursor']
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=1
+        )
+        ingredient_id = ingredient.id
+        ingredient.delete()
+        self.client.delete(
+            reverse('receipe:recipe-detail', args=[recipe.id])
+        )
+
+        data = self.sync(cursor)
+
+        self.assertEqual(data['changes'], [
+            {'type': 'ingredient', 'id': ingredient_id, 'deleted': True},
+            {'type': 'recipe', 'id': recipe.id, 'deleted': True},
+        ])
+
+    def test_link_changes(self):
+        """Test adding a tag to recipes logs the recipes"""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=1
+        )
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        cursor = self.client.get(SYNC_URL).data['cursor']
+
+        tag.recipe_set.add(recipe)
+
+        changes = self.sync(cursor)['changes']
+        self.assertEqual(len(changes), 1)
+        self.assertEqual(changes[0]['data']['tags'], [tag.id])
+
+    def test_batches(self):
+        """Test changes come in pages of at most limit entries"""
+        cursor = self.client.get(SYNC_URL).data['cursor']
+        for name in 'abc':
+            Tag.objects.create(user=self.user, name=name)
+
+        first = self.sync(cursor, limit=2)
+        second = self.sync(first['cursor'], limit=2)
+
+        self.assertTrue(first['more'])
+        self.assertEqual(len(first['changes']), 2)
+        self.assertFalse(second['more'])
+        self.assertEqual(second['changes'][0]['data']['name'], 'c')
+
+    def test_other_users_not_synced(self):
+        """Test a user only sees their own changes"""
+        cursor = self.client.get(SYNC_URL).data['cursor']
+        other = get_user_model().objects.create_user('x@gmail.com', 'pass')
+        Tag.objects.create(user=other, name='Vegan')
+
+        self.assertEqual(self.sync(cursor)['changes'], [])
+
+    def test_failed_write_not_logged(self):
+        """Test a rejected write leaves no log entry"""
+        cursor = self.client.get(SYNC_URL).data['cursor']
+
+        res = self.client.post(RECIPES_URL, {'title': 'Soup'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.sync(cursor)['changes'], [])
+
+    def test_invalid_cursor(self):
+        """Test a cursor that is not a number is rejected"""
+        res = self.client.get(SYNC_URL, {'since': 'abc'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_compact_changes(self):
+        """Test compaction keeps the latest entries and moves the floor"""
+        cursor = self.client.get(SYNC_URL).data['cursor']
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        tag.name = 'Vegetarian'
+        tag.save()
+        old = Tag.objects.create(user=self.user, name='Old')
+        Change.objects.filter(object_id=old.id).update(
+            created=timezone.now() - timedelta(days=60)
+        )
+        out = StringIO()
+
+        call_command('compact_changes', days=30, stdout=out)
+
+        self.assertIn('Dropped 2 change log entries', out.getvalue())
+        self.assertTrue(self.sync(cursor)['reset'])
+        self.assertEqual(
+            list(Change.objects.values_list('object_id', flat=True)),
+            [tag.id]
+        )
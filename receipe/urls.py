@@ -7,9 +7,14 @@ router = DefaultRouter()
 router.register('tags', views.TagViewSet)
 router.register('ingredients', views.IngredientViewSet)
 router.register('recipes', views.RecipeViewSet)
+router.register('public', views.PublicRecipeViewSet,
+                basename='public-recipe')
 
 app_name = 'receipe'
 
 urlpatterns = [
+    path('sync/', views.SyncView.as_view(), name='sync'),
+    path('notifications/', views.NotificationsView.as_view(),
+         name='notifications'),
     path('', include(router.urls))
 ]
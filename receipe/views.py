@@ -1,19 +1,31 @@
-from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
+from django.http import Http404
+from rest_framework import exceptions, viewsets, mixins, status
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from core.models import Tag, Ingredient, Recipe
+from core import (
+    changes, deletion, facets, jobs, notify, pantry, response_cache,
+    sharding, shopping, similarity
+)
+from core.authentication import ExpiringTokenAuthentication
+from core.instrumentation import ProfiledViewMixin
+from core.models import Change, Tag, Ingredient, Recipe, RecipeIngredient
 from receipe import serializers
 
 
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
+class BaseRecipeAttrViewSet(ProfiledViewMixin,
+                            sharding.ShardedViewMixin,
+                            changes.AtomicWritesMixin,
+                            viewsets.GenericViewSet,
                             mixins.ListModelMixin,
                             mixins.CreateModelMixin):
     """Take all common atrributes of below classes into
         one to reduce duplication"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (ExpiringTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
@@ -23,7 +35,9 @@ class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
         )
         queryset = self.queryset
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            queryset = queryset.filter(
+                recipe__isnull=False, recipe__deleted_at__isnull=True
+            )
 
         return queryset.filter(
             user=self.request.user
@@ -46,12 +60,15 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
     serializer_class = serializers.IngredientSerializer
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ProfiledViewMixin, sharding.ShardedViewMixin,
+                    changes.AtomicWritesMixin, viewsets.ModelViewSet):
     """Manage Recipe in the database"""
     serializer_class = serializers.RecipeSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (ExpiringTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    # endpoint class of core.throttling, actions may set their own
+    throttle_scope = None
 
     def _params_to_ints(self, qs):
         """Convert a list of string ids to a list of integers.Using _ before
@@ -82,6 +99,9 @@ class RecipeViewSet(viewsets.ModelViewSet):
         if self.action == 'retrieve':
             return serializers.RecipeDetailSerializer
 
+        elif self.action == 'quantities':
+            return serializers.RecipeIngredientSerializer
+
         elif self.action == 'upload_image':
             return serializers.RecipeImageSerializer
 
@@ -91,7 +111,129 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Create a new recipe"""
         serializer.save(user=self.request.user)
 
-    @action(methods=['POST'], detail=True, url_path='upload-image')
+    def perform_destroy(self, instance):
+        """Hide the recipe now and delete its rows in the background"""
+        deletion.delete_recipe(instance)
+
+    @action(methods=['GET'], detail=False)
+    def facets(self, request):
+        """Return recipe counts per tag, ingredient, price and time"""
+        params = request.query_params
+        if not params.get('tags') and not params.get('ingredients'):
+            return Response(facets.for_user(request.user))
+        recipes = Recipe.objects.filter(
+            pk__in=self.get_queryset().values('pk')
+        )
+        return Response(facets.for_recipes(recipes))
+
+    @action(methods=['GET'], detail=True)
+    def similar(self, request, pk=None):
+        """Return the user's recipes most like this one"""
+        recipe = self.get_object()
+        metric = request.query_params.get('metric', 'jaccard')
+        if metric not in similarity.METRICS:
+            return Response(
+                {'metric': [f'Choose one of {", ".join(similarity.METRICS)}']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), 50))
+        except ValueError:
+            return Response(
+                {'limit': ['A valid integer is required.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        ranked = similarity.similar(recipe, limit, metric)
+        recipes = Recipe.objects.in_bulk(
+            [recipe_id for recipe_id, _ in ranked]
+        )
+        data = []
+        for recipe_id, score in ranked:
+            item = serializers.RecipeSerializer(recipes[recipe_id]).data
+            item['similarity'] = round(score, 4)
+            data.append(item)
+        return Response(data)
+
+    @action(methods=['POST'], detail=False, url_path='pantry',
+            url_name='pantry', atomic_writes=False)
+    def pantry_matches(self, request):
+        """Return recipes the given ingredients cover, fewest missing first"""
+        serializer = serializers.PantrySerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        ingredients = serializer.validated_data['ingredients']
+
+        ranked = pantry.matches(
+            request.user,
+            ingredients,
+            serializer.validated_data['max_missing'],
+            serializer.validated_data['limit'],
+        )
+        recipe_ids = [recipe_id for recipe_id, _ in ranked]
+        recipes = Recipe.objects.in_bulk(recipe_ids)
+        missing = pantry.missing_ingredients(recipe_ids, ingredients)
+        data = []
+        for recipe_id, _ in ranked:
+            item = serializers.RecipeSerializer(recipes[recipe_id]).data
+            item['missing_ingredients'] = missing[recipe_id]
+            data.append(item)
+        return Response(data)
+
+    @action(methods=['PUT'], detail=True)
+    def quantities(self, request, pk=None):
+        """Set how much of each ingredient a recipe needs"""
+        recipe = self.get_object()
+        serializer = self.get_serializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        linked = set(recipe.ingredients.values_list('id', flat=True))
+        for item in serializer.validated_data:
+            ingredient = item['ingredient']
+            amount = {
+                'quantity': item.get('quantity'),
+                'unit': item.get('unit', ''),
+            }
+            if ingredient.id in linked:
+                RecipeIngredient.objects.filter(
+                    recipe=recipe, ingredient=ingredient
+                ).update(**amount)
+            else:
+                recipe.ingredients.add(ingredient, through_defaults=amount)
+        # updates of existing links send no signal
+        response_cache.purge(response_cache.recipe_key(recipe.id))
+        changes.record(recipe.user_id, Change.RECIPE, recipe.id)
+        return Response(self.get_serializer(
+            recipe.recipeingredient_set.all(), many=True
+        ).data)
+
+    @action(methods=['POST'], detail=False, url_path='shopping-list',
+            atomic_writes=False)
+    def shopping_list(self, request):
+        """Return the summed ingredients of several scaled recipes"""
+        serializer = serializers.ShoppingListSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        multipliers = {}
+        for portion in serializer.validated_data['recipes']:
+            multipliers[portion['id']] = (
+                multipliers.get(portion['id'], 0) + portion['multiplier']
+            )
+        return Response(shopping.shopping_list(request.user, multipliers))
+
+    @action(methods=['POST'], detail=True, url_path='upload-image',
+            throttle_scope='upload')
     def upload_image(self, request, pk=None):
         """Upload an image to a recipe"""
         recipe = self.get_object()
@@ -101,6 +243,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
         if serializer.is_valid():
             serializer.save()
+            jobs.enqueue(
+                'process_recipe_image', recipe_id=recipe.id,
+                user_id=recipe.user_id
+            )
             return Response(
                 serializer.data,
                 status=status.HTTP_200_OK
@@ -109,3 +255,182 @@ class RecipeViewSet(viewsets.ModelViewSet):
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
         )
+
+
+class PublicRecipePagination(LimitOffsetPagination):
+    """Page public recipe lists so each cached page stays small"""
+    default_limit = 50
+    max_limit = 100
+
+
+class PublicRecipeViewSet(response_cache.SharedCacheMixin,
+                          viewsets.ReadOnlyModelViewSet):
+    """Read recipes their owners made public, without logging in"""
+    queryset = Recipe.objects.filter(
+        is_public=True, user__deleted_at__isnull=True
+    ).order_by('-id')
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+    pagination_class = PublicRecipePagination
+
+    def get_serializer_class(self):
+        """Return appropiate serializer class"""
+        if self.action == 'retrieve':
+            return serializers.RecipeDetailSerializer
+
+        return serializers.RecipeSerializer
+
+    def list(self, request, *args, **kwargs):
+        """List the newest public recipes of every database"""
+        recipes = sharding.Merged(
+            self.get_queryset(), key=lambda recipe: -recipe.pk
+        )
+        page = self.paginate_queryset(recipes)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def get_object(self):
+        """Find the recipe on whichever database holds it"""
+        try:
+            recipe_id = int(self.kwargs['pk'])
+        except ValueError:
+            raise Http404
+        for alias in sharding.aliases():
+            recipe = self.get_queryset().using(alias).filter(
+                pk=recipe_id
+            ).first()
+            if recipe is not None:
+                self.check_object_permissions(self.request, recipe)
+                return recipe
+        raise Http404
+
+    def surrogate_keys(self, data):
+        """Tag responses with the recipes, tags and ingredients shown"""
+        if self.action == 'retrieve':
+            keys, recipes = [], [data]
+        else:
+            keys, recipes = [response_cache.PUBLIC_RECIPES], data['results']
+        for recipe in recipes:
+            keys.append(response_cache.recipe_key(recipe['id']))
+            for name in ('tag', 'ingredient'):
+                for item in recipe[f'{name}s']:
+                    item_id = item['id'] if isinstance(item, dict) else item
+                    keys.append(f'{name}-{item_id}')
+
+        return sorted(set(keys))
+
+
+class SyncView(ProfiledViewMixin, sharding.ShardedViewMixin, APIView):
+    """Return what changed in the user's recipes, tags and ingredients"""
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    # kind -> (queryset, serializer class) of the objects shown
+    kinds = {
+        Change.RECIPE: (Recipe.objects.all(), serializers.RecipeSerializer),
+        Change.TAG: (Tag.objects.all(), serializers.TagSerializer),
+        Change.INGREDIENT: (
+            Ingredient.objects.all(), serializers.IngredientSerializer
+        ),
+    }
+
+    def get(self, request):
+        """Return the changes after the `since` cursor, oldest first
+
+        Without a usable cursor the answer asks for a reset: the client
+        fetches everything again and syncs from the cursor returned.
+        """
+        params = request.query_params
+        try:
+            since = params.get('since')
+            cursor = None if since in (None, '') else int(since)
+            limit = max(1, min(
+                int(params.get('limit', settings.SYNC_BATCH_SIZE)),
+                settings.SYNC_BATCH_SIZE
+            ))
+        except ValueError:
+            return Response(
+                {'detail': 'since and limit must be integers.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        found = changes.changes(request.user, cursor, limit)
+        if found is None:
+            return Response({
+                'cursor': changes.current(request.user),
+                'reset': True,
+                'more': False,
+                'changes': [],
+            })
+        entries, cursor, more = found
+
+        live = {}
+        for kind, (queryset, _) in self.kinds.items():
+            ids = [
+                entry.object_id for entry in entries
+                if entry.kind == kind and not entry.deleted
+            ]
+            live[kind] = queryset.filter(user=request.user).in_bulk(ids)
+        data = []
+        for entry in entries:
+            instance = live[entry.kind].get(entry.object_id)
+            item = {
+                'type': entry.kind,
+                'id': entry.object_id,
+                'deleted': instance is None,
+            }
+            if instance is not None:
+                item['data'] = self.kinds[entry.kind][1](instance).data
+            data.append(item)
+        return Response({
+            'cursor': cursor,
+            'reset': False,
+            'more': more,
+            'changes': data,
+        })
+
+
+class NotificationsView(ProfiledViewMixin, APIView):
+    """Wait until the user changes a recipe, tag or ingredient"""
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        """Return the sync cursor once it moves past `since`
+
+        Answers at once when it already has, otherwise after the next
+        change or `timeout` seconds, with `changed` telling which. When
+        NOTIFY_MAX_WAITERS requests already wait, answers 429 instead.
+        """
+        params = request.query_params
+        try:
+            since = params.get('since')
+            since = None if since in (None, '') else int(since)
+            timeout = max(0, min(
+                float(params.get('timeout', settings.NOTIFY_TIMEOUT)),
+                settings.NOTIFY_TIMEOUT
+            ))
+        except ValueError:
+            return Response(
+                {'detail': 'since and timeout must be numbers.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        backend = notify.notifier()
+        # subscribe first, a change made meanwhile still wakes the wait
+        subscription = backend.subscribe(request.user.pk)
+        try:
+            cursor = changes.current(request.user)
+            if since is None:
+                since = cursor
+            if cursor == since:
+                with notify.waiting_slot() as free:
+                    if not free:
+                        raise exceptions.Throttled(
+                            wait=1, detail='Too many requests are waiting.'
+                        )
+                    notify.release_connections()
+                    if backend.wait(subscription, timeout):
+                        cursor = changes.current(request.user)
+        finally:
+            backend.unsubscribe(subscription)
+        return Response({'cursor': cursor, 'changed': cursor != since})
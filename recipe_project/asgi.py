@@ -0,0 +1,23 @@
+"""
+ASGI config for recipe_project project.
+
+It exposes the ASGI callable as a module-level variable named
+``application``. Django 2.2 has no ASGI handler of its own, so the WSGI
+application is served through core.asgi.WsgiToAsgi, e.g.
+
+    uvicorn recipe_project.asgi:application
+"""
+
+import os
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+
+from core.asgi import WsgiToAsgi
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recipe_project.settings')
+
+application = WsgiToAsgi(
+    get_wsgi_application(),
+    max_workers=settings.ASGI_THREADS
+)
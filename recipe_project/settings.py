@@ -47,14 +47,57 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.CompressionMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.QueryInstrumentationMiddleware',
 ]
 
+# Bodies smaller than this many bytes are sent uncompressed by
+# CompressionMiddleware, compressing them saves too little to be worth it
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+
+# Share of requests profiled by QueryInstrumentationMiddleware, and how
+# often one SQL shape may repeat in a request before it is logged as N+1
+REQUEST_PROFILE_SAMPLE_RATE = float(
+    os.environ.get('REQUEST_PROFILE_SAMPLE_RATE', 0.01)
+)
+REQUEST_PROFILE_REPEAT_THRESHOLD = 5
+
+# On-demand profiles of API views (core.profiler), taken for staff
+# requests sending an X-Profile header, or for every request of a process
+# after PROFILER_SIGNAL, sent again to stop. The newest PROFILER_KEEP
+# profiles are kept in PROFILER_DIR, see `manage.py show_profiles`
+PROFILER_DIR = os.environ.get('PROFILER_DIR', '/tmp/recipe-profiles')
+PROFILER_KEEP = int(os.environ.get('PROFILER_KEEP', 100))
+PROFILER_INTERVAL = 0.005
+PROFILER_SIGNAL = os.environ.get('PROFILER_SIGNAL', 'SIGUSR2')
+
+# Directory shared by all worker processes to aggregate /metrics, leave
+# unset for a single process server
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = 5  # seconds
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core': {
+            'handlers': ['console'],
+            'level': os.environ.get('CORE_LOG_LEVEL', 'WARNING'),
+        },
+    },
+}
+
 ROOT_URLCONF = 'recipe_project.urls'
 
 TEMPLATES = [
@@ -75,21 +118,108 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'recipe_project.wsgi.application'
 
+# Threads handling requests of the ASGI entry point (recipe_project.asgi),
+# each holds at most one database connection
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 16))
+
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        # 'ENGINE': 'django.db.backends.postgresql',
-        # 'NAME': 'mydatabase',
-        # 'PASSWORD': 'thebeast',
-        # 'USER': 'postgres',
-        # 'HOST': 'localhost',
-        # 'PORT': '5432'
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+# DB_ENGINE=postgres selects Postgres for production deployments; sqlite
+# stays the default for local development and the test suite.
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'recipe'),
+            'USER': os.environ.get('DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('DB_PASS', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            # keep the connection open between requests (seconds)
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+            # ping persistent connections before reuse, see core.signals
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+            },
+        }
+    }
+    if os.environ.get('DB_POOL_MAX_SIZE'):
+        # hand out connections from a process-wide pool, closing a
+        # connection returns it to the pool instead of disconnecting
+        DATABASES['default'].update({
+            'ENGINE': 'core.backends.postgresql_pool',
+            'CONN_MAX_AGE': 0,
+        })
+        DATABASES['default']['OPTIONS'].update({
+            'pool_min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 1)),
+            'pool_max_size': int(os.environ['DB_POOL_MAX_SIZE']),
+            # seconds a request waits for a free connection before failing
+            'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+        })
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get(
+                'DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')
+            ),
+        }
     }
+
+# Comma separated read replicas: host names for Postgres, or database
+# files when running on sqlite locally. Reads are routed by core.routers
+DATABASE_REPLICAS = []
+for index, replica in enumerate(
+        filter(None, os.environ.get('DB_REPLICAS', '').split(','))):
+    alias = f'replica{index + 1}'
+    location = 'HOST' if DB_ENGINE == 'postgres' else 'NAME'
+    DATABASES[alias] = dict(DATABASES['default'], **{
+        location: replica.strip(),
+        'TEST': {'MIRROR': 'default'},
+    })
+    DATABASE_REPLICAS.append(alias)
+
+# Comma separated shards holding recipe data next to 'default': host
+# names for Postgres, or database files when running on sqlite locally.
+# Users are placed by a consistent hash ring, see core.sharding
+DATABASE_SHARDS = []
+for index, shard in enumerate(
+        filter(None, os.environ.get('DB_SHARDS', '').split(','))):
+    alias = f'shard{index + 1}'
+    location = 'HOST' if DB_ENGINE == 'postgres' else 'NAME'
+    DATABASES[alias] = dict(DATABASES['default'], **{
+        location: shard.strip(),
+    })
+    DATABASE_SHARDS.append(alias)
+
+# Points per database on the hash ring, more spread users more evenly
+SHARD_VNODES = 64
+# Ids of recipes, tags and ingredients a process reserves at a time, they
+# are unique across shards so a user's data keeps its ids when moved
+SHARD_ID_BLOCK = 1000
+# Seconds `manage.py rebalance_shards` waits for requests already using
+# a user's old placement before copying and before dropping its rows
+SHARD_MOVE_GRACE = 2
+
+DATABASE_ROUTERS = [
+    'core.routers.ShardRouter',
+    'core.routers.PrimaryReplicaRouter',
+]
+
+# Seconds a client keeps reading from the primary after it writes, so it
+# always sees its own changes despite replication lag
+REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', 10))
+
+# Applied to every new sqlite connection, see core.signals
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,   # milliseconds
+    'synchronous': 'NORMAL',
 }
 
 
@@ -112,6 +242,169 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing, see core.hashers. New passwords use PASSWORD_HASHER,
+# older hashes are upgraded transparently on the next successful login
+PASSWORD_HASH_ITERATIONS = int(
+    os.environ.get('PASSWORD_HASH_ITERATIONS', 150000)
+)
+PASSWORD_HASHER = os.environ.get(
+    'PASSWORD_HASHER', 'core.hashers.PBKDF2PasswordHasher'
+)
+PASSWORD_HASHERS = [PASSWORD_HASHER] + [
+    hasher for hasher in (
+        'core.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.Argon2PasswordHasher',
+        'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    ) if hasher != PASSWORD_HASHER
+]
+
+
+# Caches
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # failed login counters and shared token buckets (core.throttling),
+    # kept in each process unless pointed at memcached
+    'throttle': {
+        'BACKEND': os.environ.get(
+            'THROTTLE_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('THROTTLE_CACHE_LOCATION', 'throttle'),
+    },
+    # rendered public API responses (core.response_cache), point it at
+    # memcached to share them and their purges between processes
+    'responses': {
+        'BACKEND': os.environ.get(
+            'RESPONSE_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('RESPONSE_CACHE_LOCATION', 'responses'),
+        'TIMEOUT': 300,
+    },
+    # clients pinned to the primary after a write (core.routers), point
+    # it at memcached so the pin holds whichever process serves the read
+    'replica_pins': {
+        'BACKEND': os.environ.get(
+            'REPLICA_PIN_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get(
+            'REPLICA_PIN_CACHE_LOCATION', 'replica_pins'
+        ),
+    },
+    # serialised /api/user/me/ profiles (user.signals), point it at
+    # memcached so a change made through one process drops the copy
+    # cached by every other
+    'profiles': {
+        'BACKEND': os.environ.get(
+            'PROFILE_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('PROFILE_CACHE_LOCATION', 'profiles'),
+    },
+}
+
+# Seconds browsers and CDNs may reuse public recipe responses
+PUBLIC_CACHE_MAX_AGE = 60
+
+
+# Background jobs (core.jobs), run by `manage.py run_worker`. Failed jobs
+# are retried after JOB_RETRY_BACKOFF * 2 ** (attempt - 1) seconds, jobs
+# running longer than JOB_TIMEOUT seconds are handed to another worker
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_BACKOFF = 10
+JOB_TIMEOUT = 300
+
+# Uploaded recipe images are shrunk to fit this many pixels
+RECIPE_IMAGE_MAX_SIZE = 1600
+
+# Seconds a serialised /api/user/me/ profile stays cached, it is dropped
+# as soon as the user changes
+USER_PROFILE_CACHE_TIMEOUT = 300
+
+# Width of the price and time_minutes buckets in /api/recipe/recipes/facets/
+FACET_PRICE_BUCKET = 5
+FACET_TIME_BUCKET = 15
+
+# MinHash-LSH index behind /api/recipe/recipes/<id>/similar/, recipes whose
+# tags and ingredients have a Jaccard similarity above roughly
+# (1 / BANDS) ** (1 / ROWS) share a bucket and are compared exactly
+SIMILARITY_BANDS = 16
+SIMILARITY_ROWS = 2
+SIMILARITY_CANDIDATES = 200
+
+# Most ingredient ids accepted by /api/recipe/recipes/pantry/
+PANTRY_MAX_INGREDIENTS = 1000
+
+# Most recipes accepted by /api/recipe/recipes/shopping-list/
+SHOPPING_LIST_MAX_RECIPES = 200
+
+# Most changes per /api/recipe/sync/ page, and the days `manage.py
+# compact_changes` keeps the change log, older clients resync fully
+SYNC_BATCH_SIZE = 500
+SYNC_LOG_DAYS = 30
+
+# /api/recipe/notifications/ waits at most NOTIFY_TIMEOUT seconds for a
+# change. 'local' only wakes waiters of the process that made the change,
+# 'file' also those of other processes sharing NOTIFY_DIR
+NOTIFY_BACKEND = os.environ.get('NOTIFY_BACKEND', 'local')
+NOTIFY_DIR = os.environ.get('NOTIFY_DIR', '/tmp/recipe-notify')
+NOTIFY_TIMEOUT = 25
+# Requests of a process allowed to wait at once, further ones answer 429.
+# Keep it below the request threads of a process (ASGI_THREADS, or the
+# threads of a WSGI worker) so waiters leave threads for other requests
+NOTIFY_MAX_WAITERS = int(
+    os.environ.get('NOTIFY_MAX_WAITERS', max(1, ASGI_THREADS // 2))
+)
+
+
+# Django REST framework
+
+REST_FRAMEWORK = {
+    'DEFAULT_THROTTLE_CLASSES': (
+        'core.throttling.TokenBucketThrottle',
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        # failed logins, see user.throttling
+        'login_ip': os.environ.get('LOGIN_IP_RATE', '20/min'),
+        'login_email': os.environ.get('LOGIN_EMAIL_RATE', '5/min'),
+    },
+}
+
+# Token bucket limits (core.throttling) per user, or per client IP for
+# anonymous requests, as (burst, tokens refilled per second) for each
+# endpoint class. THROTTLE_DISABLED=1 lifts them, for example for load tests
+THROTTLE_BUCKETS = {
+    'read': (120, 20),
+    'write': (60, 5),
+    'upload': (10, 0.5),
+    'auth': (60, 1),
+}
+if os.environ.get('THROTTLE_DISABLED'):
+    THROTTLE_BUCKETS = {}
+# 'local' keeps the buckets in each process, 'cache' keeps them in the
+# 'throttle' cache, which processes only share once THROTTLE_CACHE_BACKEND
+# points at a shared backend such as memcached
+THROTTLE_BACKEND = os.environ.get('THROTTLE_BACKEND', 'local')
+
+# Answer a login with the token the client already holds for that account
+# instead of hashing the password again
+LOGIN_REUSE_TOKEN = True
+
+# API tokens (core.models.AuthToken) live TOKEN_TTL seconds. A login
+# presenting a token that expires within TOKEN_REFRESH_WINDOW seconds, and
+# the right password, gets a fresh one; expired tokens are removed by `manage.py purge_tokens`
+TOKEN_TTL = int(os.environ.get('TOKEN_TTL', 30 * 24 * 3600))
+TOKEN_REFRESH_WINDOW = int(
+    os.environ.get('TOKEN_REFRESH_WINDOW', 7 * 24 * 3600)
+)
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/2.2/topics/i18n/
 
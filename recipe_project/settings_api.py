@@ -0,0 +1,46 @@
+"""
+Settings of API-only worker processes.
+
+The API authenticates with tokens, so these workers skip the admin,
+sessions, messages, static files, CSRF, clickjacking and template
+machinery of recipe_project.settings. The admin is served by processes
+running recipe_project.wsgi, API workers by recipe_project.wsgi_api.
+"""
+
+from recipe_project.settings import *  # noqa: F401,F403
+from recipe_project.settings import INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK
+
+UNUSED_APPS = (
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+)
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in UNUSED_APPS]
+
+UNUSED_MIDDLEWARE = (
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+)
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE
+    if middleware not in UNUSED_MIDDLEWARE
+]
+
+ROOT_URLCONF = 'recipe_project.urls_api'
+WSGI_APPLICATION = 'recipe_project.wsgi_api.application'
+
+# JSON only, no browsable API to render
+TEMPLATES = []
+
+REST_FRAMEWORK = dict(REST_FRAMEWORK, **{
+    'DEFAULT_AUTHENTICATION_CLASSES': (
+        'core.authentication.ExpiringTokenAuthentication',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'rest_framework.renderers.JSONRenderer',
+    ),
+})
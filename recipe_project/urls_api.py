@@ -0,0 +1,11 @@
+"""URLs of the API, served without the admin by recipe_project.wsgi_api"""
+from django.urls import path, include
+
+from core.views import health_view, metrics_view
+
+urlpatterns = [
+    path('api/user/', include('user.urls')),
+    path('api/recipe/', include('receipe.urls')),
+    path('metrics', metrics_view, name='metrics'),
+    path('health/', health_view, name='health'),
+]
@@ -2,6 +2,8 @@
 WSGI config for recipe_project project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
+It serves everything, including the admin. API-only workers run
+recipe_project.wsgi_api instead.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/2.2/howto/deployment/wsgi/
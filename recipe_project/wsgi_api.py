@@ -0,0 +1,16 @@
+"""
+WSGI config of API-only worker processes.
+
+Runs with recipe_project.settings_api, without the admin, sessions and
+templates; serve the admin from recipe_project.wsgi, e.g.
+
+    gunicorn recipe_project.wsgi_api:application
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recipe_project.settings_api')
+
+application = get_wsgi_application()
@@ -17,14 +17,20 @@ class UserSerializer(serializers.ModelSerializer):
         return get_user_model().objects.create_user(**validated_data)
 
     def update(self, instance, validated_data):
-        """Update the user with correct data and return"""
+        """Update the user with a single save of the changed fields"""
         password = validated_data.pop('password', None)
-        user = super().update(instance, validated_data)
+        changed = []
+        for attr, value in validated_data.items():
+            if getattr(instance, attr) != value:
+                setattr(instance, attr, value)
+                changed.append(attr)
         if password:
-            user.set_password(password)
-            user.save()
+            instance.set_password(password)
+            changed.append('password')
+        if changed:
+            instance.save(update_fields=changed)
 
-        return user
+        return instance
 
 
 class AuthTokenSerializer(serializers.Serializer):
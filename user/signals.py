@@ -0,0 +1,19 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+
+def profile_cache():
+    return caches['profiles']
+
+
+def profile_cache_key(user_id):
+    return f'user-profile:{user_id}'
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_profile(sender, instance, **kwargs):
+    """Drop the cached profile whenever the user changes"""
+    profile_cache().delete(profile_cache_key(instance.pk))
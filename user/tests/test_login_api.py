@@ -0,0 +1,152 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import AuthToken
+
+TOKEN_URL = reverse('user:token')
+
+RATES = {'login_ip': '3/min', 'login_email': '2/min'}
+
+
+def create_user(**param):
+    return get_user_model().objects.create_user(**param)
+
+
+@override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': RATES})
+class LoginThrottleTests(TestCase):
+    """Test throttling of failed logins"""
+
+    def setUp(self):
+        caches['throttle'].clear()
+        self.client = APIClient()
+        create_user(email='abc@gmail.com', password='testpass')
+
+    def test_email_throttled_after_failures(self):
+        """Test an account is throttled after repeated failed logins"""
+        payload = {'email': 'abc@gmail.com', 'password': 'wrong'}
+        for _ in range(2):
+            res = self.client.post(TOKEN_URL, payload)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        with patch('user.serializers.authenticate') as authenticate:
+            res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', res)
+        authenticate.assert_not_called()
+
+    def test_successful_logins_not_counted(self):
+        """Test successful logins never throttle an account"""
+        payload = {'email': 'abc@gmail.com', 'password': 'testpass'}
+        for _ in range(4):
+            res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_ip_throttled_across_emails(self):
+        """Test one client trying many accounts gets throttled"""
+        for index in range(3):
+            self.client.post(
+                TOKEN_URL, {'email': f'{index}@gmail.com', 'password': 'x'}
+            )
+
+        res = self.client.post(
+            TOKEN_URL, {'email': 'abc@gmail.com', 'password': 'testpass'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_email_not_a_string_rejected(self):
+        """Test a non-string email is a bad request, not a server error"""
+        res = self.client.post(
+            TOKEN_URL, {'email': 5, 'password': 'x'}, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_body_rejected(self):
+        """Test a JSON list body is a bad request, not a server error"""
+        res = self.client.post(TOKEN_URL, ['abc@gmail.com'], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class LoginTokenReuseTests(TestCase):
+    """Test logins of clients already holding a token"""
+
+    def setUp(self):
+        caches['throttle'].clear()
+        self.client = APIClient()
+        self.user = create_user(email='abc@gmail.com', password='testpass')
+        self.token, self.key = AuthToken.objects.issue(self.user)
+
+    def test_valid_token_reused_without_hashing(self):
+        """Test a valid token is returned without checking the password"""
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.key}')
+
+        with patch('user.serializers.authenticate') as authenticate:
+            res = self.client.post(
+                TOKEN_URL, {'email': 'ABC@gmail.com', 'password': 'testpass'}
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['token'], self.key)
+        authenticate.assert_not_called()
+
+    def test_stale_token_falls_back_to_password(self):
+        """Test an invalid token header does not fail the login"""
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+
+        res = self.client.post(
+            TOKEN_URL, {'email': 'abc@gmail.com', 'password': 'testpass'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res.data['token'], self.key)
+
+    def test_token_of_other_account_ignored(self):
+        """Test a token is only reused for its own account"""
+        create_user(email='other@gmail.com', password='otherpass')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.key}')
+
+        res = self.client.post(
+            TOKEN_URL, {'email': 'other@gmail.com', 'password': 'wrong'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_email_not_a_string_with_token(self):
+        """Test a non-string email next to a token is a bad request"""
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.key}')
+
+        res = self.client.post(
+            TOKEN_URL, {'email': 5, 'password': 'x'}, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PasswordHashingTests(TestCase):
+
+    def test_password_rehashed_on_login(self):
+        """Test logins upgrade hashes made with another iteration count"""
+        caches['throttle'].clear()
+        with self.settings(PASSWORD_HASH_ITERATIONS=1000):
+            user = create_user(email='abc@gmail.com', password='testpass')
+        self.assertIn('$1000$', user.password)
+
+        with self.settings(PASSWORD_HASH_ITERATIONS=2000):
+            res = APIClient().post(
+                TOKEN_URL, {'email': 'abc@gmail.com', 'password': 'testpass'}
+            )
+
+        user.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('$2000$', user.password)
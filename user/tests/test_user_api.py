@@ -5,6 +5,8 @@ from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from user.signals import profile_cache, profile_cache_key
+
 # URL ##
 CREATE_USER_URL = reverse('user:create')
 Token_URL = reverse('user:token')
@@ -140,3 +142,56 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_profile_served_from_cache(self):
+        """Test the profile is cached and refreshed after a change"""
+        self.client.get(ME_URL)
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.data['name'], self.user.name)
+        self.assertIsNotNone(
+            profile_cache().get(profile_cache_key(self.user.pk))
+        )
+
+        self.client.patch(ME_URL, {'name': 'changed'})
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'changed')
+
+    def test_patch_name_single_update(self):
+        """Test changing the name is a single UPDATE of that column"""
+        with self.assertNumQueries(1) as queries:
+            res = self.client.patch(ME_URL, {'name': 'new name'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        sql = queries.captured_queries[0]['sql']
+        self.assertIn('"name"', sql)
+        self.assertNotIn('"password"', sql)
+
+    def test_patch_password_single_update(self):
+        """Test changing the password costs one UPDATE"""
+        with self.assertNumQueries(1):
+            res = self.client.patch(ME_URL, {'password': 'newpass'})
+
+        self.user.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(self.user.check_password('newpass'))
+
+    def test_put_profile_queries(self):
+        """Test PUT checks the email is unique and saves once"""
+        payload = {
+            'email': self.user.email,
+            'name': 'new name',
+            'password': 'newpass'
+        }
+        with self.assertNumQueries(2):
+            res = self.client.put(ME_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_unchanged_patch_no_update(self):
+        """Test a PATCH without changes does not write"""
+        with self.assertNumQueries(0):
+            res = self.client.patch(ME_URL, {'name': self.user.name})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
@@ -0,0 +1,72 @@
+from collections.abc import Mapping
+
+from django.core.cache import caches
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+def posted_email(request):
+    """Return the normalized email a login posted, '' for none"""
+    data = request.data
+    email = data.get('email') if isinstance(data, Mapping) else None
+    if not isinstance(email, str):
+        return ''
+    return email.strip().lower()
+
+
+class LoginFailureThrottle(SimpleRateThrottle):
+    """Throttle logins after too many failed attempts
+
+    Only failures recorded with `record_failure` count against the rate, so
+    successful logins never lock anybody out. The check runs before the
+    password is hashed, which is what makes rejected attempts cheap.
+    """
+    cache = caches['throttle']
+
+    def get_rate(self):
+        # read the rates on every use so they can be changed in tests
+        return api_settings.DEFAULT_THROTTLE_RATES[self.scope]
+
+    def throttle_success(self):
+        return True
+
+    def record_failure(self, request):
+        """Count a failed login of this request"""
+        if self.rate is None:
+            return
+        key = self.get_cache_key(request, None)
+        if key is None:
+            return
+        now = self.timer()
+        history = [
+            moment for moment in self.cache.get(key, [])
+            if moment > now - self.duration
+        ]
+        history.insert(0, now)
+        self.cache.set(key, history, self.duration)
+
+
+class LoginIPThrottle(LoginFailureThrottle):
+    """Failed logins per client IP"""
+    scope = 'login_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident(request),
+        }
+
+
+class LoginEmailThrottle(LoginFailureThrottle):
+    """Failed logins per account email"""
+    scope = 'login_email'
+
+    def get_cache_key(self, request, view):
+        email = posted_email(request)
+        if not email:
+            return None
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': email,
+        }
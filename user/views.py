@@ -1,25 +1,88 @@
+from django.conf import settings
+
 from rest_framework import generics, authentication, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.response import Response
+from rest_framework.serializers import ValidationError
 from rest_framework.settings import api_settings
 
+from core import deletion, metrics, sharding
+from core.authentication import ExpiringTokenAuthentication
+from core.instrumentation import ProfiledViewMixin
+from core.models import AuthToken
+from core.throttling import TokenBucketThrottle
 from user.serializers import UserSerializer, AuthTokenSerializer
+from user.signals import profile_cache, profile_cache_key
+from user.throttling import (
+    LoginEmailThrottle, LoginFailureThrottle, LoginIPThrottle, posted_email
+)
 
 
-class CreateUserView(generics.CreateAPIView):
+class CreateUserView(ProfiledViewMixin, generics.CreateAPIView):
     """Create a new User in the system"""
     serializer_class = UserSerializer
+    throttle_scope = 'auth'
 
 
-class CreateTokenView(ObtainAuthToken):
+class CreateTokenView(ProfiledViewMixin, ObtainAuthToken):
     """Create a new auth token for user"""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    # the credentials are checked in post, a stale token header must not
+    # turn a login into a 401
+    authentication_classes = ()
+    throttle_classes = (
+        TokenBucketThrottle, LoginIPThrottle, LoginEmailThrottle
+    )
+    throttle_scope = 'auth'
+
+    def _presented_token(self, request):
+        """Return the valid token and key sent for the posted email"""
+        try:
+            credentials = ExpiringTokenAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return None, None
+        if credentials is None:
+            return None, None
+        user, token = credentials
+        if user.email.lower() != posted_email(request):
+            return None, None
+        key = authentication.get_authorization_header(request).split()[1]
+        return token, key.decode()
+
+    def post(self, request, *args, **kwargs):
+        token = None
+        if settings.LOGIN_REUSE_TOKEN:
+            token, key = self._presented_token(request)
+            if token is not None and not token.needs_refresh():
+                # already logged in, skip hashing the password again
+                return Response({'token': key})
+
+        serializer = self.serializer_class(
+            data=request.data,
+            context={'request': request}
+        )
+        try:
+            serializer.is_valid(raise_exception=True)
+        except ValidationError:
+            for throttle in self.get_throttles():
+                if isinstance(throttle, LoginFailureThrottle):
+                    throttle.record_failure(request)
+            raise
+        if token is not None:
+            # rotate a token about to expire, only once the password is
+            # checked so a stolen token cannot be renewed forever
+            token.delete()
+        _, key = AuthToken.objects.issue(serializer.validated_data['user'])
+        return Response({'token': key})
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(ProfiledViewMixin, sharding.ShardedViewMixin,
+                     generics.RetrieveUpdateDestroyAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (ExpiringTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
@@ -27,3 +90,18 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
         return self.request.user
         """ retrieve only request user bcz authentication_classes
         handle the authentication"""
+
+    def retrieve(self, request, *args, **kwargs):
+        """Serve the profile from cache, user.signals invalidates it"""
+        key = profile_cache_key(request.user.pk)
+        data = profile_cache().get(key)
+        metrics.cache_lookup('user_profile', data is not None)
+        if data is None:
+            data = dict(self.get_serializer(self.get_object()).data)
+            profile_cache().set(key, data, settings.USER_PROFILE_CACHE_TIMEOUT)
+
+        return Response(data)
+
+    def perform_destroy(self, instance):
+        """Close the account now and delete its data in the background"""
+        deletion.delete_user(instance)